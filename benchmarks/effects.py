@@ -0,0 +1,87 @@
+"""
+Throughput of the local photo effects, in megapixels per second.
+
+Every effect runs on a random RGB image, first in this process, then spread over
+a process pool the way the local storage backend renders transformations.
+
+Usage:
+    python -m benchmarks.effects
+    python -m benchmarks.effects --size 4000x3000 --repeat 5 --workers 4 --output effects.json
+    python -m benchmarks.effects --effects pixelate:10,art:zorro
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from src.services.effects import ART_FILTERS, apply_effect
+
+DEFAULT_EFFECTS = ["pixelate:5", "pixelate:20", "vignette", "cartoonify", "grayscale"] + [
+    f"art:{name}" for name in ART_FILTERS
+]
+
+
+def random_image(width: int, height: int, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+
+
+def time_effect(effect: str, width: int, height: int, repeat: int) -> list[float]:
+    """
+    Times of repeat runs of the effect, in seconds. A first run warms the caches (masks, LUTs)
+    and is not counted, as in a worker that has rendered a photo of the same size before.
+    """
+    image = random_image(width, height)
+    apply_effect(image, effect)
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        apply_effect(image, effect)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def run(effects: list[str], width: int, height: int, repeat: int, workers: int) -> dict:
+    megapixels = width * height / 1e6
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Start the workers before timing anything.
+        list(pool.map(time_effect, ["grayscale"] * workers, [64] * workers, [64] * workers, [1] * workers))
+        for effect in effects:
+            single = min(time_effect(effect, width, height, repeat))
+            # All workers run at once; the slowest one bounds the throughput of the pool.
+            busy = max(
+                sum(timings)
+                for timings in pool.map(
+                    time_effect, [effect] * workers, [width] * workers, [height] * workers, [repeat] * workers
+                )
+            )
+            results[effect] = {
+                "seconds": round(single, 4),
+                "mp_per_second": round(megapixels / single, 1),
+                "pool_mp_per_second": round(megapixels * workers * repeat / busy, 1),
+            }
+    return {"size": f"{width}x{height}", "megapixels": round(megapixels, 2), "workers": workers, "effects": results}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", default="2048x1536", help="WIDTHxHEIGHT of the test image")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--effects", default=",".join(DEFAULT_EFFECTS))
+    parser.add_argument("--output")
+    args = parser.parse_args()
+    width, height = (int(value) for value in args.size.lower().split("x"))
+    report = run(args.effects.split(","), width, height, args.repeat, args.workers)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Local stand-ins for the external services, so that benchmarks run offline.
+
+Only the commands the application actually sends are implemented.
+"""
+import contextlib
+import time
+from typing import Any, Dict, Iterator, Set
+from unittest.mock import patch
+
+import cloudinary.uploader
+from fastapi_limiter import FastAPILimiter
+from fastapi_mail import FastMail
+
+from src.services import sessions
+from src.services.bans import ban_registry
+from src.services.cache import user_cache
+from src.services.sessions import session_store
+
+
+class FakePipeline:
+    def __init__(self, redis: "FakeRedis"):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self) -> "FakePipeline":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.commands.clear()
+
+    def __getattr__(self, name: str):
+        def queue(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+            return self
+        return queue
+
+    async def execute(self) -> list:
+        results = [await getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.commands]
+        self.commands.clear()
+        return results
+
+
+class FakeRedis:
+    """In-memory Redis with key expiry, sets, the session rotation script and the rate limiter script."""
+
+    def __init__(self):
+        self.values: Dict[str, Any] = {}
+        self.sets: Dict[str, Set[bytes]] = {}
+        self.expires: Dict[str, float] = {}
+        self.published = 0
+
+    @staticmethod
+    def _encode(value: Any) -> bytes:
+        return value if isinstance(value, bytes) else str(value).encode()
+
+    def _alive(self, key: str) -> bool:
+        expires_at = self.expires.get(key)
+        if expires_at is not None and expires_at <= time.monotonic():
+            self.values.pop(key, None)
+            self.sets.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.values or key in self.sets
+
+    async def get(self, key: str) -> bytes | None:
+        return self.values.get(key) if self._alive(key) else None
+
+    async def set(self, key: str, value: Any, ex: int | None = None) -> bool:
+        self.values[key] = self._encode(value)
+        self.expires.pop(key, None)
+        if ex is not None:
+            self.expires[key] = time.monotonic() + ex
+        return True
+
+    async def delete(self, *keys: str) -> int:
+        deleted = 0
+        for key in keys:
+            deleted += self._alive(key)
+            self.values.pop(key, None)
+            self.sets.pop(key, None)
+            self.expires.pop(key, None)
+        return deleted
+
+    async def expire(self, key: str, seconds: int) -> bool:
+        if not self._alive(key):
+            return False
+        self.expires[key] = time.monotonic() + int(seconds)
+        return True
+
+    async def sadd(self, key: str, *members: Any) -> int:
+        self._alive(key)
+        members = {self._encode(member) for member in members}
+        target = self.sets.setdefault(key, set())
+        added = len(members - target)
+        target |= members
+        return added
+
+    async def srem(self, key: str, *members: Any) -> int:
+        target = self.sets.get(key, set()) if self._alive(key) else set()
+        members = {self._encode(member) for member in members}
+        removed = len(members & target)
+        target -= members
+        return removed
+
+    async def smembers(self, key: str) -> Set[bytes]:
+        return set(self.sets.get(key, set())) if self._alive(key) else set()
+
+    async def publish(self, channel: str, message: Any) -> int:
+        self.published += 1
+        return 0
+
+    def pipeline(self, transaction: bool = True) -> FakePipeline:
+        return FakePipeline(self)
+
+    async def script_load(self, script: str) -> str:
+        return "fake"
+
+    async def evalsha(self, sha: str, numkeys: int, *args: Any) -> int:
+        # The rate limiter: benchmarks are never throttled.
+        return 0
+
+    async def eval(self, script: str, numkeys: int, *args: Any) -> int:
+        if script != sessions._ROTATE:
+            raise NotImplementedError("FakeRedis only runs the session rotation script")
+        session_key, index_key, jti, new_jti, ttl = args
+        current = await self.get(session_key)
+        if current is None:
+            return 0
+        if current != self._encode(jti):
+            return -1
+        await self.set(session_key, new_jti, ex=int(ttl))
+        await self.expire(index_key, int(ttl))
+        return 1
+
+
+class FakeUploader:
+    """Replaces cloudinary.uploader.upload, remembers how many uploads were made."""
+
+    def __init__(self):
+        self.uploads = 0
+
+    def __call__(self, file: Any, public_id: str = "upload", **kwargs) -> Dict[str, Any]:
+        self.uploads += 1
+        url = f"https://res.cloudinary.invalid/image/upload/{public_id}"
+        return {"public_id": public_id, "version": 1, "url": url, "secure_url": url}
+
+
+async def _fake_identifier(request) -> str:
+    return "benchmark"
+
+
+async def _send_message(self, message, template_name=None) -> None:
+    return None
+
+
+@contextlib.contextmanager
+def offline(redis: FakeRedis | None = None) -> Iterator[FakeRedis]:
+    """
+    Route Redis, Cloudinary and SMTP traffic of the application to local fakes.
+
+    :param redis: FakeRedis: Reuse an existing fake, a new one is made otherwise
+    :return: The fake Redis in use
+    """
+    redis = redis or FakeRedis()
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(patch.object(user_cache, "redis", redis))
+        stack.enter_context(patch.object(ban_registry, "redis", redis))
+        stack.enter_context(patch.object(session_store, "redis", redis))
+        stack.enter_context(patch.object(FastAPILimiter, "redis", redis))
+        stack.enter_context(patch.object(FastAPILimiter, "lua_sha", "fake"))
+        stack.enter_context(patch.object(FastAPILimiter, "prefix", "benchmark"))
+        stack.enter_context(patch.object(FastAPILimiter, "identifier", _fake_identifier))
+        stack.enter_context(patch.object(cloudinary.uploader, "upload", FakeUploader()))
+        stack.enter_context(patch.object(FastMail, "send_message", _send_message))
+        yield redis
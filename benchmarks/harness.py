@@ -0,0 +1,139 @@
+"""
+Latency bookkeeping and the in-process application client used by the benchmarks.
+"""
+import asyncio
+import contextlib
+import os
+import statistics
+import tempfile
+import time
+from collections import defaultdict
+from typing import AsyncIterator, Awaitable, Callable, Dict, List
+
+from httpx import AsyncClient, ASGITransport, Response
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+
+from main import app
+from src.database.db import get_db
+from src.entity.models import Base
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """
+    Nearest-rank percentile.
+
+    :param samples: List[float]: The measured values
+    :param q: float: The percentile, between 0 and 100
+    :return: The value below which q percent of the samples fall
+    """
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Recorder:
+    """Collects request latencies and status codes per route."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        self.elapsed: Dict[str, float] = {}
+
+    async def request(self, client: AsyncClient, route: str, method: str, url: str, **kwargs) -> Response:
+        """
+        Send one request and record it under route, the templated path such as "GET /api/photos/info/{photo_id}".
+        """
+        started = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        self.latencies[route].append(time.perf_counter() - started)
+        self.statuses[route][response.status_code] += 1
+        return response
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        Per route: request count, throughput over the wall time of the scenarios that used it,
+        p50/p95/p99/max latency in milliseconds and the status code histogram.
+        """
+        report = {}
+        for route, samples in sorted(self.latencies.items()):
+            elapsed = self.elapsed.get(route) or sum(samples)
+            report[route] = {
+                "requests": len(samples),
+                "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+                "p50_ms": round(statistics.median(samples) * 1000, 2),
+                "p95_ms": round(percentile(samples, 95) * 1000, 2),
+                "p99_ms": round(percentile(samples, 99) * 1000, 2),
+                "max_ms": round(max(samples) * 1000, 2),
+                "statuses": {str(code): count for code, count in sorted(self.statuses[route].items())},
+            }
+        return report
+
+
+async def run_concurrently(
+        recorder: Recorder,
+        routes: List[str],
+        jobs: List[Callable[[], Awaitable[None]]],
+        concurrency: int,
+) -> float:
+    """
+    Run the jobs with at most concurrency of them in flight and charge the wall time to routes.
+
+    :return: The wall time in seconds
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def guarded(job):
+        async with semaphore:
+            await job()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(guarded(job) for job in jobs))
+    elapsed = time.perf_counter() - started
+    for route in routes:
+        recorder.elapsed[route] = recorder.elapsed.get(route, 0.0) + elapsed
+    return elapsed
+
+
+def create_engine(db_url: str | None) -> AsyncEngine:
+    """
+    An engine for the benchmark database, a fresh SQLite file in a temporary directory by default.
+    SQLite runs in WAL mode with a busy timeout, so concurrent writers queue instead of failing.
+    """
+    if db_url is not None:
+        return create_async_engine(db_url)
+    db_path = os.path.join(tempfile.mkdtemp(prefix="photoshare-bench-"), "bench.db")
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}", connect_args={"timeout": 30})
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def set_sqlite_pragma(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+    return engine
+
+
+@contextlib.asynccontextmanager
+async def application(engine: AsyncEngine) -> AsyncIterator[tuple[AsyncClient, async_sessionmaker]]:
+    """
+    Create the schema, point get_db at engine and yield a client talking to the app in process.
+    Unhandled errors of the app are recorded as 500 responses instead of aborting the run.
+    """
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    session_maker = async_sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+    async def override_get_db():
+        async with session_maker() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app, raise_app_exceptions=False), base_url="http://bench", timeout=None) as client:
+            yield client, session_maker
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+        await engine.dispose()
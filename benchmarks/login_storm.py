@@ -0,0 +1,112 @@
+"""
+Latency of a non-auth route while a login storm runs on the same worker.
+
+Usage:
+    python -m benchmarks.login_storm --logins 200 --mode async
+    python -m benchmarks.login_storm --logins 200 --mode sync
+
+``sync`` reproduces the old behaviour (bcrypt on the event loop) for comparison.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+from unittest.mock import patch
+
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from benchmarks.fakes import offline
+from benchmarks.harness import percentile
+from main import app
+from src.database.db import get_db
+from src.entity.models import Base, User
+from src.services.auth import Auth, auth_service
+
+EMAIL = "storm@example.com"
+PASSWORD = "12345678"
+
+
+async def run(logins: int, concurrency: int, mode: str) -> dict:
+    db_path = os.path.join(tempfile.mkdtemp(), "login_storm.db")
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{db_path}", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    session_maker = async_sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with session_maker() as session:
+        password = await auth_service.get_password_hash_async(PASSWORD)
+        session.add(User(username="storm", email=EMAIL, password=password, verified=True))
+        await session.commit()
+
+    async def override_get_db():
+        async with session_maker() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    probe_latencies: list[float] = []
+    login_latencies: list[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def blocking_verify(self, plain_password, hashed_password):
+        return self.verify_password(plain_password, hashed_password)
+
+    async def login(client: AsyncClient):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.post("/api/auth/login", data={"username": EMAIL, "password": PASSWORD})
+            login_latencies.append(time.perf_counter() - started)
+            assert response.status_code == 200, response.text
+
+    async def probe(client: AsyncClient, stop: asyncio.Event):
+        while not stop.is_set():
+            started = time.perf_counter()
+            response = await client.get("/api/healthchecker")
+            probe_latencies.append(time.perf_counter() - started)
+            assert response.status_code == 200, response.text
+            await asyncio.sleep(0.005)
+
+    verify = blocking_verify if mode == "sync" else Auth.verify_password_async
+    with offline(), patch.object(Auth, "verify_password_async", verify):
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+            stop = asyncio.Event()
+            probe_task = asyncio.create_task(probe(client, stop))
+            started = time.perf_counter()
+            await asyncio.gather(*(login(client) for _ in range(logins)))
+            elapsed = time.perf_counter() - started
+            stop.set()
+            await probe_task
+
+    app.dependency_overrides.clear()
+    await engine.dispose()
+    return {
+        "mode": mode,
+        "logins": logins,
+        "concurrency": concurrency,
+        "logins_per_second": round(logins / elapsed, 2),
+        "probe_requests": len(probe_latencies),
+        "probe_p50_ms": round(statistics.median(probe_latencies) * 1000, 2),
+        "probe_p99_ms": round(percentile(probe_latencies, 99) * 1000, 2),
+        "probe_max_ms": round(max(probe_latencies) * 1000, 2),
+        "login_p99_ms": round(percentile(login_latencies, 99) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--mode", choices=["async", "sync"], default="async")
+    args = parser.parse_args()
+    result = asyncio.run(run(args.logins, args.concurrency, args.mode))
+    auth_service.shutdown_hashing()
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+In-process load test of the HTTP API.
+
+Seeds a dataset, runs the selected scenarios concurrently against the app over
+httpx.ASGITransport, with Redis, Cloudinary and SMTP replaced by local fakes,
+and writes per-route throughput and latency percentiles as JSON.
+
+Usage:
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.run --scenarios feed,photo_info --requests 500 --concurrency 50
+    python -m benchmarks.run --users 200 --photos-per-user 20 --db-url postgresql+asyncpg://...
+
+Compare two runs with any JSON diff, the keys are stable between commits.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+from dataclasses import asdict
+
+from benchmarks.fakes import offline
+from benchmarks.harness import Recorder, application, create_engine
+from benchmarks.scenarios import SCENARIOS, Workload, issue_tokens
+from benchmarks.seed import DatasetConfig, seed
+from src.services.auth import auth_service
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args: argparse.Namespace) -> dict:
+    config = DatasetConfig(
+        users=args.users,
+        photos_per_user=args.photos_per_user,
+        tags=args.tags,
+        tags_per_photo=args.tags_per_photo,
+        comments_per_photo=args.comments_per_photo,
+        ratings_per_photo=args.ratings_per_photo,
+        seed=args.seed,
+    )
+    recorder = Recorder()
+    with offline():
+        async with application(create_engine(args.db_url)) as (client, session_maker):
+            started = time.perf_counter()
+            dataset = await seed(session_maker, config)
+            seed_seconds = time.perf_counter() - started
+            workload = Workload(
+                client=client,
+                recorder=recorder,
+                dataset=dataset,
+                tokens=await issue_tokens(dataset),
+                requests=args.requests,
+                concurrency=args.concurrency,
+                rng=random.Random(args.seed),
+            )
+            for name in args.scenarios:
+                await SCENARIOS[name](workload)
+    return {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "database": args.db_url.split("://")[0] if args.db_url else "sqlite+aiosqlite",
+        "dataset": asdict(config),
+        "seed_seconds": round(seed_seconds, 2),
+        "scenarios": args.scenarios,
+        "requests_per_scenario": args.requests,
+        "concurrency": args.concurrency,
+        "routes": recorder.summary(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"comma separated, any of: {', '.join(SCENARIOS)}")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--photos-per-user", type=int, default=10)
+    parser.add_argument("--tags", type=int, default=100)
+    parser.add_argument("--tags-per-photo", type=int, default=3)
+    parser.add_argument("--comments-per-photo", type=int, default=5)
+    parser.add_argument("--ratings-per-photo", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db-url", default=None, help="defaults to a temporary SQLite file")
+    parser.add_argument("--output", default=None, help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    result = asyncio.run(run(args))
+    auth_service.shutdown_hashing()
+    report = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(report + "\n")
+    else:
+        sys.stdout.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Concurrent workloads against the API. Every scenario takes the same arguments
+and records its requests under the templated route path.
+"""
+import random
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List
+
+from httpx import AsyncClient
+
+from benchmarks.harness import Recorder, run_concurrently
+from benchmarks.seed import Dataset
+from src.schemas.rating import PhotoRating
+from src.services.auth import auth_service
+
+
+@dataclass
+class Workload:
+    client: AsyncClient
+    recorder: Recorder
+    dataset: Dataset
+    tokens: Dict[str, str]
+    requests: int
+    concurrency: int
+    rng: random.Random
+
+    def headers(self, email: str) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.tokens[email]}"}
+
+
+async def issue_tokens(dataset: Dataset) -> Dict[str, str]:
+    """Access tokens for every seeded user, signed directly so that bcrypt stays out of the other scenarios."""
+    return {email: await auth_service.create_access_token(data={"sub": email}) for email in dataset.emails}
+
+
+async def login_storm(w: Workload) -> None:
+    route = "POST /api/auth/login"
+
+    def job(email: str):
+        async def run():
+            await w.recorder.request(
+                w.client, route, "POST", "/api/auth/login",
+                data={"username": email, "password": w.dataset.password},
+            )
+        return run
+
+    jobs = [job(w.rng.choice(w.dataset.emails)) for _ in range(w.requests)]
+    await run_concurrently(w.recorder, [route], jobs, w.concurrency)
+
+
+async def feed(w: Workload) -> None:
+    own_route = "GET /api/photos/all/"
+    all_route = "GET /api/photos/all"
+
+    def job(email: str, page: int):
+        async def run():
+            params = {"skip": page * 20, "limit": 20}
+            await w.recorder.request(w.client, own_route, "GET", "/api/photos/all/",
+                                     params=params, headers=w.headers(email))
+            await w.recorder.request(w.client, all_route, "GET", "/api/photos/all",
+                                     params=params, headers=w.headers(email))
+        return run
+
+    pages = max(1, len(w.dataset.photo_ids) // 20)
+    jobs = [job(w.rng.choice(w.dataset.emails), w.rng.randrange(pages)) for _ in range(w.requests)]
+    await run_concurrently(w.recorder, [own_route, all_route], jobs, w.concurrency)
+
+
+async def photo_info(w: Workload) -> None:
+    route = "GET /api/photos/info/{photo_id}"
+
+    def job(email: str, photo_id: int):
+        async def run():
+            await w.recorder.request(w.client, route, "GET", f"/api/photos/info/{photo_id}",
+                                     headers=w.headers(email))
+        return run
+
+    jobs = [job(w.rng.choice(w.dataset.emails), w.rng.choice(w.dataset.photo_ids)) for _ in range(w.requests)]
+    await run_concurrently(w.recorder, [route], jobs, w.concurrency)
+
+
+async def rating_burst(w: Workload) -> None:
+    # Many users rate a handful of hot photos at the same time.
+    route = "POST /api/ratings/photo/{photo_id}"
+    hot = w.dataset.photo_ids[: max(1, len(w.dataset.photo_ids) // 100)]
+    ratings = list(PhotoRating)
+
+    def job(email: str, photo_id: int, rating: PhotoRating):
+        async def run():
+            await w.recorder.request(w.client, route, "POST", f"/api/ratings/photo/{photo_id}",
+                                     params={"select_rating": rating.value}, headers=w.headers(email))
+        return run
+
+    jobs = [
+        job(w.rng.choice(w.dataset.emails), w.rng.choice(hot), w.rng.choice(ratings))
+        for _ in range(w.requests)
+    ]
+    await run_concurrently(w.recorder, [route], jobs, w.concurrency)
+
+
+async def tagging(w: Workload) -> None:
+    route = "POST /api/photos/tag/{photo_id}"
+    email_by_id = dict(zip(w.dataset.user_ids, w.dataset.emails))
+
+    def job(photo_id: int, tags: List[str]):
+        async def run():
+            email = email_by_id[w.dataset.photo_owner[photo_id]]
+            await w.recorder.request(w.client, route, "POST", f"/api/photos/tag/{photo_id}",
+                                     params={"tags": ",".join(tags)}, headers=w.headers(email))
+        return run
+
+    jobs = []
+    for _ in range(w.requests):
+        # Mostly existing tags, one new tag in five.
+        tags = w.rng.sample(w.dataset.tag_names, min(4, len(w.dataset.tag_names)))
+        if w.rng.random() < 0.2:
+            tags.append(f"new{w.rng.randrange(10 ** 6)}")
+        jobs.append(job(w.rng.choice(w.dataset.photo_ids), tags))
+    await run_concurrently(w.recorder, [route], jobs, w.concurrency)
+
+
+SCENARIOS: Dict[str, Callable[[Workload], Awaitable[None]]] = {
+    "login_storm": login_storm,
+    "feed": feed,
+    "photo_info": photo_info,
+    "rating_burst": rating_burst,
+    "tagging": tagging,
+}
@@ -0,0 +1,112 @@
+"""
+Deterministic dataset for the benchmarks.
+"""
+import random
+from dataclasses import dataclass, field
+from typing import List
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from src.entity.models import Comment, Photo, PhotoTag, Rating, Role, Tag, User
+from src.repository import rating as repositories_rating
+from src.repository import users as repositories_users
+from src.services.auth import auth_service
+
+PASSWORD = "benchmark-password"
+
+
+@dataclass
+class DatasetConfig:
+    users: int = 50
+    photos_per_user: int = 10
+    tags: int = 100
+    tags_per_photo: int = 3
+    comments_per_photo: int = 5
+    ratings_per_photo: int = 5
+    seed: int = 42
+
+
+@dataclass
+class Dataset:
+    emails: List[str] = field(default_factory=list)
+    user_ids: List[int] = field(default_factory=list)
+    photo_ids: List[int] = field(default_factory=list)
+    photo_owner: dict = field(default_factory=dict)
+    tag_names: List[str] = field(default_factory=list)
+    password: str = PASSWORD
+
+
+async def seed(session_maker: async_sessionmaker, config: DatasetConfig) -> Dataset:
+    """
+    Fill an empty database with users, photos, tags, comments and ratings.
+    Rows are written with bulk inserts; the user activity counters are rebuilt at the end.
+
+    :param session_maker: async_sessionmaker: Sessions bound to the benchmark database
+    :param config: DatasetConfig: The size of the dataset
+    :return: The ids and names the scenarios pick from
+    """
+    rng = random.Random(config.seed)
+    dataset = Dataset()
+    # bcrypt is slow on purpose, every seeded user shares one hash.
+    password = await auth_service.get_password_hash_async(PASSWORD)
+
+    async with session_maker() as db:
+        users = [
+            {
+                "username": f"bench{i}",
+                "email": f"bench{i}@example.com",
+                "password": password,
+                "verified": True,
+                "role": Role.admin if i == 0 else Role.user,
+            }
+            for i in range(config.users)
+        ]
+        result = await db.execute(insert(User).returning(User.id, User.email), users)
+        for user_id, email in result.all():
+            dataset.user_ids.append(user_id)
+            dataset.emails.append(email)
+
+        tags = [{"name": f"tag{i:04d}"} for i in range(config.tags)]
+        tag_ids = []
+        if tags:
+            result = await db.execute(insert(Tag).returning(Tag.id, Tag.name), tags)
+            for tag_id, name in result.all():
+                tag_ids.append(tag_id)
+                dataset.tag_names.append(name)
+
+        photos = [
+            {
+                "title": f"Photo {user_id}-{n}",
+                "description": f"Benchmark photo {n} of user {user_id}",
+                "file_path": f"https://res.cloudinary.invalid/image/upload/bench/{user_id}/{n}",
+                "user_id": user_id,
+            }
+            for user_id in dataset.user_ids
+            for n in range(config.photos_per_user)
+        ]
+        if photos:
+            result = await db.execute(insert(Photo).returning(Photo.id, Photo.user_id), photos)
+            for photo_id, user_id in result.all():
+                dataset.photo_ids.append(photo_id)
+                dataset.photo_owner[photo_id] = user_id
+
+        photo_tags, comments, ratings = [], [], []
+        for photo_id in dataset.photo_ids:
+            for tag_id in rng.sample(tag_ids, min(config.tags_per_photo, len(tag_ids))):
+                photo_tags.append({"photo_id": photo_id, "tag_id": tag_id})
+            for n in range(config.comments_per_photo):
+                comments.append(
+                    {"content": f"Comment {n}", "user_id": rng.choice(dataset.user_ids), "photo_id": photo_id}
+                )
+            raters = rng.sample(dataset.user_ids, min(config.ratings_per_photo, len(dataset.user_ids)))
+            for user_id in raters:
+                ratings.append({"user_id": user_id, "photo_id": photo_id, "rating": rng.randint(1, 5)})
+        for model, rows in ((PhotoTag, photo_tags), (Comment, comments), (Rating, ratings)):
+            if rows:
+                await db.execute(insert(model), rows)
+        await db.commit()
+
+        await repositories_users.recount_user_counters(None, db)
+        await repositories_rating.recount_photo_ratings(None, db)
+    return dataset
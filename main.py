@@ -1,3 +1,4 @@
+import asyncio
 import os
 import pathlib
 
@@ -7,21 +8,28 @@ from ipaddress import ip_address
 from typing import Callable, List
 import uvicorn
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Depends, HTTPException, Request, status, Query
+from fastapi import FastAPI, Depends, HTTPException, Request, Response, status, Query
 from fastapi.responses import JSONResponse, HTMLResponse
 from fastapi_limiter import FastAPILimiter
 from fastapi.middleware.cors import CORSMiddleware
-from jose import jwt
+from jose import JWTError
 from sqlalchemy import text, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from sqlalchemy.sql import expression
 from starlette.staticfiles import StaticFiles
-from src.database.db import get_db
+from src.database.db import get_db, sessionmanager
 from src.entity.models import Photo
 from src.routes import auth, users, photos, transformation, comments, rating, tags, admin
 
 from src.conf.config import config
+from src.repository import admin as repositories_admin
+from src.services.auth import auth_service
+from src.services.bans import ban_registry
+from src.services.cache import user_cache
+from src.services.storage import storage, LocalStorage
+from src.repository.photos import PHOTO_ORDER, photos_with_variants
+from src.utils.pagination import paginate, set_next_cursor
 from src.utils.py_logger import get_logger
 
 from fastapi.templating import Jinja2Templates
@@ -36,8 +44,6 @@ logger = get_logger(__name__)
 
 load_dotenv()
 
-SECRET_KEY_JWT = os.getenv('SECRET_KEY_JWT')
-
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -58,7 +64,17 @@ tasks, such as connecting to a database or initializing caches.
         password=config.REDIS_PASSWORD,
     )
     await FastAPILimiter.init(r)
+    async with sessionmanager.session() as db:
+        await ban_registry.load(await repositories_admin.get_banned_user_ids(db))
+    listeners = [
+        asyncio.create_task(user_cache.listen()),
+        asyncio.create_task(ban_registry.listen()),
+    ]
     yield
+    for listener in listeners:
+        listener.cancel()
+    auth_service.shutdown_hashing()
+    storage.shutdown()
 
 
 app = FastAPI(lifespan=lifespan, title="PhotoShare", description="API to manage photos", version="1.0.0",
@@ -110,13 +126,19 @@ templates = Jinja2Templates(directory='templates')
 BASE_DIR = pathlib.Path(__file__).parent
 
 app.mount("/static", StaticFiles(directory=BASE_DIR / "static"), name="static")
+if isinstance(storage, LocalStorage):
+    storage.root.mkdir(parents=True, exist_ok=True)
+    app.mount(storage.base_url, StaticFiles(directory=storage.root), name="media")
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
 
 @app.get("/protected-resource")
 async def protected_resource(token: str = Depends(oauth2_scheme)):
-    payload = jwt.decode(token, SECRET_KEY_JWT, algorithms=["HS256"])
+    try:
+        payload = auth_service.decode_token(token)
+    except JWTError:
+        raise HTTPException(status_code=401, detail="Invalid token")
     email = payload.get("sub")
     if not email:
         raise HTTPException(status_code=401, detail="Invalid token")
@@ -145,16 +167,17 @@ async def upload_page(request: Request):
 
 @app.get("/api/photos/all", response_model=List[dict])
 async def get_all_photos(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1),
+    cursor: str | None = None,
     db: AsyncSession = Depends(get_db),
     current_user: str = Depends(oauth2_scheme)
 ):
 
-    expression = select(Photo).offset(skip).limit(limit)
-    result = await db.execute(expression)
-    photos = result.scalars().all()
-    return [{"id": photo.id, "title": photo.title, "description": photo.description, "file_path": photo.file_path} for photo in photos]
+    page = await paginate(db, select(Photo), PHOTO_ORDER, limit, cursor=cursor, skip=skip)
+    set_next_cursor(response, page)
+    return await photos_with_variants(page.items, db)
 
 app.include_router(auth.router, prefix="/api")
 app.include_router(admin.router, prefix="/api")
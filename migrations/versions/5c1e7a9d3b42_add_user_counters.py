@@ -0,0 +1,41 @@
+"""Add user activity counters
+
+Revision ID: 5c1e7a9d3b42
+Revises: 015f9274864f
+Create Date: 2026-10-17 10:12:41.518204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c1e7a9d3b42'
+down_revision: Union[str, None] = '015f9274864f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('count_photo', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('users', sa.Column('count_comment', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('users', sa.Column('count_rating', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('users', sa.Column('count_friendship', sa.Integer(), server_default='0', nullable=False))
+    op.execute(
+        """
+        UPDATE users SET
+            count_photo = (SELECT count(*) FROM photos WHERE photos.user_id = users.id),
+            count_comment = (SELECT count(*) FROM comments WHERE comments.user_id = users.id),
+            count_rating = (SELECT count(*) FROM ratings WHERE ratings.user_id = users.id),
+            count_friendship = (SELECT count(*) FROM friendships WHERE friendships.user_id = users.id)
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'count_friendship')
+    op.drop_column('users', 'count_rating')
+    op.drop_column('users', 'count_comment')
+    op.drop_column('users', 'count_photo')
@@ -0,0 +1,26 @@
+"""Drop users.refresh_token, refresh sessions live in Redis
+
+Revision ID: 8d2f4b6a1c07
+Revises: 5c1e7a9d3b42
+Create Date: 2026-10-17 13:40:05.227319
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d2f4b6a1c07'
+down_revision: Union[str, None] = '5c1e7a9d3b42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.drop_column('users', 'refresh_token')
+
+
+def downgrade() -> None:
+    op.add_column('users', sa.Column('refresh_token', sa.VARCHAR(length=255), autoincrement=False, nullable=True))
@@ -0,0 +1,28 @@
+"""Version photos and timestamp tags for conditional requests
+
+Revision ID: a8c4e1f6b2d9
+Revises: f3a9c5e7b142
+Create Date: 2026-10-17 20:41:37.215804
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a8c4e1f6b2d9'
+down_revision: Union[str, None] = 'f3a9c5e7b142'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('photos', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('tags', sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('tags', 'updated_at')
+    op.drop_column('photos', 'version')
@@ -0,0 +1,46 @@
+"""Add rating aggregates to photos
+
+Revision ID: b2d7f0c3e915
+Revises: a8c4e1f6b2d9
+Create Date: 2026-10-17 21:18:52.407113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b2d7f0c3e915'
+down_revision: Union[str, None] = 'a8c4e1f6b2d9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+STARS = range(1, 6)
+
+
+def upgrade() -> None:
+    op.add_column('photos', sa.Column('rating_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('photos', sa.Column('rating_sum', sa.Integer(), server_default='0', nullable=False))
+    for star in STARS:
+        op.add_column('photos', sa.Column(f'rating_{star}', sa.Integer(), server_default='0', nullable=False))
+    stars = ",\n".join(
+        f"rating_{star} = (SELECT count(*) FROM ratings WHERE ratings.photo_id = photos.id AND ratings.rating = {star})"
+        for star in STARS
+    )
+    op.execute(
+        f"""
+        UPDATE photos SET
+            rating_count = (SELECT count(*) FROM ratings WHERE ratings.photo_id = photos.id),
+            rating_sum = (SELECT coalesce(sum(rating), 0) FROM ratings WHERE ratings.photo_id = photos.id),
+            {stars}
+        """
+    )
+
+
+def downgrade() -> None:
+    for star in reversed(STARS):
+        op.drop_column('photos', f'rating_{star}')
+    op.drop_column('photos', 'rating_sum')
+    op.drop_column('photos', 'rating_count')
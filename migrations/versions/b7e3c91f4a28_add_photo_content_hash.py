@@ -0,0 +1,28 @@
+"""Add photos.content_hash for deduplicated uploads
+
+Revision ID: b7e3c91f4a28
+Revises: 8d2f4b6a1c07
+Create Date: 2026-10-17 15:02:48.913370
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e3c91f4a28'
+down_revision: Union[str, None] = '8d2f4b6a1c07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('photos', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.create_index(op.f('ix_photos_content_hash'), 'photos', ['content_hash'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_photos_content_hash'), table_name='photos')
+    op.drop_column('photos', 'content_hash')
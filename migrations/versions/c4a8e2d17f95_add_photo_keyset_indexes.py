@@ -0,0 +1,28 @@
+"""Add (created_at, id) indexes for keyset pagination of photos
+
+Revision ID: c4a8e2d17f95
+Revises: b7e3c91f4a28
+Create Date: 2026-10-17 16:21:09.402156
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4a8e2d17f95'
+down_revision: Union[str, None] = 'b7e3c91f4a28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_photos_created_at_id', 'photos', ['created_at', 'id'], unique=False)
+    op.create_index('ix_photos_user_id_created_at_id', 'photos', ['user_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_photos_user_id_created_at_id', table_name='photos')
+    op.drop_index('ix_photos_created_at_id', table_name='photos')
@@ -0,0 +1,51 @@
+"""One rating per user and photo
+
+Revision ID: c5e9a2d4f716
+Revises: b2d7f0c3e915
+Create Date: 2026-10-17 21:56:03.842671
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5e9a2d4f716'
+down_revision: Union[str, None] = 'b2d7f0c3e915'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+STARS = range(1, 6)
+
+
+def upgrade() -> None:
+    # Keep the latest rating of every user for every photo, then count what is left again.
+    op.execute(
+        """
+        DELETE FROM ratings WHERE id NOT IN (
+            SELECT max(id) FROM ratings GROUP BY user_id, photo_id
+        )
+        """
+    )
+    op.execute(
+        "UPDATE users SET count_rating = (SELECT count(*) FROM ratings WHERE ratings.user_id = users.id)"
+    )
+    stars = ",\n".join(
+        f"rating_{star} = (SELECT count(*) FROM ratings WHERE ratings.photo_id = photos.id AND ratings.rating = {star})"
+        for star in STARS
+    )
+    op.execute(
+        f"""
+        UPDATE photos SET
+            rating_count = (SELECT count(*) FROM ratings WHERE ratings.photo_id = photos.id),
+            rating_sum = (SELECT coalesce(sum(rating), 0) FROM ratings WHERE ratings.photo_id = photos.id),
+            {stars}
+        """
+    )
+    op.create_unique_constraint('uq_ratings_user_id_photo_id', 'ratings', ['user_id', 'photo_id'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_ratings_user_id_photo_id', 'ratings', type_='unique')
@@ -0,0 +1,35 @@
+"""Trigram index on tag names for suggestions
+
+Revision ID: d8f3b6a1c274
+Revises: c5e9a2d4f716
+Create Date: 2026-10-17 22:34:19.560318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8f3b6a1c274'
+down_revision: Union[str, None] = 'c5e9a2d4f716'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Serves name ILIKE 'prefix%' when the in-memory tag index is cold; PostgreSQL only.
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.create_index(
+        'ix_tags_name_trgm', 'tags', ['name'],
+        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'},
+    )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.drop_index('ix_tags_name_trgm', table_name='tags')
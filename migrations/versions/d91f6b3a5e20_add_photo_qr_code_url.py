@@ -0,0 +1,26 @@
+"""Store the QR code URL on photos
+
+Revision ID: d91f6b3a5e20
+Revises: c4a8e2d17f95
+Create Date: 2026-10-17 17:05:33.118402
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd91f6b3a5e20'
+down_revision: Union[str, None] = 'c4a8e2d17f95'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('photos', sa.Column('qr_code_url', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('photos', 'qr_code_url')
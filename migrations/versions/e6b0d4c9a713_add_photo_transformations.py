@@ -0,0 +1,37 @@
+"""Store transformed variants of photos
+
+Revision ID: e6b0d4c9a713
+Revises: d91f6b3a5e20
+Create Date: 2026-10-17 18:12:47.503916
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6b0d4c9a713'
+down_revision: Union[str, None] = 'd91f6b3a5e20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('photo_transformations',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('photo_id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=50), nullable=True),
+    sa.Column('params_hash', sa.String(length=64), nullable=False),
+    sa.Column('params', sa.Text(), nullable=False),
+    sa.Column('url', sa.String(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['photo_id'], ['photos.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('photo_id', 'params_hash', name='uq_photo_transformations_photo_id_params_hash')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('photo_transformations')
@@ -0,0 +1,30 @@
+"""Store the size of transformed variants
+
+Revision ID: f3a9c5e7b142
+Revises: e6b0d4c9a713
+Create Date: 2026-10-17 19:26:08.664130
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a9c5e7b142'
+down_revision: Union[str, None] = 'e6b0d4c9a713'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('photo_transformations', sa.Column('width', sa.Integer(), nullable=True))
+    op.add_column('photo_transformations', sa.Column('height', sa.Integer(), nullable=True))
+    op.add_column('photo_transformations', sa.Column('bytes', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('photo_transformations', 'bytes')
+    op.drop_column('photo_transformations', 'height')
+    op.drop_column('photo_transformations', 'width')
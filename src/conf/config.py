@@ -16,9 +16,28 @@ class Settings(BaseSettings) :
     REDIS_DOMAIN: str = 'localhost'
     REDIS_PORT: int = 6379
     REDIS_PASSWORD: str | None = None
+    USER_CACHE_TTL: int = 300
+    USER_CACHE_LOCAL_TTL: int = 30
+    USER_CACHE_LOCAL_SIZE: int = 1024
+    TOKEN_CACHE_SIZE: int = 4096
+    REFRESH_TOKEN_TTL: int = 7 * 24 * 60 * 60
+    PASSWORD_HASH_EXECUTOR: str = "thread"
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_CONCURRENCY: int = 8
     CLD_NAME: str = 'SKY'
     CLD_API_KEY: int = 1234567890
     CLD_API_SECRET: str = "secret"
+    STORAGE_BACKEND: str = "cloudinary"
+    STORAGE_LOCAL_ROOT: str = "media"
+    STORAGE_LOCAL_URL: str = "/media"
+    STORAGE_UPLOAD_CONCURRENCY: int = 8
+    BULK_UPLOAD_MAX_FILES: int = 50
+    QR_CACHE_BYTES: int = 16 * 1024 * 1024
+    TRANSFORMATION_EAGER_PRESETS: str = "thumb,square"
+    TRANSFORMATION_WORKERS: int = 2
+    RESPONSIVE_WIDTHS: str = "160,480,1080"
+    RESPONSIVE_FORMAT: str = "webp"
+    TAG_INDEX_TTL: int = 300
 
     @field_validator("ALGORITHM")
     @classmethod
@@ -27,6 +46,20 @@ class Settings(BaseSettings) :
             raise ValueError("algorithm must be HS256 or HS512")
         return v
 
+    @field_validator("PASSWORD_HASH_EXECUTOR")
+    @classmethod
+    def validate_password_hash_executor(cls, v: Any) :
+        if v not in ["thread", "process"] :
+            raise ValueError("password hash executor must be thread or process")
+        return v
+
+    @field_validator("STORAGE_BACKEND")
+    @classmethod
+    def validate_storage_backend(cls, v: Any) :
+        if v not in ["cloudinary", "local"] :
+            raise ValueError("storage backend must be cloudinary or local")
+        return v
+
     model_config = ConfigDict(extra = 'ignore', env_file = ".env", env_file_encoding = "utf-8")  # noqa
 
 
@@ -3,7 +3,11 @@ NOT_PHOTO = "Photo not found"
 NOT_USER = "User not found"
 NOT_COMMENT = "Comment not found"
 NOT_TAG = "Tag not found"
+NOT_PRESET = "Transformation preset not found"
 TOO_MANY_TAGS = "Too many tags!"
+TOO_MANY_FILES = "Too many files in one upload!"
+UPLOAD_FAILED = "Upload failed"
+INVALID_CURSOR = "Invalid cursor"
 NOT_RATING = "Rating not found!"
 NOT_TAG_OR_RULES = "Tag not found or you don't have enough rules"
 NOT_BAN_USER = "Not found banned user"
@@ -27,6 +31,8 @@ class AuthMessages:
     BAN_USER = "You are banned!"
     RESET_PASSWORD_ERROR = "Reset password error!"
     NOT_MATCH_PASSWORD = "Password doesn't match"
+    LOGGED_OUT = "You have been logged out"
+    LOGGED_OUT_ALL = "You have been logged out on all devices"
   
 
 class RolesMessages:
@@ -1,8 +1,11 @@
 import contextlib
+from typing import Callable
 
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import (
     AsyncEngine,
+    AsyncSession,
     async_sessionmaker,
     create_async_engine,
 )
@@ -50,6 +53,20 @@ class DatabaseSessionManager:
 
 sessionmanager = DatabaseSessionManager(config.DB_URL)
 
+# Dialects with INSERT ... ON CONFLICT ... RETURNING.
+CONFLICT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def conflict_insert(db: AsyncSession) -> Callable | None:
+    """
+    The conflict_insert function returns the insert construct of the database of the session
+    that supports on_conflict_do_nothing, or None when the database has none and the caller falls back to a savepoint.
+
+    :param db: AsyncSession: The database session
+    :return: The dialect insert function, or None
+    """
+    return CONFLICT_INSERTS.get(db.bind.dialect.name)
+
 
 async def get_db():
     """
@@ -2,7 +2,8 @@ import enum
 from datetime import date, datetime
 from sqlalchemy import create_engine
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, Date, Integer, ForeignKey, DateTime, func, Enum, Boolean, Column
+from sqlalchemy import String, Date, Integer, ForeignKey, DateTime, func, Enum, Boolean, Column, Index, Text, \
+    UniqueConstraint
 from sqlalchemy.orm import DeclarativeBase
 from src.conf.config import config
 
@@ -25,11 +26,14 @@ class User(Base):
     email: Mapped[str] = mapped_column(String(150), nullable=False, unique=True)
     password: Mapped[str] = mapped_column(String(255), nullable=False)
     avatar: Mapped[str] = mapped_column(String(255), nullable=True)
-    refresh_token: Mapped[str] = mapped_column(String(255), nullable=True)
     created_at: Mapped[date] = mapped_column('created_at', DateTime, default=func.now())
     updated_at: Mapped[date] = mapped_column('updated_at', DateTime, default=func.now(), onupdate=func.now())
     role: Mapped[Enum] = mapped_column('role', Enum(Role), default=Role.user, nullable=True)
     verified: Mapped[bool] = mapped_column(Boolean, default=False, nullable=True)
+    count_photo: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    count_comment: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    count_rating: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    count_friendship: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
     user_photos: Mapped[relationship] = relationship("Photo", back_populates="photos_user",
                                                      cascade="all, delete-orphan")
     user_comments: Mapped[relationship] = relationship("Comment", back_populates="user",
@@ -60,12 +64,28 @@ class Friendship(Base):
 
 class Photo(Base):
     __tablename__ = "photos"
+    __table_args__ = (
+        Index("ix_photos_created_at_id", "created_at", "id"),
+        Index("ix_photos_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     title: Mapped[str] = mapped_column(String, index=True)
     description: Mapped[str] = mapped_column(String, nullable=True)
     file_path: Mapped[str] = mapped_column(String)
     file_path_transform: Mapped[str] = mapped_column(String, nullable=True)
+    content_hash: Mapped[str] = mapped_column(String(64), nullable=True, index=True)
+    qr_code_url: Mapped[str] = mapped_column(String, nullable=True)
+    # Bumped by every change to the photo, its tags, comments or ratings; the ETag of its pages.
+    version: Mapped[int] = mapped_column(Integer, default=1, server_default="1", nullable=False)
+    # Aggregates of the ratings of the photo, kept in step by the rating repository.
+    rating_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    rating_sum: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    rating_1: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    rating_2: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    rating_3: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    rating_4: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    rating_5: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
     user_id: Mapped[int] = mapped_column(Integer, ForeignKey('users.id'))
     created_at: Mapped[date] = mapped_column('created_at', DateTime, default=func.now(), nullable=False)
 
@@ -75,6 +95,26 @@ class Photo(Base):
     ratings_photos: Mapped[relationship] = relationship("Rating", back_populates="photo",
                                                         cascade="all, delete-orphan")
     photo_tags: Mapped[relationship] = relationship("PhotoTag", back_populates="photo", cascade="all, delete-orphan")
+    transformations: Mapped[relationship] = relationship("PhotoTransformation", back_populates="photo",
+                                                         cascade="all, delete-orphan")
+
+
+class PhotoTransformation(Base):
+    __tablename__ = "photo_transformations"
+    __table_args__ = (UniqueConstraint("photo_id", "params_hash", name="uq_photo_transformations_photo_id_params_hash"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    photo_id: Mapped[int] = mapped_column(Integer, ForeignKey('photos.id', ondelete="CASCADE"), nullable=False)
+    name: Mapped[str] = mapped_column(String(50), nullable=True)
+    params_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    params: Mapped[str] = mapped_column(Text, nullable=False)
+    url: Mapped[str] = mapped_column(String, nullable=False)
+    width: Mapped[int] = mapped_column(Integer, nullable=True)
+    height: Mapped[int] = mapped_column(Integer, nullable=True)
+    bytes: Mapped[int] = mapped_column(Integer, nullable=True)
+    created_at: Mapped[date] = mapped_column('created_at', DateTime, default=func.now(), nullable=False)
+
+    photo: Mapped["Photo"] = relationship("Photo", back_populates="transformations")
 
 
 class Comment(Base):
@@ -94,6 +134,7 @@ class Comment(Base):
 
 class Rating(Base):
     __tablename__ = "ratings"
+    __table_args__ = (UniqueConstraint("user_id", "photo_id", name="uq_ratings_user_id_photo_id"),)
 
     id: Mapped[int] = mapped_column(primary_key=True)
     user_id: Mapped[int] = mapped_column(Integer, ForeignKey('users.id'))
@@ -107,9 +148,16 @@ class Rating(Base):
 
 class Tag(Base):
     __tablename__ = "tags"
+    __table_args__ = (
+        # Serves name ILIKE 'prefix%' for tag suggestions; needs pg_trgm, created by the migration.
+        Index("ix_tags_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"})
+        .ddl_if(dialect="postgresql"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(String, unique=True)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=func.now(), onupdate=func.now(),
+                                                 server_default=func.now(), nullable=False)
     photo_tags: Mapped[relationship] = relationship("PhotoTag", back_populates="tag")
 
     # photos_relation: Mapped[relationship] = relationship("Photo", secondary = "photo_tags", backref = "tags")
@@ -9,6 +9,9 @@ from src.conf.config import config
 from src.conf import massages
 from src.database.db import get_db
 from src.entity.models import Photo, BanUser
+from src.repository import users as repositories_users
+from src.services.bans import ban_registry
+from src.utils.pagination import Page, paginate
 
 
 cloudinary.config(
@@ -41,6 +44,7 @@ async def update_photo_description(
             status_code=status.HTTP_404_NOT_FOUND, detail=massages.NOT_PHOTO
         )
     photo.description = description
+    photo.version = Photo.version + 1
     await db.commit()
     await db.refresh(photo)
     return photo
@@ -63,6 +67,7 @@ async def remove_photo(photo_id: int, db: AsyncSession = Depends(get_db)) -> Pho
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail=massages.NOT_PHOTO
         )
+    await repositories_users.release_photo_counters(photo, db)
     await db.delete(photo)
     await db.commit()
     return photo
@@ -102,6 +107,7 @@ async def create_ban_by_user_id(user_id: int, db: AsyncSession) -> BanUser:
     db.add(ban_user)
     await db.commit()
     await db.refresh(ban_user)
+    await ban_registry.add(user_id)
     return ban_user
 
 
@@ -126,26 +132,25 @@ async def delete_ban_by_user_id(
         )
     await db.delete(ban_user)
     await db.commit()
+    await ban_registry.remove(user_id)
     return ban_user
 
 
 async def get_ban_users(
-    skip: int, limit: int, db: AsyncSession = Depends(get_db)
-) -> List[BanUser]:
+    skip: int, limit: int, db: AsyncSession = Depends(get_db), cursor: str | None = None
+) -> Page[BanUser]:
     """
-    The get_ban_users function returns a list of ban_users.
-        The skip and limit parameters are used to paginate the results.
+    The get_ban_users function returns a page of ban_users, in the order they were banned.
+        The cursor, or the skip parameter for older clients, and limit are used to paginate the results.
         
     
-    :param skip: int: Skip the first n ban users
+    :param skip: int: Skip the first n ban users, used when there is no cursor
     :param limit: int: Limit the number of ban_users returned
     :param db: AsyncSession: Pass in the database session
-    :return: A list of banuser objects
+    :param cursor: str | None: The cursor of the page, from the previous page
+    :return: The banuser objects of the page and the cursor of the next one
     """
-    expression = select(BanUser).offset(skip).limit(limit)
-    ban_users = await db.execute(expression)
-    ban_users = ban_users.all()
-    return ban_users
+    return await paginate(db, select(BanUser), (BanUser.id,), limit, cursor=cursor, skip=skip)
 
 
 async def get_ban_by_user_id(
@@ -163,3 +168,15 @@ async def get_ban_by_user_id(
     ban_user = await db.execute(filter_user)
     ban_user = ban_user.scalar_one_or_none()
     return ban_user
+
+
+async def get_banned_user_ids(db: AsyncSession) -> List[int]:
+    """
+    The get_banned_user_ids function returns the ids of all banned users.
+    It is used to seed the ban registry on startup.
+
+    :param db: AsyncSession: Pass the database session to the function
+    :return: A list of user ids
+    """
+    result = await db.execute(select(BanUser.user_id))
+    return list(result.scalars().all())
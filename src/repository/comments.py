@@ -8,6 +8,8 @@ from src.entity.models import Comment, User
 from src.conf import massages
 from src.schemas.photo import SortDirection
 from src.database.db import get_db
+from src.repository import photos as repositories_photos
+from src.repository import users as repositories_users
 
 
 async def add_comment(
@@ -24,6 +26,8 @@ async def add_comment(
     """
     new_comment = Comment(content=comment_text, user_id=user.id, photo_id=photo_id)
     db.add(new_comment)
+    await repositories_users.update_user_counters(user.id, db, count_comment=1)
+    await repositories_photos.bump_photo_version(photo_id, db)
     await db.commit()
     await db.refresh(new_comment)
     return new_comment
@@ -95,6 +99,7 @@ async def update_comment(
     if get_comment is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=massages.NOT_COMMENT)
     get_comment.content = comment_text
+    await repositories_photos.bump_photo_version(get_comment.photo_id, db)
     await db.commit()
     await db.refresh(get_comment)
     return get_comment
@@ -117,6 +122,8 @@ async def delete_comment(
     get_comment = select_comment.scalar_one_or_none()
     if get_comment is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=massages.NOT_COMMENT)
+    await repositories_users.update_user_counters(get_comment.user_id, db, count_comment=-1)
+    await repositories_photos.bump_photo_version(get_comment.photo_id, db)
     await db.delete(get_comment)
     await db.commit()
     return get_comment
@@ -1,28 +1,35 @@
-import random
-import string
-import cloudinary
-import cloudinary.uploader
+import asyncio
+import os
+from collections import Counter
 from fastapi import Depends, UploadFile, File, HTTPException, status
-from sqlalchemy import select
+from sqlalchemy import select, func, update, delete, insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from libgravatar import Gravatar
 
-from typing import List
+from typing import Any, Dict, List
 
-from src.conf.config import config
 from src.conf import massages
 from src.database.db import get_db
 from src.entity.models import User, Photo, PhotoTag, Tag, Comment, Rating
-from src.schemas.photo import PhotoTagResponse, ViewAllPhotos, SortDirection, UserRatingContents
+from src.schemas.photo import (
+    PhotoTagResponse,
+    ViewAllPhotos,
+    SortDirection,
+    UserRatingContents,
+    BulkPhotoResult,
+    BulkPhotoResponse,
+    PhotoResponse,
+    PhotoVariant,
+)
 from src.repository import tags as repositories_tags
 from src.repository import qr_code as repositories_qr_code
+from src.repository import transformation as repositories_transformations
+from src.repository import users as repositories_users
+from src.services.storage import storage, hash_upload
+from src.services.tag_index import tag_index
+from src.utils.pagination import Page, paginate
 
-cloudinary.config(
-    cloud_name=config.CLD_NAME,
-    api_key=config.CLD_API_KEY,
-    api_secret=config.CLD_API_SECRET,
-    secure=True,
-)
+PHOTO_ORDER = (Photo.created_at, Photo.id)
 
 
 async def get_photo_by_id(
@@ -46,22 +53,51 @@ async def get_photo_by_id(
     return photo
 
 
+async def get_photo_version(photo_id: int, db: AsyncSession, user: User | None = None) -> int | None:
+    """
+    The get_photo_version function reads only the version of a photo, to build its ETag
+    before the photo and the rows around it are loaded.
+
+    :param photo_id: int: The id of the photo
+    :param db: AsyncSession: The database session
+    :param user: User | None: Only look at the photos of this user
+    :return: The version, or None if there is no such photo
+    """
+    expression = select(Photo.version).where(Photo.id == photo_id)
+    if user is not None:
+        expression = expression.where(Photo.user_id == user.id)
+    result = await db.execute(expression)
+    return result.scalar_one_or_none()
+
+
+async def bump_photo_version(photo_id: int, db: AsyncSession) -> None:
+    """
+    The bump_photo_version function marks a photo as changed, so that the copies clients keep
+    of its pages, comments and ratings are sent again. The increment is done by the database,
+    concurrent changes never end up with the same version. Nothing is committed.
+
+    :param photo_id: int: The id of the photo
+    :param db: AsyncSession: The database session
+    :return: None
+    """
+    await db.execute(update(Photo).where(Photo.id == photo_id).values(version=Photo.version + 1))
+
+
 async def get_photos(
-        skip: int, limit: int, user: User, db: AsyncSession = Depends(get_db)
-) -> List[Photo]:
+        skip: int, limit: int, user: User, db: AsyncSession = Depends(get_db), cursor: str | None = None
+) -> Page[Photo]:
     """
-    Get photos for a given user.
+    Get photos for a given user, oldest first.
 
-    :param skip: int: Skip a number of photos
+    :param skip: int: Skip a number of photos, used when there is no cursor
     :param limit: int: Limit the number of photos returned
     :param user: User: The user to get photos for
     :param db: AsyncSession: The database session
-    :return: List[Photo]: A list of photo objects
+    :param cursor: str | None: The cursor of the page, from the previous page
+    :return: Page[Photo]: The photos of the page and the cursor of the next one
     """
-    expression = select(Photo).filter_by(user_id=user.id).offset(skip).limit(limit)
-    photos = await db.execute(expression)
-    photos = photos.all()
-    return photos
+    expression = select(Photo).filter_by(user_id=user.id)
+    return await paginate(db, expression, PHOTO_ORDER, limit, cursor=cursor, skip=skip)
 
 
 async def create_photo(
@@ -85,24 +121,155 @@ async def create_photo(
     :param : Get the current user from the database
     :return: A photo object
     """
-    letters = string.ascii_lowercase
-    random_name = "".join(random.choice(letters) for _ in range(20))
-    public_id = f"PhotoShare/{user.email}/{random_name}"
-    res_photo = cloudinary.uploader.upload(
-        file.file, public_id=public_id, overwrite=True
+    # Files are stored under their SHA-256, a file uploaded before is not uploaded again.
+    content_hash = await hash_upload(file)
+    result = await db.execute(
+        select(Photo.file_path).where(Photo.content_hash == content_hash).limit(1)
     )
+    file_path = result.scalar_one_or_none()
+    if file_path is None:
+        stored = await storage.upload(file.file, f"PhotoShare/{content_hash}")
+        file_path = stored.url
     photo = Photo(
         title=title,
         description=description,
-        file_path=res_photo.get("url"),
+        file_path=file_path,
+        content_hash=content_hash,
         user_id=user.id,
     )
     db.add(photo)
+    await repositories_users.update_user_counters(user.id, db, count_photo=1)
     await db.commit()
     await db.refresh(photo)
     return photo
 
 
+async def photos_with_variants(photos: List[Photo], db: AsyncSession) -> List[Dict[str, Any]]:
+    """
+    The photos_with_variants function prepares a page of photos for a listing response.
+    Every photo comes with its responsive variants, narrowest first, so clients can build a srcset
+    instead of downloading the original; all variants are loaded with one query.
+
+    :param photos: List[Photo]: The photos of the page
+    :param db: AsyncSession: Get the database session
+    :return: A list of dictionaries shaped like PhotoResponse
+    """
+    variants = await repositories_transformations.get_responsive_variants([photo.id for photo in photos], db)
+    return [
+        {
+            "id": photo.id,
+            "title": photo.title,
+            "description": photo.description,
+            "file_path": photo.file_path,
+            "variants": [
+                PhotoVariant.model_validate(variant).model_dump() for variant in variants.get(photo.id, [])
+            ],
+        }
+        for photo in photos
+    ]
+
+
+def parse_tags(tags: str | None) -> List[str]:
+    """
+    The parse_tags function splits a comma separated list of tags, as sent by the forms.
+    Blank and repeated names are dropped, then at most 5 tags are kept, like in create_tag_photo.
+
+    :param tags: str | None: The comma separated tags
+    :return: A list of tag names
+    """
+    names = [name.strip() for name in (tags or "").split(",")]
+    return list(dict.fromkeys(name for name in names if name))[:5]
+
+
+async def create_photos(
+        files: List[UploadFile],
+        description: str | None,
+        tags: List[str],
+        user: User,
+        db: AsyncSession = Depends(get_db),
+) -> BulkPhotoResponse:
+    """
+    The create_photos function stores many uploaded photos at once.
+    Files are hashed, files already stored are reused and the others are uploaded concurrently;
+    the storage backend bounds how many uploads run at the same time. All Photo rows and their tags
+    are then written in one transaction. A failed upload does not fail the other files,
+    it is reported in the result of its file.
+
+    :param files: List[UploadFile]: The uploaded files, the title of a photo is its file name
+    :param description: str | None: The description given to every photo
+    :param tags: List[str]: The tags given to every photo
+    :param user: User: The owner of the photos
+    :param db: AsyncSession: Get the database session
+    :return: The number of created and failed photos and the result of every file
+    """
+    hashes = [await hash_upload(file) for file in files]
+    result = await db.execute(
+        select(Photo.content_hash, Photo.file_path).where(Photo.content_hash.in_(set(hashes)))
+    )
+    file_paths = dict(result.all())
+
+    # One upload per distinct new content, also when the same file is sent twice.
+    pending = {}
+    for file, content_hash in zip(files, hashes):
+        if content_hash not in file_paths and content_hash not in pending:
+            pending[content_hash] = file
+    uploads = await asyncio.gather(
+        *(storage.upload(file.file, f"PhotoShare/{content_hash}") for content_hash, file in pending.items()),
+        return_exceptions=True,
+    )
+    errors = {}
+    for content_hash, stored in zip(pending, uploads):
+        if isinstance(stored, Exception):
+            errors[content_hash] = stored
+        else:
+            file_paths[content_hash] = stored.url
+
+    photos = []
+    for file, content_hash in zip(files, hashes):
+        if content_hash in errors:
+            photos.append(None)
+            continue
+        title = os.path.splitext(file.filename or "")[0] or content_hash[:12]
+        photos.append(
+            Photo(
+                title=title[:50],
+                description=description,
+                file_path=file_paths[content_hash],
+                content_hash=content_hash,
+                user_id=user.id,
+            )
+        )
+    created = [photo for photo in photos if photo is not None]
+    if created:
+        db.add_all(created)
+        await db.flush()
+        tag_rows = await repositories_tags.get_or_create_tags(tags, db)
+        new_tags = {tag.id: tag.name for tag in tag_rows}
+        db.add_all(PhotoTag(photo_id=photo.id, tag_id=tag_id) for photo in created for tag_id in new_tags)
+        await repositories_users.update_user_counters(user.id, db, count_photo=len(created))
+        await db.commit()
+        for tag_id, name in new_tags.items():
+            tag_index.add(tag_id, name)
+        tag_index.use(dict.fromkeys(new_tags, len(created)))
+
+    results = []
+    for file, content_hash, photo in zip(files, hashes, photos):
+        if photo is None:
+            results.append(
+                BulkPhotoResult(filename=file.filename or "", error=f"{massages.UPLOAD_FAILED}: {errors[content_hash]}")
+            )
+        else:
+            results.append(
+                BulkPhotoResult(
+                    filename=file.filename or "",
+                    photo=PhotoResponse(
+                        id=photo.id, title=photo.title, description=photo.description or "", file_path=photo.file_path
+                    ),
+                )
+            )
+    return BulkPhotoResponse(created=len(created), failed=len(files) - len(created), results=results)
+
+
 async def update_photo_description(
         photo_id: int, description: str, user: User, db: AsyncSession = Depends(get_db)
 ) -> Photo:
@@ -123,6 +290,7 @@ async def update_photo_description(
             status_code=status.HTTP_404_NOT_FOUND, detail=massages.NOT_PHOTO
         )
     photo.description = description
+    photo.version = Photo.version + 1
     await db.commit()
     await db.refresh(photo)
     return photo
@@ -146,6 +314,7 @@ async def remove_photo(
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail=massages.NOT_PHOTO
         )
+    await repositories_users.release_photo_counters(photo, db)
     await db.delete(photo)
     await db.commit()
     return photo
@@ -155,50 +324,61 @@ async def create_tag_photo(photo_id: int,
                            tags: str,
                            user: User,
                            db: AsyncSession = Depends(get_db)) -> PhotoTagResponse:
-    result = await db.execute(select(Photo).where(Photo.id == photo_id, Photo.user_id == user.id))
-    photo = result.scalar_one_or_none()
+    """
+    The create_tag_photo function replaces the tags of a photo of the user.
+    Everything happens in one transaction and a fixed number of statements, whatever the number of tags:
+    the missing tags are created in bulk, the old links are deleted and the new ones inserted at once.
+
+    :param photo_id: int: The id of the photo
+    :param tags: str: The comma separated tags, at most 5 are kept
+    :param user: User: The owner of the photo
+    :param db: AsyncSession: Get the database session
+    :return: The photo with its new tags
+    """
+    result = await db.execute(
+        select(Photo.title, Photo.description).where(Photo.id == photo_id, Photo.user_id == user.id)
+    )
+    photo = result.one_or_none()
     if not photo:
         raise HTTPException(status_code=404, detail="Photo not found!")
 
-    find_photo_tag = select(PhotoTag).filter(PhotoTag.photo_id == photo_id)
-    result = await db.execute(find_photo_tag)
-    photo_tags = result.scalars().all()
-    for photo_tag in photo_tags:
-        await db.delete(photo_tag)
-
-    tag_list = tags.split(',')
-    if len(tag_list) > 5:
-        tag_list = tag_list[:5]
-
-    for tag_name in tag_list:
-        find_tag = await db.execute(select(Tag).where(Tag.name == tag_name))
-        tag = find_tag.scalar_one_or_none()
-        if not tag:
-            add_tag = Tag(name=tag_name)
-            db.add(add_tag)
-            await db.commit()
-            await db.refresh(add_tag)
-            tag = add_tag
-
-        photo_tag = PhotoTag(photo_id=photo_id, tag_id=tag.id)
-        db.add(photo_tag)
-        await db.commit()
-        await db.refresh(photo_tag)
-
+    tag_rows = await repositories_tags.get_or_create_tags(parse_tags(tags), db)
+    new_tags = {tag.id: tag.name for tag in tag_rows}
+    result = await db.execute(delete(PhotoTag).where(PhotoTag.photo_id == photo_id).returning(PhotoTag.tag_id))
+    old_tag_ids = result.scalars().all()
+    if new_tags:
+        await db.execute(insert(PhotoTag), [{"photo_id": photo_id, "tag_id": tag_id} for tag_id in new_tags])
+    await bump_photo_version(photo_id, db)
     await db.commit()
-    await db.refresh(photo)
+
+    for tag_id, name in new_tags.items():
+        tag_index.add(tag_id, name)
+    usage = Counter(new_tags.keys())
+    usage.subtract(old_tag_ids)
+    tag_index.use(usage)
 
     return PhotoTagResponse(
-        id=photo.id,
+        id=photo_id,
         title=photo.title,
-        description=photo.description,
-        tags=tag_list,
+        description=photo.description or "",
+        tags=list(new_tags.values()),
     )
 
 
 async def view_all_info_photo(photo_id: int,
                               user: User,
                               db: AsyncSession = Depends(get_db)) -> ViewAllPhotos:
+    """
+    The view_all_info_photo function collects everything shown on the page of a photo:
+    its tags, its comments with the name and rating of their authors, and the average rating.
+    It runs three queries however many tags, comments and ratings the photo has;
+    the QR code is made on the first view of the photo only.
+
+    :param photo_id: int: The id of the photo
+    :param user: User: The current user
+    :param db: AsyncSession: Get the database session
+    :return: The photo with its tags, comments, average rating and QR code
+    """
     # выбрать фото
     result = await db.execute(select(Photo).where(Photo.id == photo_id))
     photo = result.scalar_one_or_none()
@@ -206,62 +386,38 @@ async def view_all_info_photo(photo_id: int,
         raise HTTPException(status_code=404, detail="Photo not found!")
 
     # выборка тегов
-    list_tags = []
-    find_photo_tag = select(PhotoTag).filter(PhotoTag.photo_id == photo_id)
-    result = await db.execute(find_photo_tag)
-    photo_tags = result.scalars().all()
-    for photo_tag in photo_tags:
-        find_tag = await db.execute(select(Tag).where(Tag.id == photo_tag.tag_id))
-        tag = find_tag.scalar_one_or_none()
-        if tag:
-            list_tags.append(tag.name)
-
-    # выборка комментариев
-    ratings_data = []
-    select_comments = select(Comment).filter(Comment.photo_id == photo_id)
-    query = select_comments.order_by(Comment.created_at.desc())
-    result = await db.execute(query)
-    comments = result.scalars().all()
-    for user_comment in comments:
-        user_name = "unknown"
-        content = user_comment.content
-
-        # находим пользователя комментария
-        find_user = await db.execute(select(User).where(User.id == user_comment.user_id))
-        comment_user = find_user.scalar_one_or_none()
-        content = ""
-        rating = 0
-        if comment_user:
-            user_name = comment_user.username
-
-            # находим оценку фото от пользователя
-            result = await db.execute(
-                select(Rating).where(Rating.photo_id == photo_id, Rating.user_id == comment_user.id))
-            existing_rating = result.scalar_one_or_none()
-            if existing_rating:
-                rating = existing_rating.rating
-
-            ratings_data.append({"user_name": user_name, "comment": content, "rating": rating})
-
-    result = await db.execute(select(Rating).where(Rating.photo_id == photo_id))
-    ratings = result.scalars().all()
-    number_of_ratings = len(ratings)
-    average_rating = 0
-    if number_of_ratings != 0:
-        total_rating = sum(rating.rating for rating in ratings)
-        average_rating = total_rating / number_of_ratings
-
-    list_rating_contents: List[UserRatingContents] = []
-    for data in ratings_data:
-        rating_content = UserRatingContents(**data)
-        list_rating_contents.append(rating_content)
+    result = await db.execute(
+        select(Tag.name)
+        .join(PhotoTag, PhotoTag.tag_id == Tag.id)
+        .where(PhotoTag.photo_id == photo_id)
+        .order_by(Tag.id)
+    )
+    list_tags = list(result.scalars().all())
+
+    # выборка комментариев с автором и его оценкой фото
+    author_rating = (
+        select(Rating.rating)
+        .where(Rating.photo_id == Comment.photo_id, Rating.user_id == Comment.user_id)
+        .limit(1)
+        .correlate(Comment)
+        .scalar_subquery()
+    )
+    result = await db.execute(
+        select(User.username, Comment.content, func.coalesce(author_rating, 0))
+        .join(User, User.id == Comment.user_id)
+        .where(Comment.photo_id == photo_id)
+        .order_by(Comment.created_at.desc(), Comment.id.desc())
+    )
+    list_rating_contents: List[UserRatingContents] = [
+        UserRatingContents(user_name=user_name, comment=content or "", rating=rating)
+        for user_name, content, rating in result.all()
+    ]
+
+    # The aggregates on the photo replace a scan of its ratings.
+    average_rating = photo.rating_sum / photo.rating_count if photo.rating_count else 0.0
 
     # gr
-    data = photo.file_path
-    img_byte_arr = await repositories_qr_code.generate_qr_code(data)
-    file_path_gr = await repositories_qr_code.upload_qr_to_cloudinary(
-        img_byte_arr, f"{photo.title}"
-    )
+    file_path_gr = await repositories_qr_code.get_or_create_qr_code(photo, db)
 
     return ViewAllPhotos(
         id=photo.id,
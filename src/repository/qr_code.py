@@ -1,40 +1,51 @@
-import qrcode
-import cloudinary
-import cloudinary.uploader
+import asyncio
 from io import BytesIO
-from src.conf.config import config
 
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
 
-cloudinary.config(
-    cloud_name=config.CLD_NAME,
-    api_key=config.CLD_API_KEY,
-    api_secret=config.CLD_API_SECRET,
-    secure=True,
-)
+from src.entity.models import Photo
+from src.services.qr_code import render_png
+from src.services.storage import storage
 
 
-async def generate_qr_code(data):
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=4,
-    )
-    qr.add_data(data)
-    qr.make(fit=True)
-    img = qr.make_image(fill_color="black", back_color="white")
+def _render_qr_code(data: str) -> BytesIO:
+    return BytesIO(render_png(data))
 
-    img_byte_arr = BytesIO()
-    img.save(img_byte_arr)
-    img_byte_arr.seek(0)
 
-    return img_byte_arr
+async def generate_qr_code(data):
+    # Rendering the PNG is CPU bound, keep it off the event loop.
+    return await asyncio.to_thread(_render_qr_code, data)
 
 
 async def upload_qr_to_cloudinary(img_byte_arr, file_name):
-    response = cloudinary.uploader.upload(
-        file=img_byte_arr,
-        public_id=f"qr_codes/{file_name}",
-        resource_type='image'
+    stored = await storage.upload(img_byte_arr.getvalue(), f"qr_codes/{file_name}")
+    return stored.url
+
+
+async def get_or_create_qr_code(photo: Photo, db: AsyncSession) -> str:
+    """
+    The get_or_create_qr_code function returns the URL of the QR code of the photo's file_path.
+    The QR code is rendered and uploaded on the first request only, under a name derived from the photo id,
+    and its URL is stored on the photo; every later call returns the stored URL without any work.
+
+    :param photo: Photo: The photo, as loaded from the database
+    :param db: AsyncSession: Get the database session
+    :return: The URL of the QR code image
+    """
+    if photo.qr_code_url:
+        return photo.qr_code_url
+    img_byte_arr = await generate_qr_code(photo.file_path)
+    qr_url = await upload_qr_to_cloudinary(img_byte_arr, f"photo_{photo.id}")
+    # Two concurrent first views upload the same file, the first one to commit wins.
+    await db.execute(
+        update(Photo)
+        .where(Photo.id == photo.id, Photo.qr_code_url.is_(None))
+        .values(qr_code_url=qr_url)
+        .execution_options(synchronize_session=False)
     )
-    return response['secure_url']
\ No newline at end of file
+    await db.commit()
+    # Both upload to the same public id, so the loaded photo can take the URL without a reload.
+    set_committed_value(photo, "qr_code_url", qr_url)
+    return qr_url
@@ -2,84 +2,173 @@ from typing import List, Sequence, Optional
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends, HTTPException
-from sqlalchemy import and_, select, func
+from sqlalchemy import and_, select, func, update
+from sqlalchemy.exc import IntegrityError
 
 from src.entity.models import Rating, User, Photo
 from src.schemas.rating import RatingModel, PhotoRating, QuantityRating
-from src.database.db import get_db
+from src.database.db import get_db, conflict_insert
+from src.repository import users as repositories_users
 
 DICT_WITH_STARS = {"one_star" : 1, "two_stars" : 2, "three_stars" : 3, "four_srats" : 4, "five_stars" : 5}
 
+# The column of Photo counting the ratings of every number of stars.
+STAR_COUNTERS = {star: f"rating_{star}" for star in range(1, 6)}
+
+STARS = {
+    PhotoRating.one_star: 1,
+    PhotoRating.two_stars: 2,
+    PhotoRating.three_stars: 3,
+    PhotoRating.four_stars: 4,
+    PhotoRating.five_stars: 5,
+}
+
+
+async def update_photo_rating(photo_id: int, db: AsyncSession, old: int | None = None, new: int | None = None) -> bool:
+    """
+    The update_photo_rating function keeps the rating aggregates of a photo in step with a rating that is
+    added (old is None), changed, or removed (new is None), and bumps the version of the photo.
+    Everything is shifted by the database in one UPDATE, concurrent ratings do not lose each other's changes.
+    It does not commit: the caller commits it in the same transaction as the rating.
+
+    :param photo_id: int: The id of the rated photo
+    :param db: AsyncSession: Pass the database session to the function
+    :param old: int | None: The stars of the rating before the change
+    :param new: int | None: The stars of the rating after the change
+    :return: False if there is no such photo
+    """
+    if old == new:
+        return True
+    values = {
+        "rating_count": Photo.rating_count + (new is not None) - (old is not None),
+        "rating_sum": Photo.rating_sum + (new or 0) - (old or 0),
+        "version": Photo.version + 1,
+    }
+    if old is not None:
+        values[STAR_COUNTERS[old]] = getattr(Photo, STAR_COUNTERS[old]) - 1
+    if new is not None:
+        values[STAR_COUNTERS[new]] = getattr(Photo, STAR_COUNTERS[new]) + 1
+    statement = update(Photo).where(Photo.id == photo_id).values(**values)
+    result = await db.execute(statement.execution_options(synchronize_session=False))
+    return result.rowcount > 0
+
+
+async def recount_photo_ratings(photo_id: int | None, db: AsyncSession) -> None:
+    """
+    The recount_photo_ratings function rebuilds the rating aggregates of photos from the ratings table.
+    It is the repair path for aggregates that drifted, e.g. after ratings were changed by hand.
+
+    :param photo_id: int | None: Recount one photo, or every photo when None
+    :param db: AsyncSession: Pass the database session to the function
+    :return: None
+    """
+    values = {
+        "rating_count": select(func.count(Rating.id)).where(Rating.photo_id == Photo.id).scalar_subquery(),
+        "rating_sum": select(func.coalesce(func.sum(Rating.rating), 0))
+        .where(Rating.photo_id == Photo.id)
+        .scalar_subquery(),
+    }
+    for star, counter in STAR_COUNTERS.items():
+        values[counter] = (
+            select(func.count(Rating.id))
+            .where(Rating.photo_id == Photo.id, Rating.rating == star)
+            .scalar_subquery()
+        )
+    statement = update(Photo).values(**values)
+    if photo_id is not None:
+        statement = statement.where(Photo.id == photo_id)
+    await db.execute(statement.execution_options(synchronize_session=False))
+    await db.commit()
+
+
+async def _insert_rating(photo_id: int, user_id: int, stars: int, db: AsyncSession) -> Rating | None:
+    """
+    The _insert_rating function adds the rating of a user unless the user already rated the photo.
+    The unique (user_id, photo_id) constraint decides, so concurrent requests never make two ratings:
+    one INSERT ... ON CONFLICT DO NOTHING RETURNING where the dialect has it, a savepoint elsewhere.
+
+    :param photo_id: int: The id of the photo
+    :param user_id: int: The id of the user
+    :param stars: int: The number of stars
+    :param db: AsyncSession: Pass the database session to the function
+    :return: The new rating, or None if the user has one already
+    """
+    values = {"user_id": user_id, "photo_id": photo_id, "rating": stars}
+    insert = conflict_insert(db)
+    if insert is not None:
+        statement = (
+            insert(Rating)
+            .values(**values)
+            .on_conflict_do_nothing(index_elements=[Rating.user_id, Rating.photo_id])
+            .returning(Rating)
+        )
+        result = await db.execute(statement)
+        return result.scalar_one_or_none()
+    rating = Rating(**values)
+    try:
+        async with db.begin_nested():
+            db.add(rating)
+    except IntegrityError:
+        return None
+    return rating
+
 
 async def create_rating_for_photo(photo_id: int,
                                   select_rating: PhotoRating,
                                   user: User,
                                   db: AsyncSession = Depends(get_db),
                                   ) -> Rating :
-    count_rating = 0
-    if select_rating == PhotoRating.one_star :
-        count_rating = 1
-    elif select_rating == PhotoRating.two_stars :
-        count_rating = 2
-    elif select_rating == PhotoRating.three_stars :
-        count_rating = 3
-    elif select_rating == PhotoRating.four_stars :
-        count_rating = 4
-    elif select_rating == PhotoRating.five_stars :
-        count_rating = 5
-
-    photo_expression = select(Photo).filter_by(id=photo_id)
-    photos = await db.execute(photo_expression)
-    photo = photos.scalar_one_or_none()
-    if not photo :
+    """
+    The create_rating_for_photo function rates a photo, or changes the rating the user gave it before.
+    A new rating is a single INSERT; an existing one is locked while it and the aggregates of the photo change,
+    so that concurrent requests of the same user count it once.
+
+    :param photo_id: int: The id of the photo
+    :param select_rating: PhotoRating: The number of stars
+    :param user: User: The user who rates the photo
+    :param db: AsyncSession: Pass the database session to the function
+    :return: The rating
+    """
+    stars = STARS[select_rating]
+    try:
+        rating = await _insert_rating(photo_id, user.id, stars, db)
+        if rating is not None:
+            await repositories_users.update_user_counters(user.id, db, count_rating=1)
+            found = await update_photo_rating(photo_id, db, new=stars)
+        else:
+            result = await db.execute(
+                select(Rating).where(Rating.photo_id == photo_id, Rating.user_id == user.id).with_for_update()
+            )
+            rating = result.scalar_one_or_none()
+            found = rating is not None and await update_photo_rating(photo_id, db, old=rating.rating, new=stars)
+            if found:
+                rating.rating = stars
+        await db.flush()
+    except IntegrityError:
+        # The photo does not exist, on a database that enforces the foreign key.
+        found = False
+    if not found:
+        await db.rollback()
         raise HTTPException(status_code=404, detail="Photo not found!")
-
-    result = await db.execute(select(Rating).where(Rating.photo_id == photo_id, Rating.user_id == user.id))
-    existing_rating = result.scalar_one_or_none()
-
-    # Если рейтинг уже существует, возвращаем обновляем существующий рейтинг
-    if existing_rating :
-        existing_rating.rating = count_rating
-        db.add(existing_rating)
-        await db.commit()
-        await db.refresh(existing_rating)
-        return existing_rating
-    else :
-        # Создаем новый рейтинг
-        new_rating = Rating(user_id=user.id, photo_id=photo_id,
-                            rating=count_rating)
-        db.add(new_rating)
-        await db.commit()
-        await db.refresh(new_rating)
-        return new_rating
+    # A detached rating keeps its values through the commit, it is returned without being loaded again.
+    db.expunge(rating)
+    await db.commit()
+    return rating
 
 
 async def get_average_rating(image_id: int, db: AsyncSession) -> QuantityRating :
-    result = await db.execute(select(Rating).where(Rating.photo_id == image_id))
-    ratings = result.scalars().all()
-    if not ratings :
-        # Возвращаем пустой объект QuantityRating, если нет оценок
-        return QuantityRating(
-            number_of_ratings=0,
-            VeryBad=0,
-            Bad=0,
-            Average=0,
-            Good=0,
-            Excellent=0,
-            average_rating=0
-        )
-
-    number_of_ratings = len(ratings)
-    total_rating = sum(rating.rating for rating in ratings)
-    average_rating = total_rating / number_of_ratings
-
-    # Count ratings distribution
-    very_bad = sum(1 for rating in ratings if rating.rating == 1)
-    bad = sum(1 for rating in ratings if rating.rating == 2)
-    average = sum(1 for rating in ratings if rating.rating == 3)
-    good = sum(1 for rating in ratings if rating.rating == 4)
-    excellent = sum(1 for rating in ratings if rating.rating == 5)
-
+    """
+    The get_average_rating function reads the number of ratings of a photo, their distribution and their average
+    from the aggregates kept on the photo, in one row whatever the number of ratings.
+
+    :param image_id: int: The id of the photo
+    :param db: AsyncSession: Pass the database session to the function
+    :return: The number of ratings of every number of stars and the average rating
+    """
+    stars = [getattr(Photo, counter) for counter in STAR_COUNTERS.values()]
+    result = await db.execute(select(Photo.rating_count, Photo.rating_sum, *stars).where(Photo.id == image_id))
+    row = result.one_or_none()
+    number_of_ratings, total_rating, very_bad, bad, average, good, excellent = row or (0,) * 7
     return QuantityRating(
         number_of_ratings=number_of_ratings,
         VeryBad=very_bad,
@@ -87,7 +176,7 @@ async def get_average_rating(image_id: int, db: AsyncSession) -> QuantityRating
         Average=average,
         Good=good,
         Excellent=excellent,
-        average_rating=average_rating
+        average_rating=total_rating / number_of_ratings if number_of_ratings else 0
     )
 
 
@@ -120,6 +209,8 @@ async def remove_rating(photo_id: int,
     photo = result.scalar_one_or_none()
     if not photo :
         raise HTTPException(status_code=404, detail="Photo not found!")
+    await repositories_users.update_user_counters(user.id, db, count_rating=-1)
+    await update_photo_rating(photo_id, db, old=photo.rating)
     await db.delete(photo)
     await db.commit()
     return photo
@@ -1,27 +1,51 @@
-from typing import List, Optional, Type, Sequence
+from datetime import datetime
+from typing import List, Optional, Type, Sequence, Tuple
 
 from fastapi import HTTPException, Form, Depends, status
-from sqlalchemy import select
-from src.entity.models import Tag
+from sqlalchemy import select, func, update
+from sqlalchemy.exc import IntegrityError
+from src.entity.models import Tag, Photo, PhotoTag
 from sqlalchemy.ext.asyncio import AsyncSession
 from src.schemas.tag import TagModel
 
-from src.database.db import get_db
+from src.database.db import get_db, conflict_insert, sessionmanager
 from src.conf import massages
+from src.services.tag_index import TagUsage, tag_index
+from src.utils.pagination import Page, paginate
+from src.utils.py_logger import get_logger
 
+logger = get_logger(__name__)
 
-async def get_tags(skip: int, limit: int, db: AsyncSession) -> Sequence[Tag]:
+
+async def get_tags(skip: int, limit: int, db: AsyncSession, cursor: str | None = None) -> Page[Tag]:
     """
-    The get_tags function returns a list of tags.
+    The get_tags function returns a page of tags, in the order they were created.
     
-    :param skip: int: Skip a number of rows in the database
+    :param skip: int: Skip a number of rows in the database, used when there is no cursor
     :param limit: int: Limit the number of tags returned
     :param db: AsyncSession: Pass a database session to the function
-    :return: A list of tag objects
+    :param cursor: str | None: The cursor of the page, from the previous page
+    :return: The tags of the page and the cursor of the next one
     """
-    result = await db.execute(select(Tag).offset(skip).limit(limit))
-    tags = result.scalars().all()
-    return tags
+    return await paginate(db, select(Tag), (Tag.id,), limit, cursor=cursor, skip=skip)
+
+
+async def get_tags_state(db: AsyncSession) -> Tuple[int, int | None, datetime | None]:
+    """
+    The get_tags_state function summarizes the tags table in one row: any created, renamed or removed tag
+    changes it, so it serves as the version of the tag list without reading the tags.
+
+    :param db: AsyncSession: Pass a database session to the function
+    :return: The number of tags, the greatest id and the time of the last change
+    """
+    result = await db.execute(select(func.count(Tag.id), func.max(Tag.id), func.max(Tag.updated_at)))
+    return tuple(result.one())
+
+
+async def _bump_tagged_photos(tag_id: int, db: AsyncSession) -> None:
+    # The tags are listed on the pages of the photos.
+    tagged = select(PhotoTag.photo_id).where(PhotoTag.tag_id == tag_id)
+    await db.execute(update(Photo).where(Photo.id.in_(tagged)).values(version=Photo.version + 1))
 
 
 async def get_tag(tag_id: int, db: AsyncSession) -> Optional[Tag]:
@@ -64,6 +88,7 @@ async def create_tag(name_tag: str, db: AsyncSession = Depends(get_db)) -> Tag:
     db.add(tag)
     await db.commit()
     await db.refresh(tag)
+    tag_index.add(tag.id, tag.name)
     return tag
 
 
@@ -87,8 +112,10 @@ async def update_tag(tag_id: int, body: TagModel, db: AsyncSession) -> Optional[
             detail=massages.NOT_TAG_OR_RULES,
         )
     tag.name = body.name
+    await _bump_tagged_photos(tag_id, db)
     await db.commit()
     await db.refresh(tag)
+    tag_index.rename(tag.id, tag.name)
     return tag
 
 
@@ -109,8 +136,10 @@ async def remove_tag(tag_id: int, db: AsyncSession) -> Optional[Tag]:
             status_code=status.HTTP_404_NOT_FOUND,
             detail=massages.NOT_TAG_OR_RULES,
         )
+    await _bump_tagged_photos(tag_id, db)
     await db.delete(tag)
     await db.commit()
+    tag_index.remove(tag_id)
     return tag
 
 
@@ -127,6 +156,68 @@ async def get_or_create_tag(tag_name: str, db: AsyncSession) -> Tag:
     return tag
 
 
+async def get_or_create_tags(tag_names: List[str], db: AsyncSession) -> List[Tag]:
+    """
+    The get_or_create_tags function resolves many tag names with one select and inserts the missing ones
+    with one INSERT ... ON CONFLICT DO NOTHING RETURNING. Names another request created in the meantime
+    are not returned by the insert and are selected again, so concurrent requests never fail on the unique name.
+    Databases without ON CONFLICT insert in a savepoint instead.
+    Nothing is committed, the caller owns the transaction.
+
+    :param tag_names: List[str]: The names of the tags, duplicates are ignored
+    :param db: AsyncSession: Pass the database session to the function
+    :return: The tags in the order of their first appearance in tag_names
+    """
+    names = list(dict.fromkeys(tag_names))
+    if not names:
+        return []
+    result = await db.execute(select(Tag).where(Tag.name.in_(names)))
+    tags = {tag.name: tag for tag in result.scalars().all()}
+    missing = [name for name in names if name not in tags]
+    if missing:
+        insert = conflict_insert(db)
+        if insert is not None:
+            statement = insert(Tag).on_conflict_do_nothing(index_elements=[Tag.name]).returning(Tag)
+            result = await db.execute(statement, [{"name": name} for name in missing])
+            tags.update((tag.name, tag) for tag in result.scalars().all())
+            raced = [name for name in missing if name not in tags]
+            if raced:
+                result = await db.execute(select(Tag).where(Tag.name.in_(raced)))
+                tags.update((tag.name, tag) for tag in result.scalars().all())
+        else:
+            try:
+                async with db.begin_nested():
+                    created = [Tag(name=name) for name in missing]
+                    db.add_all(created)
+                tags.update((tag.name, tag) for tag in created)
+            except IntegrityError:
+                # The whole batch was rolled back: take the names created meanwhile, insert the others one by one.
+                result = await db.execute(select(Tag).where(Tag.name.in_(missing)))
+                tags.update((tag.name, tag) for tag in result.scalars().all())
+                for name in missing:
+                    if name not in tags:
+                        tags[name] = await _create_tag(name, db)
+    return [tags[name] for name in names]
+
+
+async def _create_tag(name: str, db: AsyncSession) -> Tag:
+    """
+    The _create_tag function inserts one tag in its own savepoint, or selects it if another request won the race.
+
+    :param name: str: The name of the tag
+    :param db: AsyncSession: Pass the database session to the function
+    :return: The tag
+    """
+    try:
+        async with db.begin_nested():
+            tag = Tag(name=name)
+            db.add(tag)
+        return tag
+    except IntegrityError:
+        result = await db.execute(select(Tag).where(Tag.name == name))
+        return result.scalar_one()
+
+
 async def get_tag_name(tag_id: int, db: AsyncSession) -> str:
 
     statement = select(Tag.name).where(Tag.id == tag_id)
@@ -139,4 +230,49 @@ async def get_tag_name(tag_id: int, db: AsyncSession) -> str:
     return tag
 
 
+def _usage_query():
+    usage = func.count(PhotoTag.photo_id)
+    return select(Tag.id, Tag.name, usage).outerjoin(PhotoTag, PhotoTag.tag_id == Tag.id).group_by(Tag.id, Tag.name)
+
+
+async def load_tag_index() -> None:
+    """
+    The load_tag_index function rebuilds the in-memory suggestion index from the tags and their links.
+    It runs as a background task after a suggestion missed the index. The request session is closed by then,
+    so the task opens its own; the claim on the reload is released whatever happens.
+
+    :return: None
+    """
+    try:
+        async with sessionmanager.session() as db:
+            result = await db.execute(_usage_query())
+            tag_index.load(tuple(row) for row in result.all())
+    except Exception as err:
+        logger.warning(f"Tag index was not loaded: {err}")
+    finally:
+        tag_index.release()
+
+
+async def suggest_tags(prefix: str, limit: int, db: AsyncSession) -> List[TagUsage]:
+    """
+    The suggest_tags function returns the most used tags whose name starts with prefix, ignoring case.
+    They come from the in-memory index; while it is not loaded, or too old, the database answers,
+    through the trigram index on tags.name on PostgreSQL.
 
+    :param prefix: str: The beginning of the name
+    :param limit: int: The number of tags returned at most
+    :param db: AsyncSession: Pass the database session to the function
+    :return: The id, name and number of photos of the tags, most used first
+    """
+    if tag_index.fresh:
+        return tag_index.suggest(prefix, limit)
+    pattern = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    usage = func.count(PhotoTag.photo_id)
+    statement = (
+        _usage_query()
+        .where(Tag.name.ilike(pattern, escape="\\"))
+        .order_by(usage.desc(), func.lower(Tag.name))
+        .limit(limit)
+    )
+    result = await db.execute(statement)
+    return [tuple(row) for row in result.all()]
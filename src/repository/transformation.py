@@ -1,40 +1,70 @@
-import random
-import string
-import cloudinary
-import cloudinary.uploader
-from fastapi import Depends, UploadFile, File, HTTPException
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
-from libgravatar import Gravatar
+import asyncio
+from typing import Dict, List
 
-from typing import List
+from fastapi import HTTPException, status
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.conf import massages
 from src.conf.config import config
-from src.database.db import get_db
-from src.entity.models import User, Photo
-from src.schemas.photo import PhotoSchema
-from src.repository.tags import create_tag, get_tag, get_tags
+from src.database.db import sessionmanager
+from src.entity.models import Photo, PhotoTransformation
+from src.schemas.transformation import CropSchema
+from src.services.image_engine import Actions, canonical_params
+from src.services.storage import DerivedFile, storage
+from src.utils.py_logger import get_logger
 
-cloudinary.config(
-    cloud_name=config.CLD_NAME,
-    api_key=config.CLD_API_KEY,
-    api_secret=config.CLD_API_SECRET,
-    secure=True,
-)
+logger = get_logger(__name__)
 
+PRESETS: Dict[str, Actions] = {
+    "thumb": [{"fetch_format": "auto"}, {"width": 200, "height": 200, "crop": "thumb", "gravity": "auto"}],
+    "square": [{"fetch_format": "auto"}, {"width": 600, "aspect_ratio": "1:1", "crop": "fill"}],
+    "rounded": [{"fetch_format": "auto"}, {"width": 400, "aspect_ratio": "1:1", "crop": "fill"}, {"radius": "max"}],
+    "cartoon": [{"fetch_format": "auto"}, {"width": 800, "crop": "limit"}, {"effect": "cartoonify"}],
+    "vignette": [{"fetch_format": "auto"}, {"width": 800, "crop": "limit"}, {"effect": "vignette"}],
+}
 
-async def save_transformation(trans_url: str, photo: Photo, db: AsyncSession):
-    """Save the transformation to the database."""
-    photo.file_path_transform = trans_url
-    await db.commit()
-    await db.refresh(photo)
-    return photo
 
+def eager_presets() -> List[str]:
+    """
+    The eager_presets function returns the names of the presets made for every uploaded photo,
+    as listed in TRANSFORMATION_EAGER_PRESETS; unknown names are skipped.
 
-async def create_crop_transformation(original_photo, body, db):
-    list_base_url = original_photo.file_path.split('/')
-    public_id = f"PhotoShare/{list_base_url[-2]}/{list_base_url[-1]}"
-    print(public_id)
+    :return: A list of preset names
+    """
+    names = [name.strip() for name in config.TRANSFORMATION_EAGER_PRESETS.split(",")]
+    return [name for name in names if name in PRESETS]
+
+
+def responsive_variants() -> Dict[str, Actions]:
+    """
+    The responsive_variants function returns the width variants listed with every photo,
+    named after their width, e.g. w480. They are never upscaled.
+
+    :return: The actions of every variant by name
+    """
+    widths = sorted({int(width) for width in config.RESPONSIVE_WIDTHS.split(",") if width.strip()})
+    return {
+        f"w{width}": [{"width": width, "crop": "limit", "fetch_format": config.RESPONSIVE_FORMAT}]
+        for width in widths
+    }
+
+
+def eager_variants() -> Dict[str, Actions]:
+    variants = {name: PRESETS[name] for name in eager_presets()}
+    variants.update(responsive_variants())
+    return variants
+
+
+def build_actions(body: CropSchema) -> Actions:
+    """
+    The build_actions function turns the parameters of a transformation request into chained Cloudinary actions.
+    Parameters left at their neutral value are not part of the actions.
+
+    :param body: CropSchema: The requested transformation
+    :return: The list of actions
+    """
     size_param = {}
     trans_actions = [
         {'fetch_format': "auto"}
@@ -50,10 +80,184 @@ async def create_crop_transformation(original_photo, body, db):
     if body.is_rounded:
         trans_actions.append({'radius': "max"})
     if body.angle != 0:
-        trans_actions.append({'angle': 20})
+        trans_actions.append({'angle': body.angle})
     if body.effect != '':
         trans_actions.append({'effect': body.effect})
-    transform = cloudinary.CloudinaryImage(public_id).build_url(transformation=trans_actions)
-    trans_photo = await save_transformation(transform, original_photo, db)
-    return {"id": trans_photo.id, "title": trans_photo.title, "description": trans_photo.description,
-            "file_path_transform": trans_photo.file_path_transform}
+    return trans_actions
+
+
+async def get_transformation(photo_id: int, params_hash: str, db: AsyncSession) -> PhotoTransformation | None:
+    stmt = select(PhotoTransformation).filter_by(photo_id=photo_id, params_hash=params_hash)
+    result = await db.execute(stmt)
+    return result.scalar_one_or_none()
+
+
+async def get_or_create_transformation(
+        photo: Photo, actions: Actions, db: AsyncSession, name: str | None = None
+) -> PhotoTransformation:
+    """
+    The get_or_create_transformation function returns the variant of the photo made by the actions.
+    A variant requested before is returned as stored; otherwise its URL is built and saved,
+    and a storage that does not transform images on request renders the variant right away.
+
+    :param photo: Photo: The original photo
+    :param actions: Actions: The chained Cloudinary actions
+    :param db: AsyncSession: Get the database session
+    :param name: str | None: The name of the preset the actions come from
+    :return: The stored variant
+    """
+    photo_id = photo.id
+    params, params_hash = canonical_params(actions)
+    variant = await get_transformation(photo_id, params_hash, db)
+    if variant is not None:
+        return variant
+    public_id = storage.public_id(photo.file_path)
+    if storage.lazy_transformations:
+        derived = DerivedFile(url=storage.url(public_id, transformation=actions))
+    else:
+        [derived] = await storage.generate(public_id, [actions])
+    variant = PhotoTransformation(
+        photo_id=photo_id,
+        name=name,
+        params=params,
+        params_hash=params_hash,
+        url=derived.url,
+        width=derived.width,
+        height=derived.height,
+        bytes=derived.bytes,
+    )
+    db.add(variant)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # The same variant was stored by a concurrent request.
+        await db.rollback()
+        return await get_transformation(photo_id, params_hash, db)
+    await db.refresh(variant)
+    return variant
+
+
+async def get_transformations(photo_id: int, db: AsyncSession) -> List[PhotoTransformation]:
+    stmt = select(PhotoTransformation).filter_by(photo_id=photo_id).order_by(PhotoTransformation.id)
+    result = await db.execute(stmt)
+    return list(result.scalars().all())
+
+
+async def get_preset_transformation(photo: Photo, name: str, db: AsyncSession) -> PhotoTransformation:
+    """
+    The get_preset_transformation function returns the variant of the photo made by a named preset.
+
+    :param photo: Photo: The original photo
+    :param name: str: The name of the preset
+    :param db: AsyncSession: Get the database session
+    :return: The stored variant
+    """
+    if name not in PRESETS:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=massages.NOT_PRESET)
+    return await get_or_create_transformation(photo, PRESETS[name], db, name=name)
+
+
+async def create_crop_transformation(original_photo, body, db):
+    photo_id, title, description = original_photo.id, original_photo.title, original_photo.description
+    current = original_photo.file_path_transform
+    variant = await get_or_create_transformation(original_photo, build_actions(body), db)
+    # file_path_transform keeps the last requested variant, as before the variants were stored.
+    if current != variant.url:
+        await db.execute(update(Photo).where(Photo.id == photo_id).values(file_path_transform=variant.url))
+        await db.commit()
+    return {"id": photo_id, "title": title, "description": description,
+            "file_path_transform": variant.url}
+
+
+async def generate_variants(photo_ids: List[int]) -> None:
+    """
+    The generate_variants function makes the eager presets and the responsive widths of new photos.
+    It runs as a background task after an upload: the storage produces every variant of every distinct file,
+    then the variants are stored with their size, so listings can offer them in a srcset.
+    The request session is closed by then, the task opens its own and always gives its connection back.
+    Failures are only logged, a missing preset is made when it is first requested.
+
+    :param photo_ids: List[int]: The ids of the uploaded photos
+    :return: None
+    """
+    variants = eager_variants()
+    if not variants or not photo_ids:
+        return
+    try:
+        async with sessionmanager.session() as db:
+            await _store_variants(photo_ids, variants, db)
+    except Exception as err:
+        logger.warning(f"Variants of photos {photo_ids} failed: {err}")
+
+
+async def _store_variants(photo_ids: List[int], variants: Dict[str, Actions], db: AsyncSession) -> None:
+    result = await db.execute(select(Photo.id, Photo.file_path).where(Photo.id.in_(photo_ids)))
+    files: Dict[str, List[int]] = {}
+    for photo_id, file_path in result.all():
+        files.setdefault(storage.public_id(file_path), []).append(photo_id)
+    result = await db.execute(
+        select(PhotoTransformation.photo_id, PhotoTransformation.params_hash)
+        .where(PhotoTransformation.photo_id.in_(photo_ids))
+    )
+    existing = set(result.all())
+
+    names = list(variants)
+    params = [canonical_params(variants[name]) for name in names]
+    # Photos sharing a file share its variants in the storage.
+    derived = await asyncio.gather(
+        *(storage.generate(public_id, [variants[name] for name in names]) for public_id in files),
+        return_exceptions=True,
+    )
+    rows = []
+    for (public_id, ids), derived_files in zip(files.items(), derived):
+        if isinstance(derived_files, Exception):
+            logger.warning(f"Variants of {public_id} failed: {derived_files}")
+            if not storage.lazy_transformations:
+                continue
+            derived_files = [DerivedFile(url=storage.url(public_id, transformation=variants[name])) for name in names]
+        for photo_id in ids:
+            for name, (canonical, params_hash), derived_file in zip(names, params, derived_files):
+                if (photo_id, params_hash) in existing:
+                    continue
+                existing.add((photo_id, params_hash))
+                rows.append(
+                    PhotoTransformation(
+                        photo_id=photo_id,
+                        name=name,
+                        params=canonical,
+                        params_hash=params_hash,
+                        url=derived_file.url,
+                        width=derived_file.width,
+                        height=derived_file.height,
+                        bytes=derived_file.bytes,
+                    )
+                )
+    if rows:
+        db.add_all(rows)
+        # The variants are part of the photo responses, the copies clients keep must be sent again.
+        changed = {row.photo_id for row in rows}
+        await db.execute(update(Photo).where(Photo.id.in_(changed)).values(version=Photo.version + 1))
+        await db.commit()
+
+
+async def get_responsive_variants(photo_ids: List[int], db: AsyncSession) -> Dict[int, List[PhotoTransformation]]:
+    """
+    The get_responsive_variants function loads the responsive width variants of many photos in one query.
+
+    :param photo_ids: List[int]: The ids of the photos
+    :param db: AsyncSession: Get the database session
+    :return: The variants of every photo, narrowest first
+    """
+    names = list(responsive_variants())
+    if not photo_ids or not names:
+        return {}
+    stmt = (
+        select(PhotoTransformation)
+        .where(PhotoTransformation.photo_id.in_(photo_ids), PhotoTransformation.name.in_(names))
+        .order_by(PhotoTransformation.photo_id, PhotoTransformation.width, PhotoTransformation.id)
+    )
+    result = await db.execute(stmt)
+    variants: Dict[int, List[PhotoTransformation]] = {}
+    for variant in result.scalars():
+        variants.setdefault(variant.photo_id, []).append(variant)
+    return variants
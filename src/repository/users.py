@@ -1,13 +1,14 @@
 from fastapi import Depends, HTTPException, status
-from sqlalchemy import select
+from sqlalchemy import select, update, func
 from sqlalchemy.ext.asyncio import AsyncSession
 from libgravatar import Gravatar
-from typing import List
+from typing import List, Dict
 
 from src.database.db import get_db
-from src.entity.models import User, BanUser
+from src.entity.models import User, BanUser, Photo, Comment, Rating, Friendship
 from src.schemas.user import UserSchema
 from src.conf import massages
+from src.services.cache import user_cache
 
 
 async def get_user_by_email(email: str, db: AsyncSession = Depends(get_db)):
@@ -69,19 +70,6 @@ async def create_user(body: UserSchema, db: AsyncSession = Depends(get_db)):
     return new_user
 
 
-async def update_token(user: User, token: str | None, db: AsyncSession):
-    """
-    The update_token function updates the refresh token for a user.
-
-    :param user: User: Get the user's id
-    :param token: str | None: Specify that the token parameter can be either a string or none
-    :param db: AsyncSession: Pass the database session to the function
-    :return: The user
-    """
-    user.refresh_token = token
-    await db.commit()
-
-
 async def verified_email(email: str, db: AsyncSession) -> None:
     """
     The verified_email function takes in an email and a database session,
@@ -95,6 +83,7 @@ async def verified_email(email: str, db: AsyncSession) -> None:
     user = await get_user_by_email(email, db)
     user.verified = True
     await db.commit()
+    await user_cache.invalidate(email)
 
 
 async def update_user_password(email: str, password: str, db: AsyncSession) -> None:
@@ -113,6 +102,7 @@ async def update_user_password(email: str, password: str, db: AsyncSession) -> N
     user.password = password
     await db.commit()
     await db.refresh(user)
+    await user_cache.invalidate(email)
     return user
 
 
@@ -129,6 +119,94 @@ async def update_avatar_url(email: str, url: str | None, db: AsyncSession) -> Us
     user.avatar = url
     await db.commit()
     await db.refresh(user)
+    await user_cache.invalidate(email)
     return user
 
 
+USER_COUNTERS = ("count_photo", "count_comment", "count_rating", "count_friendship")
+
+
+async def get_user_counters(user_id: int, db: AsyncSession) -> Dict[str, int]:
+    """
+    The get_user_counters function reads the denormalized activity counters of a user.
+    It is a single primary key lookup, so it is cheap enough to run on every request.
+
+    :param user_id: int: Get the counters of the user with this id
+    :param db: AsyncSession: Pass the database session to the function
+    :return: A dictionary with count_photo, count_comment, count_rating and count_friendship
+    """
+    columns = [getattr(User, name) for name in USER_COUNTERS]
+    result = await db.execute(select(*columns).where(User.id == user_id))
+    row = result.one_or_none()
+    if row is None:
+        return dict.fromkeys(USER_COUNTERS, 0)
+    return row._asdict()
+
+
+async def update_user_counters(user_id: int, db: AsyncSession, **deltas: int) -> None:
+    """
+    The update_user_counters function shifts the activity counters of a user by the given deltas.
+    It does not commit: the caller commits it in the same transaction as the write being counted.
+
+    :param user_id: int: Identify the user whose counters change
+    :param db: AsyncSession: Pass the database session to the function
+    :param deltas: int: Counter names from USER_COUNTERS mapped to the amount they change by
+    :return: None
+    """
+    values = {}
+    for name, delta in deltas.items():
+        if name not in USER_COUNTERS:
+            raise ValueError(f"Unknown user counter: {name}")
+        if delta:
+            values[name] = getattr(User, name) + delta
+    if not values:
+        return
+    statement = update(User).where(User.id == user_id).values(**values)
+    await db.execute(statement.execution_options(synchronize_session=False))
+
+
+async def release_photo_counters(photo: Photo, db: AsyncSession) -> None:
+    """
+    The release_photo_counters function takes back the counters a photo contributed to.
+    The owner loses one photo, and every user who commented or rated the photo loses
+    the comments and ratings that are deleted together with it.
+    Call it before the photo is deleted and commit both in the same transaction.
+
+    :param photo: Photo: The photo that is about to be deleted
+    :param db: AsyncSession: Pass the database session to the function
+    :return: None
+    """
+    await update_user_counters(photo.user_id, db, count_photo=-1)
+    for model, counter in ((Comment, "count_comment"), (Rating, "count_rating")):
+        photo_rows = select(func.count(model.id)).where(
+            model.photo_id == photo.id, model.user_id == User.id
+        ).scalar_subquery()
+        statement = (
+            update(User)
+            .where(User.id.in_(select(model.user_id).where(model.photo_id == photo.id)))
+            .values({counter: getattr(User, counter) - photo_rows})
+        )
+        await db.execute(statement.execution_options(synchronize_session=False))
+
+
+async def recount_user_counters(user_id: int | None, db: AsyncSession) -> None:
+    """
+    The recount_user_counters function rebuilds the activity counters from the source tables.
+    It is the repair path for counters that drifted, e.g. after rows were changed by hand.
+
+    :param user_id: int | None: Recount one user, or every user when None
+    :param db: AsyncSession: Pass the database session to the function
+    :return: None
+    """
+    statement = update(User).values(
+        count_photo=select(func.count(Photo.id)).where(Photo.user_id == User.id).scalar_subquery(),
+        count_comment=select(func.count(Comment.id)).where(Comment.user_id == User.id).scalar_subquery(),
+        count_rating=select(func.count(Rating.id)).where(Rating.user_id == User.id).scalar_subquery(),
+        count_friendship=select(func.count(Friendship.user_id))
+        .where(Friendship.user_id == User.id)
+        .scalar_subquery(),
+    )
+    if user_id is not None:
+        statement = statement.where(User.id == user_id)
+    await db.execute(statement.execution_options(synchronize_session=False))
+    await db.commit()
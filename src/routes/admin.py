@@ -1,18 +1,21 @@
-from typing import List
-from fastapi import APIRouter, Depends, UploadFile, File, status, HTTPException, Form
+from typing import List, Dict, Any
+from fastapi import APIRouter, Depends, UploadFile, File, BackgroundTasks, status, HTTPException, Form, Query, Response
 from fastapi_limiter.depends import RateLimiter
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.db import get_db
 from src.entity.models import User, Photo, Role
 from src.schemas.user import BanUser
-from src.schemas.photo import PhotoResponse
+from src.schemas.photo import PhotoResponse, BulkPhotoResponse
 from src.services.auth import auth_service
 from src.services.roles import RoleAccess
 from src.conf import massages
+from src.conf.config import config
 from src.repository import admin as repositories_admin
 from src.repository import users as repositories_users
 from src.repository import photos as repositories_photos
+from src.repository import transformation as repositories_transformations
+from src.utils.pagination import set_next_cursor
 
 
 router = APIRouter(prefix="/admin", tags=["admin"])
@@ -26,37 +29,35 @@ access_to_route_all = RoleAccess([Role.admin, Role.moderator])
     dependencies=[Depends(access_to_route_all)],
 )
 async def get_photos(
-    user_id: int, skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db)
+    user_id: int,
+    response: Response,
+    skip: int = 0,
+    limit: int = Query(100, ge=1),
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_db),
 ) -> List[Photo]:
     """
     The get_photos function returns a list of photos for the user with the given id.
-    The function takes in an optional skip and limit parameter to paginate through results.
+    The function takes in an optional cursor, or skip for older clients, and limit parameter to paginate through results.
+    The cursor of the next page is returned in the X-Next-Cursor header.
     
     
     :param user_id: int: Get the user
+    :param response: Response: Set the X-Next-Cursor header
     :param skip: int: Skip the first n photos
     :param limit: int: Limit the number of photos returned
+    :param cursor: str | None: Continue after the previous page
     :param db: AsyncSession: Pass a database session to the function
     :return: A list of dictionaries
     """
     user = await repositories_users.get_user_by_id(user_id, db)
     if user is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=massages.NOT_USER)
-    photos = await repositories_photos.get_photos(
-        user=user, skip=skip, limit=limit, db=db
+    page = await repositories_photos.get_photos(
+        user=user, skip=skip, limit=limit, db=db, cursor=cursor
     )
-    output_photos = []
-    for photo in photos:
-        photo_obj: Photo = photo[0]
-        output_photos.append(
-            {
-                "id": photo_obj.id,
-                "title": photo_obj.title,
-                "description": photo_obj.description,
-                "file_path": photo_obj.file_path,
-            }
-        )
-    return output_photos
+    set_next_cursor(response, page)
+    return await repositories_photos.photos_with_variants(page.items, db)
 
 
 @router.post(
@@ -67,6 +68,7 @@ async def get_photos(
 )
 async def create_photo(
     user_id: int,
+    background_tasks: BackgroundTasks,
     title: str = Form(),
     description: str | None = Form(),
     file: UploadFile = File(),
@@ -76,6 +78,7 @@ async def create_photo(
     The create_photo function creates a new photo in the database.
     
     :param user_id: int: Get the user from the database
+    :param background_tasks: BackgroundTasks: Make the eager presets and responsive variants after the response
     :param title: str: Set the title of the photo
     :param description: str | None: Allow the description to be optional
     :param file: UploadFile: Receive the file from the client
@@ -89,9 +92,49 @@ async def create_photo(
     photo = await repositories_photos.create_photo(
         user=user, title=title, description=description, db=db, file=file
     )
+    background_tasks.add_task(repositories_transformations.generate_variants, [photo.id])
     return photo
 
 
+@router.post(
+    "/{user_id}/bulk",
+    response_model=BulkPhotoResponse,
+    dependencies=[Depends(access_to_route_all)],
+)
+async def create_photos(
+    user_id: int,
+    background_tasks: BackgroundTasks,
+    files: List[UploadFile] = File(),
+    description: str | None = Form(None),
+    tags: str | None = Form(None),
+    db: AsyncSession = Depends(get_db),
+) -> BulkPhotoResponse:
+    """
+    The create_photos function uploads many photos for the user with the given id in one request.
+
+    :param user_id: int: Get the user from the database
+    :param background_tasks: BackgroundTasks: Make the eager presets and responsive variants after the response
+    :param files: List[UploadFile]: Receive the files from the client
+    :param description: str | None: The description of every photo
+    :param tags: str | None: Up to 5 comma separated tags for every photo
+    :param db: AsyncSession: Pass the database session to the repository
+    :return: The number of created and failed photos and the result of every file
+    """
+    if len(files) > config.BULK_UPLOAD_MAX_FILES:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=massages.TOO_MANY_FILES)
+    user = await repositories_users.get_user_by_id(user_id, db)
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=massages.NOT_USER)
+    response = await repositories_photos.create_photos(
+        files, description, repositories_photos.parse_tags(tags), user, db
+    )
+    background_tasks.add_task(
+        repositories_transformations.generate_variants,
+        [result.photo.id for result in response.results if result.photo],
+    )
+    return response
+
+
 @router.put(
     "/{photo_id}/{description}",
     response_model=PhotoResponse,
@@ -99,7 +142,7 @@ async def create_photo(
 )
 async def update_photo_description(
     description: str, photo_id: int, db: AsyncSession = Depends(get_db)
-) -> Photo:
+) -> Dict[str, Any]:
     """
     The update_photo_description function updates the description of a photo.
         Args:
@@ -109,10 +152,10 @@ async def update_photo_description(
     :param description: str: Get the description of a photo
     :param photo_id: int: Identify the photo to update
     :param db: AsyncSession: Pass the database session to the function
-    :return: The updated photo
+    :return: The updated photo with its responsive variants
     """
     photo = await repositories_admin.update_photo_description(photo_id, description, db)
-    return photo
+    return (await repositories_photos.photos_with_variants([photo], db))[0]
 
 
 @router.delete(
@@ -142,18 +185,18 @@ async def remove_photo(photo_id: int, db: AsyncSession = Depends(get_db)) -> Pho
 )
 async def get_photo_by_photo_id(
     photo_id: int, db: AsyncSession = Depends(get_db)
-) -> Photo:
+) -> Dict[str, Any]:
     """
-    The get_photo_by_photo_id function returns a photo object with the given id.
+    The get_photo_by_photo_id function returns a photo object with the given id, with its responsive variants.
         If no photo is found, it raises an HTTPException with status 404 (Not Found).
     
     
     :param photo_id: int: Specify the photo id of the photo we want to delete
     :param db: AsyncSession: Pass the database session to the function
-    :return: A photo object
+    :return: The photo with its responsive variants
     """
     photo = await repositories_admin.get_photo_by_id(photo_id, db)
-    return photo
+    return (await repositories_photos.photos_with_variants([photo], db))[0]
 
 
 @router.post(
@@ -219,19 +262,39 @@ async def delete_user_from_ban(
     dependencies=[Depends(access_to_route_all)],
 )
 async def ban_users(
-    skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db)
+    response: Response,
+    skip: int = 0,
+    limit: int = Query(100, ge=1),
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_db),
 ) -> List[BanUser]:
     """
     The ban_users function returns a list of banned users.
+    The cursor of the next page is returned in the X-Next-Cursor header.
     
+    :param response: Response: Set the X-Next-Cursor header
     :param skip: int: Skip the first n users in the database
     :param limit: int: Limit the number of users returned
+    :param cursor: str | None: Continue after the previous page
     :param db: AsyncSession: Pass the database session to the function
     :return: A list of ban_users
     """
-    ban_users = await repositories_admin.get_ban_users(skip, limit, db)
+    page = await repositories_admin.get_ban_users(skip, limit, db, cursor=cursor)
+    set_next_cursor(response, page)
     output_users = []
-    for user in ban_users:
-        ban_user: BanUser = user[0]
+    for ban_user in page.items:
         output_users.append({"id": ban_user.id, "user_id": ban_user.user_id})
     return output_users
+
+
+@router.get(
+    "/stats/cache",
+    dependencies=[Depends(access_to_route_all)],
+)
+async def cache_stats() -> Dict[str, Any]:
+    """
+    The cache_stats function reports the hit and miss counters of the in-process caches of this worker.
+
+    :return: A dictionary of cache statistics
+    """
+    return {"claims": auth_service.claims_cache.stats()}
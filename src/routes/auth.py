@@ -1,5 +1,6 @@
 import string
 import random
+import uuid
 
 from typing import Dict, Any
 from fastapi import (
@@ -37,13 +38,33 @@ from src.schemas.user import (
                             RequestEmail,
                             ResetPassword,
 )
-from src.services.auth import auth_service
+from src.services.auth import auth_service, Principal
 
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 get_refresh_token = HTTPBearer()
 
 
+async def create_session_tokens(email: str, session_id: str, jti: str) -> Dict[str, Any]:
+    """
+    The create_session_tokens function issues an access token and the refresh token of a session.
+
+    :param email: str: The email of the user
+    :param session_id: str: The id of the device the user is logged in on
+    :param jti: str: The id of the refresh token, as stored in the session store
+    :return: A dictionary with the access_token, refresh_token and token type
+    """
+    access_token = await auth_service.create_access_token(data={"sub": email})
+    refresh_token = await auth_service.create_refresh_token(
+        data={"sub": email, "sid": session_id, "jti": jti}
+    )
+    return {
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+    }
+
+
 @router.post(
     "/signup", response_model=UserResponse, status_code=status.HTTP_201_CREATED
 )
@@ -70,7 +91,7 @@ async def signup(
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT, detail=auth_massages.ACCOUNT_EXISTS
         )
-    body.password = auth_service.get_password_hash(body.password)
+    body.password = await auth_service.get_password_hash_async(body.password)
     new_user = await repositories_users.create_user(body, db)
     bt.add_task(send_email, new_user.email, new_user.username, str(request.base_url))
     return new_user
@@ -99,7 +120,7 @@ async def login(
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail=auth_massages.EMAIL_NOT_VERIFIED
         )
-    if not auth_service.verify_password(body.password, user.password):
+    if not await auth_service.verify_password_async(body.password, user.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=auth_massages.INVALID_REGISTRATION,
@@ -109,15 +130,11 @@ async def login(
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail=auth_massages.BAN_USER
         )
-    # Generate JWT token
-    access_token = await auth_service.create_access_token(data={"sub": user.email})
-    refresh_token = await auth_service.create_refresh_token(data={"sub": user.email})
-    await repositories_users.update_token(user, refresh_token, db)
-    return {
-        "access_token": access_token,
-        "refresh_token": refresh_token,
-        "token_type": "bearer",
-    }
+    # Generate JWT token, one refresh session per device
+    session_id = body.client_id or uuid.uuid4().hex
+    jti = uuid.uuid4().hex
+    await auth_service.sessions.create(user.id, session_id, jti)
+    return await create_session_tokens(user.email, session_id, jti)
 
 
 @router.get("/refresh_token", response_model=TokenSchema)
@@ -134,22 +151,59 @@ async def refresh_token(
     :return: A dictionary with the access_token, refresh_token and token type
     """
     token = credentials.credentials
-    email = await auth_service.decode_refresh_token(token)
-    user = await repositories_users.get_user_by_email(email, db)
-    if user.refresh_token != token:
-        await repositories_users.update_token(user, None, db)
+    claims = await auth_service.get_refresh_claims(token)
+    user = await repositories_users.get_user_by_email(claims["sub"], db)
+    if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail=auth_massages.INVALID_TOKEN
         )
+    if auth_service.bans.is_banned(user.id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail=auth_massages.BAN_USER
+        )
+    session_id, jti = claims.get("sid"), claims.get("jti")
+    new_jti = uuid.uuid4().hex
+    if session_id is None or jti is None or not await auth_service.sessions.rotate(
+        user.id, session_id, jti, new_jti
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail=auth_massages.INVALID_TOKEN
+        )
+    return await create_session_tokens(user.email, session_id, new_jti)
 
-    access_token = await auth_service.create_access_token(data={"sub": email})
-    refresh_token = await auth_service.create_refresh_token(data={"sub": email})
-    await repositories_users.update_token(user, refresh_token, db)
-    return {
-        "access_token": access_token,
-        "refresh_token": refresh_token,
-        "token_type": "bearer",
-    }
+
+@router.post("/logout")
+async def logout(
+    credentials: HTTPAuthorizationCredentials = Depends(get_refresh_token),
+    db: AsyncSession = Depends(get_db),
+) -> Dict[str, Any]:
+    """
+    The logout function ends the session the refresh token belongs to.
+        The refresh token can not be used anymore, access tokens already issued expire on their own.
+
+    :param credentials: HTTPAuthorizationCredentials: Get the refresh token from the header
+    :param db: AsyncSession: Get the database session
+    :return: A message that the user has been logged out
+    """
+    claims = await auth_service.get_refresh_claims(credentials.credentials)
+    user = await repositories_users.get_user_by_email(claims["sub"], db)
+    if user is not None and claims.get("sid") is not None:
+        await auth_service.sessions.revoke(user.id, claims["sid"])
+    return {"message": auth_massages.LOGGED_OUT}
+
+
+@router.post("/logout_all")
+async def logout_all(
+    current_user: Principal = Depends(auth_service.get_principal),
+) -> Dict[str, Any]:
+    """
+    The logout_all function ends every session of the current user, on every device.
+
+    :param current_user: Principal: Get the current user
+    :return: A message that the user has been logged out
+    """
+    await auth_service.sessions.revoke_all(current_user.id)
+    return {"message": auth_massages.LOGGED_OUT_ALL}
 
 
 @router.get("/verified_email/{token}")
@@ -281,7 +335,7 @@ async def reset_password(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=auth_massages.INVALID_REGISTRATION,
         )
-    password = auth_service.get_password_hash(body.password1)
+    password = await auth_service.get_password_hash_async(body.password1)
     user = await repositories_users.update_user_password(email, password, db)
     background_tasks.add_task(
         send_message_password, user.email, user.username, str(request.base_url)
@@ -317,7 +371,7 @@ async def reset_password(
         )
     characters = string.ascii_letters + string.digits + string.punctuation
     password1 = "".join(random.choice(characters) for i in range(8))
-    password = auth_service.get_password_hash(password1)
+    password = await auth_service.get_password_hash_async(password1)
     user = await repositories_users.update_user_password(email, password, db)
     try:
         bt.add_task(
@@ -1,17 +1,18 @@
 from typing import Optional, List, Sequence
 
-from fastapi import APIRouter, Depends, Path
+from fastapi import APIRouter, Depends, Path, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi_limiter.depends import RateLimiter
 
 from src.database.db import get_db
-from src.entity.models import Comment, User, Role
+from src.entity.models import Comment, Role
 from src.repository import comments as repository_comments
 from src.repository import photos as repositories_photos
 from src.repository import admin as repositories_admin
 from src.services.roles import RoleAccess
 from src.schemas.photo import CommentResponse, SortDirection
-from src.services.auth import auth_service
+from src.services.auth import auth_service, Principal
+from src.utils.conditional import make_etag, is_not_modified, not_modified, set_validators
 
 
 router = APIRouter(prefix="/comments", tags=["comments"])
@@ -29,7 +30,7 @@ async def add_comment(
     photo_id: int,
     comment_text: str,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(auth_service.get_current_user),
+    current_user: Principal = Depends(auth_service.get_principal),
 ) -> Optional[Comment]:
     """
     The add_comment function creates a new comment for the photo with the given id.
@@ -40,7 +41,7 @@ async def add_comment(
     :param photo_id: int: Identify the photo to which the comment is added
     :param comment_text: str: Get the text of the comment
     :param db: AsyncSession: Pass the database session to the function
-    :param current_user: User: Get the current user who is logged in
+    :param current_user: Principal: Get the current user who is logged in
     :param : Get the photo_id from the request
     :return: None if the photo_id doesn't exist
     """
@@ -62,13 +63,13 @@ async def add_comment(
 async def get_comment_by_id(
     comment_id: int = Path(ge=1),
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(auth_service.get_current_user),
+    current_user: Principal = Depends(auth_service.get_principal),
 ) -> Comment:
     """
     The get_comment_by_id function returns a comment by its id.
     :param comment_id: int: Get the comment by its id
     :param db: AsyncSession: Get the database session
-    :param current_user: User: Get the user that is currently logged in
+    :param current_user: Principal: Get the user that is currently logged in
     :param : Get the comment by id
     :return: A comment object
     """
@@ -87,25 +88,36 @@ async def get_comment_by_id(
     response_model=List[CommentResponse],
 )
 async def get_comments_by_photo_id(
+    request: Request,
+    response: Response,
     photo_id: int = Path(ge=1),
     sort_direction: SortDirection = SortDirection.desc,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(auth_service.get_current_user),
-) -> Sequence[Comment]:
+    current_user: Principal = Depends(auth_service.get_principal),
+) -> Sequence[Comment] | Response:
     """
     The get_comments_by_photo_id function returns a list of comments for the specified photo.
     The function accepts an optional sort_direction parameter, which defaults to descending order.
+    Adding, editing or deleting a comment bumps the version of the photo, the ETag is made from it;
+    a client whose copy is current gets 304 Not Modified before the comments are read.
+    :param request: Request: Read the If-None-Match header
+    :param response: Response: Set the ETag header
     :param photo_id: int: Specify the photo id for which we want to get comments
     :param sort_direction: SortDirection: Determine whether the comments should be sorted in ascending or descending order
     :param db: AsyncSession: Pass the database session to the function
-    :param current_user: User: Get the user who is making the request
+    :param current_user: Principal: Get the user who is making the request
     :param : Get the photo_id from the url
     :return: A list of comment objects
     """
+    version = await repositories_photos.get_photo_version(photo_id, db, user=current_user)
+    etag = make_etag("comments", photo_id, version, sort_direction.value)
+    if version is not None and is_not_modified(request, etag):
+        return not_modified(etag)
     photo = await repositories_photos.get_photo_by_id(photo_id, current_user, db)
     comments = await repository_comments.get_comments_for_photo(
         photo_id, db, sort_direction
     )
+    set_validators(response, etag)
     return comments
 
 
@@ -119,7 +131,7 @@ async def update_comment(
     comment_id: int,
     comment_text: str,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(auth_service.get_current_user),
+    current_user: Principal = Depends(auth_service.get_principal),
 ) -> Optional[Comment]:
     """
     The update_comment function updates a comment in the database.
@@ -129,7 +141,7 @@ async def update_comment(
     :param comment_id: int: Identify the comment that is to be deleted
     :param comment_text: str: Get the new comment text from the request body
     :param db: AsyncSession: Pass the database session to the function
-    :param current_user: User: Get the current user
+    :param current_user: Principal: Get the current user
     :param : Get the comment id
     :return: The updated comment
     """
@@ -1,53 +1,57 @@
 from typing import List, Any, Dict
-from fastapi import APIRouter, Depends, UploadFile, File, status, Form
+from fastapi import (
+    APIRouter, Depends, UploadFile, File, BackgroundTasks, status, Form, HTTPException, Query, Request, Response
+)
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.conf import massages
+from src.conf.config import config
 from src.database.db import get_db
 from src.entity.models import User, Photo, PhotoTag
-from src.schemas.photo import PhotoResponse, PhotoTagResponse, ViewAllPhotos
+from src.schemas.photo import PhotoResponse, PhotoTagResponse, ViewAllPhotos, BulkPhotoResponse
 from src.schemas.qr_code import QRCodeResponse
 from src.services.auth import auth_service
+from src.services.qr_code import qr_renderer, QRFormat, MEDIA_TYPES, CACHE_CONTROL
 from src.repository import photos as repositories_photos
+from src.repository import transformation as repositories_transformations
 from src.repository import qr_code as repositories_qr_code
+from src.utils.conditional import make_etag, is_not_modified, not_modified, set_validators, validators
 from src.repository import tags as repositories_tags
+from src.utils.pagination import set_next_cursor
 
 router = APIRouter(prefix="/photos", tags=["photos"])
 
 
 @router.get("/all/", response_model=List[PhotoResponse])
 async def get_photos(
+        response: Response,
         skip: int = 0,
-        limit: int = 100,
+        limit: int = Query(100, ge=1),
+        cursor: str | None = None,
         db: AsyncSession = Depends(get_db),
         current_user: User = Depends(auth_service.get_current_user),
 ) -> List[Photo]:
     """
     The get_photos function returns a list of photos.
+    The cursor of the next page is returned in the X-Next-Cursor header.
     
-    :param skip: int: Skip the first n photos
+    :param response: Response: Set the X-Next-Cursor header
+    :param skip: int: Skip the first n photos, kept for clients that do not send a cursor
     :param limit: int: Limit the number of photos returned
+    :param cursor: str | None: Continue after the previous page
     :param db: AsyncSession: Pass the database session to the function
     :param current_user: User: Get the current user from the database
     :param : Get the id of a photo
-    :return: A list of photos
-    """
-    photos = await repositories_photos.get_photos(skip, limit, current_user, db)
-    output_photos = []
-    for photo in photos:
-        photo_obj: Photo = photo[0]
-        output_photos.append(
-            {
-                "id": photo_obj.id,
-                "title": photo_obj.title,
-                "description": photo_obj.description,
-                "file_path": photo_obj.file_path,
-            }
-        )
-    return output_photos
+    :return: A list of photos with their responsive variants
+    """
+    page = await repositories_photos.get_photos(skip, limit, current_user, db, cursor=cursor)
+    set_next_cursor(response, page)
+    return await repositories_photos.photos_with_variants(page.items, db)
 
 
 @router.post("/", response_model=PhotoResponse, status_code=status.HTTP_201_CREATED)
 async def create_photo(
+        background_tasks: BackgroundTasks,
         title: str = Form(),
         description: str | None = Form(),
         file: UploadFile = File(),
@@ -57,6 +61,7 @@ async def create_photo(
     """
     The create_photo function creates a new photo in the database.
     
+    :param background_tasks: BackgroundTasks: Make the eager presets and responsive variants after the response
     :param title: str: Get the title from the form
     :param description: str | None: Specify that the description field is optional
     :param file: UploadFile: Get the file from the request
@@ -66,16 +71,51 @@ async def create_photo(
     :return: A photo object, which is the same as what we defined in models
     """
     photo = await repositories_photos.create_photo(title, description, current_user, db, file)
+    background_tasks.add_task(repositories_transformations.generate_variants, [photo.id])
     return photo
 
 
+@router.post("/bulk", response_model=BulkPhotoResponse)
+async def create_photos(
+        background_tasks: BackgroundTasks,
+        files: List[UploadFile] = File(),
+        description: str | None = Form(None),
+        tags: str | None = Form(None),
+        db: AsyncSession = Depends(get_db),
+        current_user: User = Depends(auth_service.get_current_user),
+) -> BulkPhotoResponse:
+    """
+    The create_photos function uploads many photos in one request.
+    Every photo is titled after its file name; the description and the comma separated tags apply to all of them.
+    Files that fail to upload are reported in the results, the other photos are still created.
+
+    :param background_tasks: BackgroundTasks: Make the eager presets and responsive variants after the response
+    :param files: List[UploadFile]: Get the files from the request
+    :param description: str | None: The description of every photo
+    :param tags: str | None: Up to 5 comma separated tags for every photo
+    :param db: AsyncSession: Get the database session
+    :param current_user: User: Get the current user from the database
+    :return: The number of created and failed photos and the result of every file
+    """
+    if len(files) > config.BULK_UPLOAD_MAX_FILES:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=massages.TOO_MANY_FILES)
+    response = await repositories_photos.create_photos(
+        files, description, repositories_photos.parse_tags(tags), current_user, db
+    )
+    background_tasks.add_task(
+        repositories_transformations.generate_variants,
+        [result.photo.id for result in response.results if result.photo],
+    )
+    return response
+
+
 @router.put("/{photo_id}/{description}", response_model=PhotoResponse)
 async def update_photo_description(
         description: str,
         photo_id: int,
         db: AsyncSession = Depends(get_db),
         current_user: User = Depends(auth_service.get_current_user),
-) -> Photo:
+) -> Dict[str, Any]:
     """
     The update_photo_description function updates the description of a photo.
     
@@ -84,12 +124,12 @@ async def update_photo_description(
     :param db: AsyncSession: Pass the database session to the function
     :param current_user: User: Get the current user
     :param : Get the photo id from the url
-    :return: A photo object
+    :return: The photo with its responsive variants
     """
     photo = await repositories_photos.update_photo_description(
         photo_id, description, current_user, db
     )
-    return photo
+    return (await repositories_photos.photos_with_variants([photo], db))[0]
 
 
 @router.delete("/{photo_id}", response_model=PhotoResponse)
@@ -116,22 +156,31 @@ async def remove_photo(
 @router.get("/{photo_id}", response_model=PhotoResponse)
 async def get_photo_by_photo_id(
         photo_id: int,
+        request: Request,
+        response: Response,
         db: AsyncSession = Depends(get_db),
         current_user: User = Depends(auth_service.get_current_user),
-) -> Photo:
+) -> Dict[str, Any] | Response:
     """
-    The get_photo_by_photo_id function returns a photo object with the given id.
+    The get_photo_by_photo_id function returns a photo object with the given id, with its responsive variants.
+        The ETag comes from the version of the photo, read before the photo itself;
+        a client whose copy is current gets 304 Not Modified.
     
     :param photo_id: int: Get the photo by id
+    :param request: Request: Read the If-None-Match header
+    :param response: Response: Set the ETag header
     :param db: AsyncSession: Pass the database session to the function
     :param current_user: User: Get the current user from the database
     :param : Get the photo_id from the url
-    :return: A photo object
+    :return: The photo with its responsive variants
     """
+    version = await repositories_photos.get_photo_version(photo_id, db, user=current_user)
+    etag = make_etag("photo", photo_id, version)
+    if version is not None and is_not_modified(request, etag):
+        return not_modified(etag)
     photo = await repositories_photos.get_photo_by_id(photo_id, current_user, db)
-    # return {"id" : photo.id, "title" : photo.title, "description" : photo.description,
-    #         "file_path" : photo.file_path}
-    return photo
+    set_validators(response, etag)
+    return (await repositories_photos.photos_with_variants([photo], db))[0]
 
 
 @router.post("/{photo_id}/qr", response_model=QRCodeResponse)
@@ -141,7 +190,7 @@ async def create_qr_code(
         current_user: User = Depends(auth_service.get_current_user),
 ) -> Dict[str, Any]:
     """
-    The create_qr_code function creates a QR code from the photo's file_path.
+    The create_qr_code function creates a QR code from the photo's file_path, once per photo.
         The function takes in a photo_id and returns the id of the photo and its qr code url.
     
     :param photo_id: int: Get the photo from the database
@@ -151,14 +200,39 @@ async def create_qr_code(
     :return: A dictionary with the photo id and file path of the qr code
     """
     photo = await repositories_photos.get_photo_by_id(photo_id, current_user, db)
-    data = photo.file_path
-    img_byte_arr = await repositories_qr_code.generate_qr_code(data)
-    qr_url = await repositories_qr_code.upload_qr_to_cloudinary(
-        img_byte_arr, f"{photo.title}"
-    )
+    qr_url = await repositories_qr_code.get_or_create_qr_code(photo, db)
     return {"id": photo.id, "file_path": qr_url}
 
 
+@router.get("/{photo_id}/qr", response_class=Response)
+async def render_qr_code(
+        photo_id: int,
+        request: Request,
+        format: QRFormat = QRFormat.png,
+        db: AsyncSession = Depends(get_db),
+        current_user: User = Depends(auth_service.get_current_user),
+) -> Response:
+    """
+    The render_qr_code function returns the QR code of the photo's file_path as a PNG or SVG image.
+        The image is rendered locally and kept in memory, and it carries a strong ETag and a long private
+        Cache-Control, so the browser of the owner fetches it once; a request with a matching If-None-Match
+        gets 304 without rendering.
+
+    :param photo_id: int: Get the photo from the database
+    :param request: Request: Read the If-None-Match header
+    :param format: QRFormat: png or svg
+    :param db: AsyncSession: Pass the database session to the function
+    :param current_user: User: Get the user who is currently logged in
+    :return: The image
+    """
+    photo = await repositories_photos.get_photo_by_id(photo_id, current_user, db)
+    etag = qr_renderer.etag(photo.file_path, format)
+    if is_not_modified(request, etag):
+        return not_modified(etag, CACHE_CONTROL)
+    image = await qr_renderer.render(photo.file_path, format)
+    return Response(content=image, media_type=MEDIA_TYPES[format], headers=validators(etag, CACHE_CONTROL))
+
+
 @router.post("/tag/{photo_id}", response_model=PhotoTagResponse)
 async def create_tag_for_photo(
         photo_id: int,
@@ -173,8 +247,27 @@ async def create_tag_for_photo(
 @router.get("/info/{photo_id}", response_model=ViewAllPhotos)
 async def get_all_info_photo(
         photo_id: int,
+        request: Request,
+        response: Response,
         db: AsyncSession = Depends(get_db),
         current_user: User = Depends(auth_service.get_current_user),
 ):
+    """
+    The get_all_info_photo function returns the photo with its tags, comments and average rating.
+        Any change to those bumps the version of the photo, which makes the ETag:
+        a client whose copy is current gets 304 Not Modified without the page being collected again.
+
+    :param photo_id: int: The id of the photo
+    :param request: Request: Read the If-None-Match header
+    :param response: Response: Set the ETag header
+    :param db: AsyncSession: Pass the database session to the function
+    :param current_user: User: Get the user who is currently logged in
+    :return: The photo with its tags, comments, average rating and QR code
+    """
+    version = await repositories_photos.get_photo_version(photo_id, db)
+    etag = make_etag("photo-info", photo_id, version)
+    if version is not None and is_not_modified(request, etag):
+        return not_modified(etag)
     all_info_photo = await repositories_photos.view_all_info_photo(photo_id, current_user, db)
+    set_validators(response, etag)
     return all_info_photo
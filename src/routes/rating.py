@@ -1,16 +1,18 @@
 from typing import List, Sequence, Dict, Optional
 
-from fastapi import APIRouter, HTTPException, Depends, status, Path, Query
+from fastapi import APIRouter, HTTPException, Depends, status, Path, Query, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from src.services.roles import RoleAccess
 from src.database.db import get_db
-from src.entity.models import User, Role, Rating
+from src.entity.models import Role, Rating
 from src.schemas.rating import RatingModel, PhotoRating, ViewPhotoRating, QuantityRating
 from src.repository import rating as repository_ratings
+from src.repository import photos as repositories_photos
+from src.utils.conditional import make_etag, is_not_modified, not_modified, set_validators
 # from src.conf.messages import me
 
-from src.services.auth import auth_service
+from src.services.auth import auth_service, Principal
 
 router = APIRouter(prefix='/ratings', tags=["ratings"])
 
@@ -23,21 +25,27 @@ async def create_photo_rating(
         photo_id: int = Path(ge=1),
         select_rating: PhotoRating = PhotoRating.five_stars,
         db: AsyncSession = Depends(get_db),
-        current_user: User = Depends(auth_service.get_current_user)
+        current_user: Principal = Depends(auth_service.get_principal)
 ) -> Optional[Rating]:
     add_rating = await repository_ratings.create_rating_for_photo(photo_id, select_rating, current_user, db)
     return add_rating
 
 
 @router.get("/photo/{image_id}", response_model=QuantityRating)
-async def get_common_rating(image_id: int, db: AsyncSession = Depends(get_db)):
+async def get_common_rating(image_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    # Every rating change bumps the version of the photo; a current copy gets 304 before the ratings are read.
+    version = await repositories_photos.get_photo_version(image_id, db)
+    etag = make_etag("ratings", image_id, version)
+    if version is not None and is_not_modified(request, etag):
+        return not_modified(etag)
     average_rating = await repository_ratings.get_average_rating(image_id, db)
+    set_validators(response, etag)
     return average_rating
 
 
 @router.get("/photo/{photo_id}", response_model=RatingModel)
 async def read_tag(photo_id: int,
-                   current_user: User = Depends(auth_service.get_current_user),
+                   current_user: Principal = Depends(auth_service.get_principal),
                    db: AsyncSession = Depends(get_db)):
     rating = await repository_ratings.get_rating(photo_id, current_user, db)
     return rating
@@ -54,7 +62,7 @@ async def read_tag(rating_id: int,
 async def update_rating(photo_id: int = Path(ge=1),
                         select_rating: PhotoRating = PhotoRating.five_stars,
                         db: AsyncSession = Depends(get_db),
-                        current_user: User = Depends(auth_service.get_current_user)
+                        current_user: Principal = Depends(auth_service.get_principal)
                         ) -> Optional[Rating] :
     rating = await repository_ratings.create_rating_for_photo(photo_id, select_rating, current_user, db)
     return rating
@@ -63,7 +71,7 @@ async def update_rating(photo_id: int = Path(ge=1),
 @router.delete("/{photo_id}", description='Delete photo rating!', dependencies=[Depends(access_to_route_all)],
                )
 async def remove_rating(photo_id: int, db: AsyncSession = Depends(get_db),
-                        current_user: User = Depends(auth_service.get_current_user)):
+                        current_user: Principal = Depends(auth_service.get_principal)):
     rating = await repository_ratings.remove_rating(photo_id, current_user, db)
     return rating
 
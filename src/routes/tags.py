@@ -1,14 +1,18 @@
 from typing import List
 
-from fastapi import APIRouter, HTTPException, Depends, status, Query
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends, status, Query, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.db import get_db
 from src.entity.models import Role
-from src.schemas.tag import TagModel, TagResponse
+from src.schemas.tag import TagModel, TagResponse, TagSuggestion
 from src.repository import tags as repository_tags
 from src.conf.massages import AuthMessages
+from src.services.auth import auth_service, Principal
 from src.services.roles import RoleAccess
+from src.services.tag_index import tag_index
+from src.utils.conditional import make_etag, is_not_modified, not_modified, set_validators
+from src.utils.pagination import set_next_cursor
 
 
 router = APIRouter(prefix="/tags", tags=["tags"])
@@ -20,18 +24,60 @@ access_to_route_all = RoleAccess([Role.admin, Role.moderator])
     "/", response_model=List[TagResponse], dependencies=[Depends(access_to_route_all)]
 )
 async def read_tags(
-    skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db)
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = Query(100, ge=1),
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_db),
 ):
     """
     The read_tags function returns a list of tags.
+    The cursor of the next page is returned in the X-Next-Cursor header.
+    The ETag comes from a one row summary of the tags table and the paging parameters;
+    a client whose copy is current gets 304 Not Modified before the page is read.
     
+    :param request: Request: Read the If-None-Match header
+    :param response: Response: Set the X-Next-Cursor and ETag headers
     :param skip: int: Skip the first n tags
     :param limit: int: Limit the number of tags returned
+    :param cursor: str | None: Continue after the previous page
     :param db: AsyncSession: Pass the database session to the function
     :return: A list of tags
     """
-    tags = await repository_tags.get_tags(skip, limit, db)
-    return tags
+    etag = make_etag("tags", *await repository_tags.get_tags_state(db), skip, limit, cursor)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    page = await repository_tags.get_tags(skip, limit, db, cursor=cursor)
+    set_next_cursor(response, page)
+    set_validators(response, etag)
+    return page.items
+
+
+@router.get("/suggest", response_model=List[TagSuggestion])
+async def suggest_tags(
+    background_tasks: BackgroundTasks,
+    q: str = Query(..., min_length=1, max_length=25),
+    limit: int = Query(10, ge=1, le=50),
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(auth_service.get_principal),
+):
+    """
+    The suggest_tags function completes a tag name as the user types it.
+        The tags starting with q, ignoring case, come from an in-memory index, most used first.
+        When the index is not loaded yet, or too old, the database answers and the index is rebuilt afterwards.
+
+    :param background_tasks: BackgroundTasks: Rebuild the index after the response
+    :param q: str: The beginning of the tag name
+    :param limit: int: The number of suggestions returned at most
+    :param db: AsyncSession: Pass the database session to the function
+    :param current_user: Principal: Get the user who is currently logged in
+    :return: The matching tags with the number of their photos
+    """
+    tags = await repository_tags.suggest_tags(q, limit, db)
+    if tag_index.claim_reload():
+        background_tasks.add_task(repository_tags.load_tag_index)
+    return [TagSuggestion(id=tag_id, name=name, count=count) for tag_id, name, count in tags]
 
 
 @router.get(
@@ -1,16 +1,18 @@
+from typing import List
+
 from fastapi import APIRouter, Depends, status
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.db import get_db
-from src.entity.models import User, Role
+from src.entity.models import Role
 
-from src.services.auth import auth_service
+from src.services.auth import auth_service, Principal
 from src.services.roles import RoleAccess
 
 from src.repository import photos as repositories_photos
 from src.repository import transformation as repositories_transformations
-from src.schemas.transformation import CropSchema, PhotoTransformResponse
+from src.schemas.transformation import CropSchema, PhotoTransformResponse, PhotoTransformationResponse
 
 router = APIRouter(prefix="/photos_transform", tags=["transforms"])
 
@@ -26,7 +28,7 @@ access_to_route_all = RoleAccess([Role.admin, Role.moderator])
 async def apply_transformation(
     body: CropSchema,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(auth_service.get_current_user),
+    current_user: Principal = Depends(auth_service.get_principal),
 ) -> dict:
     """
     - **aspect_ratio** - float: The aspect ratio of the photo, 1 is square, 0.5 is landscape, 2 is portrait -
@@ -42,3 +44,39 @@ async def apply_transformation(
     return await repositories_transformations.create_crop_transformation(
         original_photo, body, db
     )
+
+
+@router.get(
+    "/{photo_id}",
+    response_model=List[PhotoTransformationResponse],
+    summary="Function to list the stored variants of a photo",
+)
+async def get_transformations(
+    photo_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(auth_service.get_principal),
+) -> list:
+    """
+    Returns every variant of the photo made so far, the eager presets and the requested transformations.
+    """
+    await repositories_photos.get_photo_by_id(photo_id=photo_id, user=current_user, db=db)
+    return await repositories_transformations.get_transformations(photo_id, db)
+
+
+@router.post(
+    "/{photo_id}/presets/{name}",
+    response_model=PhotoTransformationResponse,
+    summary="Function to get a preset variant of a photo",
+)
+async def apply_preset(
+    photo_id: int,
+    name: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(auth_service.get_principal),
+):
+    """
+    - **name** - str: The preset: thumb, square, rounded, cartoon or vignette. A variant made before is returned as
+    stored.
+    """
+    original_photo = await repositories_photos.get_photo_by_id(photo_id=photo_id, user=current_user, db=db)
+    return await repositories_transformations.get_preset_transformation(original_photo, name, db)
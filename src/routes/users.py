@@ -1,8 +1,3 @@
-import pickle
-
-import cloudinary
-import cloudinary.uploader
-
 from fastapi import APIRouter, Depends, UploadFile, File
 from fastapi_limiter.depends import RateLimiter
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -12,6 +7,7 @@ from src.entity.models import User
 from src.schemas import user as schemas_user
 from src.services.auth import auth_service
 from src.repository import users as repositories_users
+from src.services.storage import storage
 
 
 router = APIRouter(prefix = "/users", tags = ["users"])
@@ -74,12 +70,10 @@ async def get_current_user(
     :return: The current user, based on the token in the authorization header
     """
     public_id = f"Web19_fastapi/{user.email}"
-    res_photo = cloudinary.uploader.upload(file.file, public_id = public_id, owerite = True)
-    res_url = cloudinary.CloudinaryImage(public_id).build_url(
-        width = 300, height = 300, crop = "fill", version = res_photo.get("version")
+    stored = await storage.upload(file.file, public_id)
+    res_url = storage.url(
+        stored.public_id, version = stored.version, width = 300, height = 300, crop = "fill"
     )
     user = await repositories_users.update_avatar_url(user.email, res_url, db)
-    auth_service.cache.set(user.email, pickle.dumps(user))
-    auth_service.cache.expire(user.email, 300)
     return user
 
@@ -17,15 +17,37 @@ class PhotoSchema(BaseModel):
     # file_path: str
 
 
+class PhotoVariant(BaseModel):
+    url: str
+    width: int | None = None
+    height: int | None = None
+    bytes: int | None = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
 class PhotoResponse(BaseModel):
     id: int = 1
     title: str
     description: str
     file_path: str
+    variants: List[PhotoVariant] = []
 
     model_config = ConfigDict(from_attributes=True)
 
 
+class BulkPhotoResult(BaseModel):
+    filename: str
+    photo: PhotoResponse | None = None
+    error: str | None = None
+
+
+class BulkPhotoResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[BulkPhotoResult]
+
+
 class PhotoTagResponse(BaseModel):
     id: int = 1
     title: str
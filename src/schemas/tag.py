@@ -12,3 +12,7 @@ class TagResponse(TagModel):
     class Config:
         from_attributes = True
 
+
+
+class TagSuggestion(TagModel):
+    count: int
@@ -11,6 +11,15 @@ class CropSchema(BaseModel):
     effect: str = "cartoonify"
 
 
+class PhotoTransformationResponse(BaseModel):
+    id: int
+    photo_id: int
+    name: str | None = None
+    url: str
+
+    model_config = ConfigDict(from_attributes=True)
+
+
 class PhotoTransformResponse(BaseModel):
     id: int = 1
     title: str
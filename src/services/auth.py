@@ -1,36 +1,59 @@
-import pickle
+import asyncio
 
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
-from typing import Optional
-from sqlalchemy import func, select
+from typing import Any, Callable, Mapping, Optional
 
 from fastapi import Depends, HTTPException, status
 from passlib.context import CryptContext
 from fastapi.security import OAuth2PasswordBearer
-import redis.asyncio as redis
 from sqlalchemy.ext.asyncio import AsyncSession
 from jose import JWTError, jwt
 
 from src.database.db import get_db
-from src.entity.models import Photo, Comment, Rating, Friendship, User
+from src.entity.models import Role
 from src.repository import users as repository_users
 from src.schemas import user as schemas_user
+from src.services.bans import ban_registry
+from src.services.cache import user_cache, claims_cache
+from src.services.sessions import session_store
+from src.services.user_snapshot import UserSnapshot
 from src.conf.config import config
 from src.conf import massages
 from src.conf.massages import AuthMessages as auth_massages
 
 
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def _verify_password(plain_password: str, hashed_password: str) -> bool:
+    # Module level, so that a process pool can pickle it by reference.
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+def _hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+@dataclass(frozen=True, slots=True)
+class Principal:
+    id: int
+    email: str
+    role: Role
+
+
 class Auth:
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    pwd_context = pwd_context
     SECRET_KEY = config.SECRET_KEY_JWT
     ALGORITHM = config.ALGORITHM
-    cache = redis.Redis(
-        host=config.REDIS_DOMAIN,
-        port=config.REDIS_PORT,
-        db=0,
-        password=config.REDIS_PASSWORD,
-    )
+    cache = user_cache
+    claims_cache = claims_cache
+    bans = ban_registry
+    sessions = session_store
     oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
+    _hash_executor: Executor | None = None
+    _hash_semaphore: asyncio.Semaphore | None = None
 
     def verify_password(self, plain_password, hashed_password):
         """
@@ -56,6 +79,64 @@ class Auth:
         """
         return self.pwd_context.hash(password)
 
+    async def _run_hashing(self, func: Callable, *args):
+        """
+        The _run_hashing function runs a bcrypt call in the password hashing pool.
+        bcrypt takes tens to hundreds of milliseconds per call, so running it on the event loop
+        would stall every other request of the worker. The semaphore caps the number of calls
+        in flight, so a login burst queues here instead of piling up in the pool.
+
+        :param self: Represent the instance of the class
+        :param func: Callable: The hashing function to run
+        :param args: The arguments of the hashing function
+        :return: The result of the hashing function
+        """
+        if self._hash_executor is None:
+            if config.PASSWORD_HASH_EXECUTOR == "process":
+                Auth._hash_executor = ProcessPoolExecutor(max_workers=config.PASSWORD_HASH_WORKERS)
+            else:
+                Auth._hash_executor = ThreadPoolExecutor(
+                    max_workers=config.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+                )
+            Auth._hash_semaphore = asyncio.Semaphore(config.PASSWORD_HASH_CONCURRENCY)
+        async with self._hash_semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._hash_executor, func, *args)
+
+    async def verify_password_async(self, plain_password: str, hashed_password: str) -> bool:
+        """
+        The verify_password_async function is the non-blocking variant of verify_password.
+        The check runs in the password hashing pool, the event loop keeps serving other requests.
+
+        :param self: Represent the instance of the class
+        :param plain_password: str: Pass in the password that the user has entered
+        :param hashed_password: str: Check if the password is correct
+        :return: True if the password is correct and false otherwise
+        """
+        return await self._run_hashing(_verify_password, plain_password, hashed_password)
+
+    async def get_password_hash_async(self, password: str) -> str:
+        """
+        The get_password_hash_async function is the non-blocking variant of get_password_hash.
+
+        :param self: Represent the instance of the class
+        :param password: str: Pass in the password that is being hashed
+        :return: A hash of the password
+        """
+        return await self._run_hashing(_hash_password, password)
+
+    def shutdown_hashing(self) -> None:
+        """
+        The shutdown_hashing function stops the password hashing pool when the application stops.
+
+        :param self: Represent the instance of the class
+        :return: None
+        """
+        if self._hash_executor is not None:
+            self._hash_executor.shutdown(wait=False, cancel_futures=True)
+            Auth._hash_executor = None
+            Auth._hash_semaphore = None
+
     async def create_access_token(
         self, data: dict, expires_delta: Optional[float] = None
     ):
@@ -91,7 +172,7 @@ class Auth:
         The create_refresh_token function creates a refresh token for the user.
             Args:
                 data (dict): A dictionary containing the user's id and username.
-                expires_delta (Optional[float]): The number of seconds until the refresh token expires. Defaults to None, which sets it to 7 days from now.
+                expires_delta (Optional[float]): The number of seconds until the refresh token expires. Defaults to None, which sets it to REFRESH_TOKEN_TTL from now.
 
         :param self: Represent the instance of the class
         :param data: dict: Pass the user's data to be encoded
@@ -102,7 +183,7 @@ class Auth:
         if expires_delta:
             expire = datetime.now(timezone.utc) + timedelta(seconds=expires_delta)
         else:
-            expire = datetime.now(timezone.utc) + timedelta(days=7)
+            expire = datetime.now(timezone.utc) + timedelta(seconds=config.REFRESH_TOKEN_TTL)
         to_encode.update(
             {"iat": datetime.now(timezone.utc), "exp": expire, "scope": "refresh_token"}
         )
@@ -111,37 +192,129 @@ class Auth:
         )
         return encoded_refresh_token
 
-    async def decode_refresh_token(self, refresh_token: str):
+    def decode_token(self, token: str) -> Mapping[str, Any]:
         """
-        The decode_refresh_token function is used to decode the refresh token.
-        It takes a refresh_token as an argument and returns the email of the user if it's valid.
-        If not, it raises an HTTPException with status code 401 (UNAUTHORIZED) and detail message 'Invalid scope for token!' or 'Could not validate credentials!'.
+        The decode_token function verifies a JWT and returns its claims.
+        Verified claims are kept in the claims cache until the token expires, so a client
+        reusing the same token pays for the signature check only once per worker.
+        Every auth path goes through here.
+
+        :param self: Represent the instance of the class
+        :param token: str: The encoded JWT
+        :return: A read-only mapping of the claims
+        :raises JWTError: If the token is invalid or expired
+        """
+        claims = self.claims_cache.get(token)
+        if claims is None:
+            claims = self.claims_cache.set(
+                token, jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+            )
+        return claims
 
+    async def get_refresh_claims(self, refresh_token: str) -> Mapping[str, Any]:
+        """
+        The get_refresh_claims function verifies a refresh token and returns its claims.
+        If the token is invalid or is not a refresh token, it raises an HTTPException with status code 401 (UNAUTHORIZED).
 
         :param self: Represent the instance of the class
         :param refresh_token: str: Pass in the refresh_token that was sent from the client
-        :return: The email of the user
+        :return: A read-only mapping of the claims
         """
         try:
-            payload = jwt.decode(
-                refresh_token, self.SECRET_KEY, algorithms=[self.ALGORITHM]
+            payload = self.decode_token(refresh_token)
+        except JWTError:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail=auth_massages.NOT_VALIDATE_CREDENTIALS,
             )
-            if payload["scope"] == "refresh_token":
-                email = payload["sub"]
-                return email
+        if payload.get("scope") != "refresh_token":
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail=auth_massages.INVALID_SCOPE_TOKEN,
             )
+        return payload
+
+    async def decode_refresh_token(self, refresh_token: str):
+        """
+        The decode_refresh_token function is used to decode the refresh token.
+        It takes a refresh_token as an argument and returns the email of the user if it's valid.
+        If not, it raises an HTTPException with status code 401 (UNAUTHORIZED) and detail message 'Invalid scope for token!' or 'Could not validate credentials!'.
+
+
+        :param self: Represent the instance of the class
+        :param refresh_token: str: Pass in the refresh_token that was sent from the client
+        :return: The email of the user
+        """
+        payload = await self.get_refresh_claims(refresh_token)
+        return payload["sub"]
+
+    async def get_user_snapshot(
+        self, email: str, db: AsyncSession, counters: bool = True
+    ) -> UserSnapshot | None:
+        """
+        The get_user_snapshot function returns the cached snapshot of the user with the given email.
+        On a miss the user is loaded from the database and cached. On a hit the activity counters
+        are refreshed with one primary key lookup, since activity does not invalidate the cache,
+        unless the caller does not need them.
+
+        :param self: Represent the instance of the class
+        :param email: str: The email from the token
+        :param db: AsyncSession: Get the database session
+        :param counters: bool: Refresh the activity counters of a cached snapshot
+        :return: The user snapshot, or None if there is no such user
+        """
+        payload = await self.cache.get(email)
+        user = UserSnapshot.loads(payload) if payload is not None else None
+        if user is None:
+            db_user = await repository_users.get_user_by_email(email, db)
+            if db_user is None:
+                return None
+            user = UserSnapshot.from_user(db_user)
+            await self.cache.set(email, user.dumps())
+            return user
+        if not counters:
+            return user
+        return user.with_counters(await repository_users.get_user_counters(user.id, db))
+
+    async def get_principal(
+        self, token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)
+    ) -> Principal:
+        """
+        The get_principal function is a lighter variant of get_current_user for routes
+        that only need to know who is calling and with which role. The role comes from
+        the cached user snapshot and the ban state from the ban registry, so with a warm
+        cache the request does not touch the database at all.
+
+        :param self: Represent the instance of a class
+        :param token: str: Get the token from the authorization header
+        :param db: AsyncSession: Get the database session, used on a cache miss only
+        :return: The id, email and role of the caller
+        """
+        credentials_exception = HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=auth_massages.NOT_VALIDATE_CREDENTIALS,
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+        try:
+            payload = self.decode_token(token)
         except JWTError:
+            raise credentials_exception
+        email = payload.get("sub")
+        if payload.get("scope") != "access_token" or email is None:
+            raise credentials_exception
+
+        user = await self.get_user_snapshot(email, db, counters=False)
+        if user is None:
+            raise credentials_exception
+        if self.bans.is_banned(user.id):
             raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail=auth_massages.NOT_VALIDATE_CREDENTIALS,
+                status_code=status.HTTP_403_FORBIDDEN, detail=auth_massages.BAN_USER
             )
+        return Principal(id=user.id, email=user.email, role=user.role)
 
     async def get_current_user(
         self, token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)
-    ) -> User:
+    ) -> UserSnapshot:
         """
         The get_current_user function is a dependency that will be used in the
             protected endpoints. It takes a token as an argument and returns the user
@@ -150,7 +323,7 @@ class Auth:
         :param self: Represent the instance of a class
         :param token: str: Get the token from the authorization header
         :param db: AsyncSession: Get the database session
-        :return: A user object
+        :return: A snapshot of the user
         """
         credentials_exception = HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -159,7 +332,7 @@ class Auth:
         )
         try:
             # Decode JWT
-            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+            payload = self.decode_token(token)
             if payload["scope"] == "access_token":
                 email = payload["sub"]
                 if email is None:
@@ -170,36 +343,13 @@ class Auth:
             print(e)
             raise credentials_exception
 
-        user_hash = str(email)
-        user = await self.cache.get(user_hash)
+        user = await self.get_user_snapshot(email, db)
         if user is None:
-            user = await repository_users.get_user_by_email(email, db)
-            if user is None:
-                raise credentials_exception
-            await self.cache.set(user_hash, pickle.dumps(user))
-            await self.cache.expire(user_hash, 300)
-        else:
-            user = pickle.loads(user)
-        photos_count = await db.execute(
-            select(func.count(Photo.id)).where(Photo.user_id == user.id)
-        )
-        count_photo = photos_count.scalar() 
-        user.count_photo = count_photo 
-        count_comment = await db.execute(
-            select(func.count(Comment.id)).where(Comment.user_id == user.id)
-        )
-        count_comment = count_comment.scalar()
-        user.count_comment = count_comment
-        count_rating = await db.execute(
-            select(func.count(Rating.id)).where(Rating.user_id == user.id)
-        )
-        count_rating = count_rating.scalar()
-        user.count_rating = count_rating
-        count_friendship = await db.execute(
-            select(func.count(Friendship.user_id)).where(Friendship.user_id == user.id)
-        )
-        count_friendship = count_friendship.scalar()
-        user.count_friendship = count_friendship
+            raise credentials_exception
+        if self.bans.is_banned(user.id):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN, detail=auth_massages.BAN_USER
+            )
         return user
 
     async def get_user_info(
@@ -226,7 +376,7 @@ class Auth:
             headers={"WWW-Authenticate": "Bearer"},
         )
         try:
-            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+            payload = self.decode_token(token)
             if payload["scope"] == "access_token":
                 email = payload["sub"]
                 if email is None:
@@ -236,16 +386,13 @@ class Auth:
         except JWTError as e:
             raise credentials_exception
 
-        user_hash = str(email)
-        user = await self.cache.get(user_hash)
-        if user is None:
-            user = await repository_users.get_user_by_email(email, db)
-            if user is None:
-                raise credentials_exception
-            await self.cache.set(user_hash, pickle.dumps(user))
-            await self.cache.expire(user_hash, 300)
-        else:
-            user = pickle.loads(user)
+        current_user = await self.get_user_snapshot(email, db)
+        if current_user is None:
+            raise credentials_exception
+        if self.bans.is_banned(current_user.id):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN, detail=auth_massages.BAN_USER
+            )
 
         user = await repository_users.get_user_by_id(user_id, db)
         if user is None:
@@ -253,34 +400,14 @@ class Auth:
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=massages.NOT_USER,
             )
-        photos_count = await db.execute(
-            select(func.count(Photo.id)).where(Photo.user_id == user.id)
-        )
-        count_photo = photos_count.scalar() 
-        user.count_photo = count_photo  
-        count_comment = await db.execute(
-            select(func.count(Comment.id)).where(Comment.user_id == user.id)
-        )
-        count_comment = count_comment.scalar()
-        user.count_comment = count_comment
-        count_rating = await db.execute(
-            select(func.count(Rating.id)).where(Rating.user_id == user.id)
-        )
-        count_rating = count_rating.scalar()
-        user.count_rating = count_rating
-        count_friendship = await db.execute(
-            select(func.count(Friendship.user_id)).where(Friendship.user_id == user.id)
-        )
-        count_friendship = count_friendship.scalar()
-        user.count_friendship = count_friendship
         user_response = schemas_user.UserResponseAll(
             id=user.id,
             username=user.username,
             avatar=user.avatar,
-            count_photo=count_photo,
-            count_comment=count_comment,
-            count_rating=count_rating,
-            count_friendship=count_friendship,
+            count_photo=user.count_photo,
+            count_comment=user.count_comment,
+            count_rating=user.count_rating,
+            count_friendship=user.count_friendship,
             role=user.role,
         )
         return user_response
@@ -313,7 +440,7 @@ class Auth:
         :return: The email address associated with the token
         """
         try:
-            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+            payload = self.decode_token(token)
             email = payload["sub"]
             return email
         except JWTError as e:
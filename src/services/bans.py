@@ -0,0 +1,108 @@
+import asyncio
+from typing import Iterable, Set
+
+import redis.asyncio as redis
+
+from src.services.cache import redis_client
+from src.utils.py_logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class BanRegistry:
+    KEY = "banned_users"
+    CHANNEL = "banned_users:changed"
+
+    def __init__(self, redis_client: redis.Redis):
+        """
+        The __init__ function sets up the registry of banned user ids.
+        The ids live in a Redis set shared by all workers and are mirrored in a set on every worker,
+        so a ban check is a local O(1) lookup with no network or database access.
+
+        :param self: Represent the instance of the class
+        :param redis_client: redis.Redis: The Redis connection holding the shared set
+        :return: None
+        """
+        self.redis = redis_client
+        self.banned: Set[int] = set()
+
+    def is_banned(self, user_id: int) -> bool:
+        """
+        The is_banned function tells whether the user is banned.
+
+        :param self: Represent the instance of the class
+        :param user_id: int: The id of the user
+        :return: True if the user is banned
+        """
+        return user_id in self.banned
+
+    async def load(self, user_ids: Iterable[int]) -> None:
+        """
+        The load function replaces the shared set with the bans stored in the database.
+        It runs on startup, the database stays the source of truth.
+
+        :param self: Represent the instance of the class
+        :param user_ids: Iterable[int]: The ids of all banned users
+        :return: None
+        """
+        banned = set(user_ids)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(self.KEY)
+            if banned:
+                pipe.sadd(self.KEY, *banned)
+            await pipe.execute()
+        self.banned = banned
+
+    async def add(self, user_id: int) -> None:
+        """
+        The add function bans the user on every worker.
+
+        :param self: Represent the instance of the class
+        :param user_id: int: The id of the banned user
+        :return: None
+        """
+        self.banned.add(user_id)
+        await self.redis.sadd(self.KEY, user_id)
+        await self.redis.publish(self.CHANNEL, f"+{user_id}")
+
+    async def remove(self, user_id: int) -> None:
+        """
+        The remove function lifts the ban of the user on every worker.
+
+        :param self: Represent the instance of the class
+        :param user_id: int: The id of the user
+        :return: None
+        """
+        self.banned.discard(user_id)
+        await self.redis.srem(self.KEY, user_id)
+        await self.redis.publish(self.CHANNEL, f"-{user_id}")
+
+    async def listen(self) -> None:
+        """
+        The listen function applies the bans published by other workers to the local set.
+        After every (re)subscription the local set is reloaded from Redis,
+        so changes made while the listener was disconnected are not lost.
+
+        :param self: Represent the instance of the class
+        :return: None
+        """
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self.CHANNEL)
+                    members = await self.redis.smembers(self.KEY)
+                    self.banned = {int(member) for member in members}
+                    async for message in pubsub.listen():
+                        if message["type"] != "message":
+                            continue
+                        event = message["data"].decode()
+                        if event[0] == "+":
+                            self.banned.add(int(event[1:]))
+                        else:
+                            self.banned.discard(int(event[1:]))
+            except redis.ConnectionError as err:
+                logger.warning(f"Ban listener lost Redis: {err}")
+                await asyncio.sleep(1)
+
+
+ban_registry = BanRegistry(redis_client)
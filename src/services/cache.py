@@ -0,0 +1,248 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Any, Dict, Hashable, Mapping
+
+import redis.asyncio as redis
+
+from src.conf.config import config
+from src.utils.py_logger import get_logger
+
+logger = get_logger(__name__)
+
+redis_client = redis.Redis(
+    host=config.REDIS_DOMAIN,
+    port=config.REDIS_PORT,
+    db=0,
+    password=config.REDIS_PASSWORD,
+)
+
+
+class LRUCache:
+    def __init__(self, maxsize: int, ttl: float):
+        """
+        The __init__ function sets up an empty in-process cache.
+        Entries are evicted in least recently used order once maxsize is reached,
+        and every entry expires ttl seconds after it was stored.
+
+        :param self: Represent the instance of the class
+        :param maxsize: int: The maximum number of entries kept
+        :param ttl: float: The default lifetime of an entry in seconds
+        :return: None
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: Hashable) -> Any:
+        """
+        The get function returns the value stored under key, or None if it is missing or expired.
+
+        :param self: Represent the instance of the class
+        :param key: Hashable: The key to look up
+        :return: The cached value or None
+        """
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        """
+        The set function stores value under key and evicts the least recently used entries if needed.
+
+        :param self: Represent the instance of the class
+        :param key: Hashable: The key to store the value under
+        :param value: Any: The value to store
+        :param ttl: float | None: Override the default lifetime of the entry
+        :return: None
+        """
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        """
+        The pop function removes key from the cache if it is there.
+
+        :param self: Represent the instance of the class
+        :param key: Hashable: The key to remove
+        :return: None
+        """
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class UserCache:
+    CHANNEL = "user_cache:invalidate"
+
+    def __init__(self, redis_client: redis.Redis, maxsize: int, local_ttl: float, ttl: int):
+        """
+        The __init__ function sets up a two-tier cache for serialized users keyed by email.
+        The first tier is an in-process LRU shared by every request of the worker,
+        the second tier is Redis shared by all workers.
+
+        :param self: Represent the instance of the class
+        :param redis_client: redis.Redis: The Redis connection used as the second tier
+        :param maxsize: int: The number of users kept in process
+        :param local_ttl: float: How long a user stays in process, in seconds
+        :param ttl: int: How long a user stays in Redis, in seconds
+        :return: None
+        """
+        self.redis = redis_client
+        self.local = LRUCache(maxsize, local_ttl)
+        self.ttl = ttl
+
+    async def get(self, email: str) -> bytes | None:
+        """
+        The get function returns the cached user payload, looking in process first and in Redis second.
+        A Redis hit is copied into the in-process tier.
+
+        :param self: Represent the instance of the class
+        :param email: str: The email of the user
+        :return: The serialized user or None
+        """
+        value = self.local.get(email)
+        if value is not None:
+            return value
+        value = await self.redis.get(email)
+        if value is not None:
+            self.local.set(email, value)
+        return value
+
+    async def set(self, email: str, value: bytes) -> None:
+        """
+        The set function stores the serialized user in both tiers.
+
+        :param self: Represent the instance of the class
+        :param email: str: The email of the user
+        :param value: bytes: The serialized user
+        :return: None
+        """
+        self.local.set(email, value)
+        await self.redis.set(email, value, ex=self.ttl)
+
+    async def invalidate(self, email: str) -> None:
+        """
+        The invalidate function drops the user from both tiers and tells the other workers
+        to drop it from their in-process tier as well.
+
+        :param self: Represent the instance of the class
+        :param email: str: The email of the changed user
+        :return: None
+        """
+        self.local.pop(email)
+        await self.redis.delete(email)
+        await self.redis.publish(self.CHANNEL, email)
+
+    async def listen(self) -> None:
+        """
+        The listen function consumes invalidation messages published by other workers.
+        It runs for the lifetime of the application and reconnects when Redis goes away;
+        while it is disconnected the in-process tier is cleared, since messages may be lost.
+
+        :param self: Represent the instance of the class
+        :return: None
+        """
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self.CHANNEL)
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self.local.pop(message["data"].decode())
+            except redis.ConnectionError as err:
+                logger.warning(f"User cache invalidation listener lost Redis: {err}")
+                self.local.clear()
+                await asyncio.sleep(1)
+
+
+class ClaimsCache:
+    def __init__(self, maxsize: int):
+        """
+        The __init__ function sets up an in-process cache of verified JWT claims.
+        Entries are keyed by a SHA-256 digest of the token, so the tokens themselves are not kept,
+        and every entry expires together with the token it was decoded from.
+
+        :param self: Represent the instance of the class
+        :param maxsize: int: The maximum number of tokens kept
+        :return: None
+        """
+        self.local = LRUCache(maxsize, ttl=0)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Mapping[str, Any] | None:
+        """
+        The get function returns the claims of a token verified earlier, or None.
+
+        :param self: Represent the instance of the class
+        :param token: str: The encoded JWT
+        :return: A read-only mapping of the claims or None
+        """
+        claims = self.local.get(self._key(token))
+        if claims is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return claims
+
+    def set(self, token: str, claims: Dict[str, Any]) -> Mapping[str, Any]:
+        """
+        The set function remembers the claims of a verified token until its exp claim.
+        Tokens without an expiry are not cached.
+
+        :param self: Represent the instance of the class
+        :param token: str: The encoded JWT
+        :param claims: Dict[str, Any]: The claims returned by jwt.decode
+        :return: A read-only mapping of the claims
+        """
+        claims = MappingProxyType(claims)
+        expires = claims.get("exp")
+        if isinstance(expires, (int, float)):
+            ttl = expires - time.time()
+            if ttl > 0:
+                self.local.set(self._key(token), claims, ttl)
+        return claims
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        The stats function reports how well the cache is doing since the worker started.
+
+        :param self: Represent the instance of the class
+        :return: A dictionary with hits, misses, hit_ratio and size
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "size": len(self.local),
+        }
+
+
+user_cache = UserCache(
+    redis_client,
+    maxsize=config.USER_CACHE_LOCAL_SIZE,
+    local_ttl=config.USER_CACHE_LOCAL_TTL,
+    ttl=config.USER_CACHE_TTL,
+)
+
+claims_cache = ClaimsCache(maxsize=config.TOKEN_CACHE_SIZE)
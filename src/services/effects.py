@@ -0,0 +1,218 @@
+import functools
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+# An effect takes an RGB image as a (height, width, 3) uint8 array and the arguments that follow its name.
+Effect = Callable[[np.ndarray, List[str]], np.ndarray]
+
+Curve = Sequence[Tuple[int, int]]
+
+LUMA = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+def _luminance(rgb: np.ndarray) -> np.ndarray:
+    return rgb.astype(np.float32) @ LUMA
+
+
+def _int(args: List[str], index: int, default: int) -> int:
+    try:
+        return int(args[index])
+    except (IndexError, ValueError):
+        return default
+
+
+def _to_uint8(values: np.ndarray) -> np.ndarray:
+    return np.clip(np.rint(values), 0, 255).astype(np.uint8)
+
+
+def grayscale(rgb: np.ndarray, args: List[str]) -> np.ndarray:
+    gray = _to_uint8(_luminance(rgb))
+    return np.repeat(gray[..., None], 3, axis=2)
+
+
+def pixelate(rgb: np.ndarray, args: List[str]) -> np.ndarray:
+    """
+    The pixelate function replaces every square block of the image by its mean color.
+    The block sums come from np.add.reduceat along both axes, so the edge blocks,
+    smaller when the size does not divide the image, are averaged over their real area.
+
+    :param rgb: np.ndarray: The image
+    :param args: List[str]: The block size in pixels, 5 by default
+    :return: The pixelated image
+    """
+    size = max(1, _int(args, 0, 5))
+    height, width = rgb.shape[:2]
+    rows, cols = np.arange(0, height, size), np.arange(0, width, size)
+    sums = np.add.reduceat(np.add.reduceat(rgb.astype(np.int64), rows, axis=0), cols, axis=1)
+    heights = np.diff(np.append(rows, height))
+    widths = np.diff(np.append(cols, width))
+    blocks = _to_uint8(sums / (heights[:, None, None] * widths[None, :, None]))
+    return np.repeat(np.repeat(blocks, heights, axis=0), widths, axis=1)
+
+
+@functools.lru_cache(maxsize=4)
+def radial_mask(height: int, width: int, strength: int) -> np.ndarray:
+    """
+    The radial_mask function returns the brightness factor of every pixel for a vignette.
+    It is 1 in the center and falls with the square of the distance to the corners.
+    Masks are cached per image size, a batch of photos of the same size computes it once.
+
+    :param height: int: The height of the image
+    :param width: int: The width of the image
+    :param strength: int: The Cloudinary strength, 0 to 100
+    :return: A (height, width, 1) float32 array
+    """
+    y = np.linspace(-1.0, 1.0, height, dtype=np.float32)[:, None]
+    x = np.linspace(-1.0, 1.0, width, dtype=np.float32)[None, :]
+    distance = (x * x + y * y) / 2
+    mask = np.clip(1 - (0.3 + strength / 100) * distance, 0, 1)
+    mask.setflags(write=False)
+    return mask[..., None]
+
+
+def vignette(rgb: np.ndarray, args: List[str]) -> np.ndarray:
+    mask = radial_mask(rgb.shape[0], rgb.shape[1], min(100, max(0, _int(args, 0, 20))))
+    return _to_uint8(rgb * mask)
+
+
+def _box_blur(values: np.ndarray) -> np.ndarray:
+    padded = np.pad(values, 1, mode="edge")
+    height, width = values.shape
+    total = sum(padded[dy:dy + height, dx:dx + width] for dy in range(3) for dx in range(3))
+    return total / 9
+
+
+def cartoonify(rgb: np.ndarray, args: List[str]) -> np.ndarray:
+    """
+    The cartoonify function flattens the colors of the image and draws its edges in black.
+    Colors are quantized to a few levels per channel; edges are where the gradient of the
+    blurred luminance is steep, found with central differences over the whole array.
+
+    :param rgb: np.ndarray: The image
+    :param args: List[str]: The line strength and the color reduction, 0 to 100, 50 by default
+    :return: The cartoonified image
+    """
+    line_strength = min(100, max(0, _int(args, 0, 50)))
+    color_reduction = min(100, max(0, _int(args, 1, 50)))
+    levels = max(2, round(16 - color_reduction * 0.14))
+    step = 256 / levels
+    flat = _to_uint8((np.floor(rgb / step) + 0.5) * step)
+
+    luminance = _box_blur(_luminance(rgb))
+    padded = np.pad(luminance, 1, mode="edge")
+    gradient = (
+        np.abs(padded[1:-1, 2:] - padded[1:-1, :-2])
+        + np.abs(padded[2:, 1:-1] - padded[:-2, 1:-1])
+    )
+    flat[gradient > 100 - line_strength * 0.8] = 0
+    return flat
+
+
+# Per channel tone curves as (input, output) points, and a saturation factor.
+ART_FILTERS: Dict[str, Tuple[Curve, Curve, Curve, float]] = {
+    "al_dente": (
+        ((0, 20), (128, 150), (255, 255)),
+        ((0, 10), (128, 130), (255, 240)),
+        ((0, 0), (128, 105), (255, 210)),
+        1.1,
+    ),
+    "audrey": (((0, 0), (64, 40), (192, 215), (255, 255)),) * 3 + (0.0,),
+    "eucalyptus": (
+        ((0, 0), (128, 115), (255, 235)),
+        ((0, 15), (128, 140), (255, 255)),
+        ((0, 10), (128, 128), (255, 240)),
+        0.9,
+    ),
+    "incognito": (((0, 40), (128, 128), (255, 220)),) * 3 + (0.6,),
+    "linen": (
+        ((0, 30), (128, 145), (255, 250)),
+        ((0, 25), (128, 135), (255, 240)),
+        ((0, 20), (128, 120), (255, 225)),
+        0.8,
+    ),
+    "peacock": (
+        ((0, 0), (128, 110), (255, 235)),
+        ((0, 5), (128, 135), (255, 255)),
+        ((0, 15), (128, 150), (255, 255)),
+        1.3,
+    ),
+    "red_rock": (
+        ((0, 10), (128, 155), (255, 255)),
+        ((0, 0), (128, 115), (255, 235)),
+        ((0, 0), (128, 95), (255, 210)),
+        1.2,
+    ),
+    "stucco": (
+        ((0, 45), (128, 145), (255, 235)),
+        ((0, 40), (128, 140), (255, 230)),
+        ((0, 40), (128, 135), (255, 225)),
+        0.7,
+    ),
+    "zorro": (
+        ((0, 0), (64, 35), (192, 220), (255, 255)),
+        ((0, 0), (64, 40), (192, 210), (255, 245)),
+        ((0, 0), (64, 45), (192, 200), (255, 235)),
+        0.5,
+    ),
+}
+
+
+@functools.lru_cache(maxsize=None)
+def art_lut(name: str) -> Tuple[np.ndarray, float]:
+    """
+    The art_lut function builds the lookup table of an art filter from its tone curves.
+
+    :param name: str: The name of the filter, e.g. zorro
+    :return: A (3, 256) uint8 table, one row per channel, and the saturation factor
+    """
+    *curves, saturation = ART_FILTERS[name]
+    levels = np.arange(256)
+    lut = np.stack([np.interp(levels, *zip(*curve)) for curve in curves])
+    lut = _to_uint8(lut)
+    lut.setflags(write=False)
+    return lut, saturation
+
+
+def art(rgb: np.ndarray, args: List[str]) -> np.ndarray:
+    """
+    The art function approximates the Cloudinary art:<filter> effects with a lookup table per channel
+    followed by a saturation change. Unknown filters leave the image as it is.
+
+    :param rgb: np.ndarray: The image
+    :param args: List[str]: The name of the filter
+    :return: The filtered image
+    """
+    if not args or args[0] not in ART_FILTERS:
+        return rgb
+    lut, saturation = art_lut(args[0])
+    toned = lut[np.arange(3), rgb]
+    if saturation == 1:
+        return toned
+    gray = _luminance(toned)[..., None]
+    return _to_uint8(gray + (toned - gray) * saturation)
+
+
+EFFECTS: Dict[str, Effect] = {
+    "art": art,
+    "cartoonify": cartoonify,
+    "grayscale": grayscale,
+    "pixelate": pixelate,
+    "vignette": vignette,
+}
+
+
+def apply_effect(rgb: np.ndarray, effect: str) -> np.ndarray:
+    """
+    The apply_effect function applies a Cloudinary effect, written as name:arg:arg, to an RGB image array.
+    Effects without a local implementation leave the image as it is.
+
+    :param rgb: np.ndarray: The image as a (height, width, 3) uint8 array
+    :param effect: str: The effect, e.g. pixelate:5, vignette, art:zorro
+    :return: The new image array
+    """
+    name, *args = effect.split(":")
+    implementation = EFFECTS.get(name)
+    if implementation is None:
+        return rgb
+    return implementation(rgb, args)
@@ -0,0 +1,228 @@
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+from PIL import Image, ImageChops, ImageDraw, ImageOps
+
+from src.services import effects
+
+Actions = List[Dict[str, Any]]
+
+FORMATS = {".jpg": "JPEG", ".jpeg": "JPEG", ".png": "PNG", ".gif": "GIF", ".webp": "WEBP"}
+WHITE = (255, 255, 255)
+
+
+def canonical_params(actions: Actions) -> Tuple[str, str]:
+    """
+    The canonical_params function serializes the actions in a canonical form and hashes them.
+    Two requests producing the same image have the same actions, and so the same hash,
+    whatever the order of the keys they were written with.
+
+    :param actions: Actions: The chained Cloudinary actions
+    :return: The canonical JSON of the actions and its SHA-256
+    """
+    params = json.dumps(actions, sort_keys=True, separators=(",", ":"))
+    return params, hashlib.sha256(params.encode()).hexdigest()
+
+
+def output_extension(actions: Actions, source_extension: str) -> str:
+    """
+    The output_extension function picks the file type of a derivative before it is rendered.
+    An explicit fetch_format wins, auto keeps the type of the original;
+    rounded images need transparency and are not written as JPEG.
+
+    :param actions: Actions: The chained Cloudinary actions
+    :param source_extension: str: The extension of the original, with the dot
+    :return: The extension of the derivative, with the dot
+    """
+    extension = source_extension.lower()
+    for action in actions:
+        requested = f".{action.get('fetch_format', 'auto')}"
+        if requested in FORMATS:
+            extension = requested
+    if extension not in FORMATS:
+        extension = ".png"
+    if FORMATS[extension] == "JPEG" and any("radius" in action for action in actions):
+        return ".png"
+    return extension
+
+
+def _ratio(value: Any) -> float | None:
+    if value is None:
+        return None
+    if isinstance(value, str) and ":" in value:
+        width, height = value.split(":", 1)
+        return float(width) / float(height)
+    return float(value)
+
+
+def _target_size(size: Tuple[int, int], action: Dict[str, Any]) -> Tuple[int | None, int | None] | None:
+    width, height = action.get("width"), action.get("height")
+    ratio = _ratio(action.get("aspect_ratio"))
+    if ratio:
+        if width and not height:
+            height = max(1, round(width / ratio))
+        elif height and not width:
+            width = max(1, round(height * ratio))
+        elif not width and not height:
+            source_width, source_height = size
+            if source_width / source_height > ratio:
+                width, height = max(1, round(source_height * ratio)), source_height
+            else:
+                width, height = source_width, max(1, round(source_width / ratio))
+    if not width and not height:
+        return None
+    return width, height
+
+
+def _background(image: Image.Image) -> Any:
+    return (255, 255, 255, 0) if image.mode in ("RGBA", "LA") else WHITE
+
+
+def resize(image: Image.Image, action: Dict[str, Any]) -> Image.Image:
+    """
+    The resize function applies the size part of an action the way Cloudinary does for the same crop mode:
+    scale stretches to the size, fit and limit fit inside it (limit never enlarges), mfit only enlarges,
+    pad fits and fills the rest, crop cuts the size out of the center, fill and thumb cover the size and crop.
+    With a single dimension every mode keeps the aspect ratio of the image.
+
+    :param image: Image.Image: The image
+    :param action: Dict[str, Any]: The action with width, height, aspect_ratio and crop
+    :return: The resized image
+    """
+    target = _target_size(image.size, action)
+    if target is None:
+        return image
+    source_width, source_height = image.size
+    width, height = target
+    single = width is None or height is None
+    width = width or max(1, round(source_width * height / source_height))
+    height = height or max(1, round(source_height * width / source_width))
+    crop = action.get("crop") or "scale"
+
+    if crop == "limit":
+        if source_width <= width and source_height <= height:
+            return image
+        return ImageOps.contain(image, (width, height))
+    if crop == "mfit":
+        scale = max(width / source_width, height / source_height)
+        if scale <= 1:
+            return image
+        return image.resize((round(source_width * scale), round(source_height * scale)))
+    if single or crop == "scale":
+        return image.resize((width, height))
+    if crop == "fit":
+        return ImageOps.contain(image, (width, height))
+    if crop == "pad":
+        return ImageOps.pad(image, (width, height), color=_background(image))
+    if crop == "crop":
+        left = max(0, (source_width - width) // 2)
+        top = max(0, (source_height - height) // 2)
+        return image.crop((left, top, left + min(width, source_width), top + min(height, source_height)))
+    # fill, lfill, thumb and the AI crops: cover the size and keep the center.
+    return ImageOps.fit(image, (width, height))
+
+
+def round_corners(image: Image.Image, radius: Any) -> Image.Image:
+    """
+    The round_corners function makes the corners of the image transparent.
+
+    :param image: Image.Image: The image
+    :param radius: Any: The corner radius in pixels, or "max" for a circle or an ellipse
+    :return: The image with an alpha channel
+    """
+    image = image.convert("RGBA")
+    mask = Image.new("L", image.size, 0)
+    draw = ImageDraw.Draw(mask)
+    box = (0, 0, image.width - 1, image.height - 1)
+    if radius == "max":
+        draw.ellipse(box, fill=255)
+    else:
+        draw.rounded_rectangle(box, radius=int(radius), fill=255)
+    image.putalpha(ImageChops.multiply(image.getchannel("A"), mask))
+    return image
+
+
+def apply_effect(image: Image.Image, effect: str) -> Image.Image:
+    """
+    The apply_effect function runs an effect of the effects module on the color channels of the image;
+    the alpha channel, if any, is kept as it is.
+
+    :param image: Image.Image: The image
+    :param effect: str: The Cloudinary effect, e.g. pixelate:5
+    :return: The image with the effect
+    """
+    if effect.partition(":")[0] not in effects.EFFECTS:
+        # Other Cloudinary effects have no local implementation, the image is left as it is.
+        return image
+    alpha = image.getchannel("A") if image.mode in ("RGBA", "LA") else None
+    rgb = np.asarray(image.convert("RGB"))
+    result = Image.fromarray(effects.apply_effect(rgb, effect), "RGB")
+    if alpha is not None:
+        result.putalpha(alpha)
+    return result
+
+
+def transform_image(image: Image.Image, actions: Actions) -> Image.Image:
+    """
+    The transform_image function applies chained Cloudinary actions, as built from a CropSchema, to an image.
+    The actions run in order; fetch_format only chooses the file type and is handled by output_extension.
+
+    :param image: Image.Image: The original image
+    :param actions: Actions: The chained Cloudinary actions
+    :return: The transformed image
+    """
+    for action in actions:
+        if {"width", "height", "aspect_ratio"} & action.keys():
+            image = resize(image, action)
+        if "radius" in action:
+            image = round_corners(image, action["radius"])
+        if "angle" in action:
+            # Cloudinary turns clockwise, Pillow counterclockwise.
+            image = image.rotate(-float(action["angle"]), expand=True, fillcolor=_background(image))
+        if "effect" in action:
+            image = apply_effect(image, action["effect"])
+    return image
+
+
+def derive_file(source: str, target: str, actions: Actions) -> Tuple[int, int]:
+    """
+    The derive_file function makes sure the derivative exists, rendering it only if it is not on disk yet.
+
+    :param source: str: The path of the original
+    :param target: str: The path of the derivative
+    :param actions: Actions: The chained Cloudinary actions
+    :return: The width and height of the derivative
+    """
+    if not os.path.exists(target):
+        return render_file(source, target, actions)
+    with Image.open(target) as image:
+        return image.size
+
+
+def render_file(source: str, target: str, actions: Actions) -> Tuple[int, int]:
+    """
+    The render_file function writes the derivative of an image file.
+    It runs in a worker process: only the paths and the actions travel between processes, not the pixels.
+    The file appears atomically, a reader never sees half of it.
+
+    :param source: str: The path of the original
+    :param target: str: The path of the derivative, its extension selects the format
+    :param actions: Actions: The chained Cloudinary actions
+    :return: The width and height of the derivative
+    """
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA", "L", "LA"):
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+        result = transform_image(image, actions)
+    image_format = FORMATS[os.path.splitext(target)[1].lower()]
+    if image_format == "JPEG" and result.mode not in ("RGB", "L"):
+        result = result.convert("RGB")
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp = f"{target}.{os.getpid()}.part"
+    result.save(tmp, format=image_format)
+    os.replace(tmp, target)
+    return result.size
@@ -0,0 +1,139 @@
+import asyncio
+import hashlib
+from collections import OrderedDict
+from enum import Enum
+from io import BytesIO
+from typing import Callable, Dict, Tuple
+
+import qrcode
+
+from src.conf.config import config
+
+# Bump when the rendering changes, so that clients do not keep serving the old images.
+RENDER_VERSION = 1
+# The images are only served to the owner of the photo, so shared caches must not keep them.
+CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+
+class QRFormat(str, Enum):
+    png = "png"
+    svg = "svg"
+
+
+MEDIA_TYPES = {QRFormat.png: "image/png", QRFormat.svg: "image/svg+xml"}
+
+
+def build_qr_code(data: str) -> qrcode.QRCode:
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=10,
+        border=4,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+    return qr
+
+
+def render_png(data: str) -> bytes:
+    img = build_qr_code(data).make_image(fill_color="black", back_color="white")
+    buffer = BytesIO()
+    img.save(buffer)
+    return buffer.getvalue()
+
+
+def render_svg(data: str) -> bytes:
+    """
+    The render_svg function draws the QR code as an SVG document straight from the module matrix, without PIL.
+    Every horizontal run of dark modules becomes one rectangle of the path, in module units;
+    the image is scaled by the client, so the document stays a few kilobytes.
+
+    :param data: str: The text to encode
+    :return: The SVG document
+    """
+    matrix = build_qr_code(data).get_matrix()
+    size = len(matrix)
+    path = []
+    for y, row in enumerate(matrix):
+        x = 0
+        while x < size:
+            if not row[x]:
+                x += 1
+                continue
+            start = x
+            while x < size and row[x]:
+                x += 1
+            path.append(f"M{start} {y}h{x - start}v1h-{x - start}z")
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {size} {size}" shape-rendering="crispEdges">'
+        f'<rect width="{size}" height="{size}" fill="#fff"/>'
+        f'<path d="{"".join(path)}" fill="#000"/></svg>'
+    ).encode()
+
+
+RENDERERS: Dict[QRFormat, Callable[[str], bytes]] = {QRFormat.png: render_png, QRFormat.svg: render_svg}
+
+
+class QRRenderer:
+    def __init__(self, maxbytes: int):
+        """
+        The __init__ function sets up an in-process cache of rendered QR codes.
+        The cache is bounded by the total size of the images rather than their number,
+        the least recently used images are dropped first.
+
+        :param self: Represent the instance of the class
+        :param maxbytes: int: The total size of the images kept, in bytes
+        :return: None
+        """
+        self.maxbytes = maxbytes
+        self.size = 0
+        self._data: OrderedDict[Tuple[str, QRFormat], bytes] = OrderedDict()
+
+    @staticmethod
+    def etag(data: str, fmt: QRFormat) -> str:
+        """
+        The etag function returns the strong ETag of the QR code of data.
+        It depends only on the input and RENDER_VERSION, so it is known before anything is rendered.
+
+        :param data: str: The text to encode
+        :param fmt: QRFormat: The image format
+        :return: The quoted ETag
+        """
+        digest = hashlib.sha256(f"{RENDER_VERSION}:{fmt.value}:{data}".encode()).hexdigest()
+        return f'"{digest[:32]}"'
+
+    async def render(self, data: str, fmt: QRFormat) -> bytes:
+        """
+        The render function returns the QR code of data, rendering it in a worker thread on a cache miss.
+
+        :param self: Represent the instance of the class
+        :param data: str: The text to encode
+        :param fmt: QRFormat: The image format
+        :return: The image bytes
+        """
+        key = (data, fmt)
+        image = self._data.get(key)
+        if image is not None:
+            self._data.move_to_end(key)
+            return image
+        image = await asyncio.to_thread(RENDERERS[fmt], data)
+        self._store(key, image)
+        return image
+
+    def _store(self, key: Tuple[str, QRFormat], image: bytes) -> None:
+        if len(image) > self.maxbytes:
+            return
+        old = self._data.pop(key, None)
+        if old is not None:
+            self.size -= len(old)
+        self._data[key] = image
+        self.size += len(image)
+        while self.size > self.maxbytes:
+            _, evicted = self._data.popitem(last=False)
+            self.size -= len(evicted)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+qr_renderer = QRRenderer(maxbytes=config.QR_CACHE_BYTES)
@@ -1,7 +1,7 @@
 from fastapi import Request, Depends, HTTPException, status
 
-from src.entity.models import Role, User
-from src.services.auth import auth_service
+from src.entity.models import Role
+from src.services.auth import auth_service, Principal
 from src.conf.massages import RolesMessages as role_massages
 
 
@@ -18,16 +18,16 @@ class RoleAccess:
         """
         self.allowed_roles = allowed_roles
 
-    async def __call__(self, request: Request, user: User = Depends(auth_service.get_current_user)):
+    async def __call__(self, request: Request, user: Principal = Depends(auth_service.get_principal)):
         """
         The __call__ function is a decorator that takes in the request and user,
-        and returns the response. The user is passed to this function by Depends(auth_service.get_current_user).
+        and returns the response. The user is passed to this function by Depends(auth_service.get_principal).
         The auth service will check if there's a valid token in the Authorization header of the request,
-        and return an instance of User if it exists.
+        and return the id, email and role of the caller if it is.
 
         :param self: Access the class attributes
         :param request: Request: Get the request object
-        :param user: User: Pass the user object to the function
+        :param user: Principal: Pass the caller to the function
         :return: A function that can be used as a decorator
         """
         if user.role not in self.allowed_roles:
@@ -0,0 +1,126 @@
+from typing import Set
+
+import redis.asyncio as redis
+
+from src.conf.config import config
+from src.services.cache import redis_client
+
+# Swap the stored jti for the new one only if the presented jti is the current one.
+# Returns 1 when rotated, -1 when an older jti of a live session is replayed, 0 when there is no session.
+_ROTATE = """
+local current = redis.call('GET', KEYS[1])
+if not current then
+    return 0
+end
+if current ~= ARGV[1] then
+    return -1
+end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+return 1
+"""
+
+
+class SessionStore:
+    PREFIX = "refresh_session"
+
+    def __init__(self, redis_client: redis.Redis, ttl: int):
+        """
+        The __init__ function sets up the store of refresh sessions.
+        A session is one logged in device of a user. Redis keeps the jti of the only refresh token
+        of the session that may still be used, and forgets the session when the token expires.
+
+        :param self: Represent the instance of the class
+        :param redis_client: redis.Redis: The Redis connection holding the sessions
+        :param ttl: int: The lifetime of a refresh token, in seconds
+        :return: None
+        """
+        self.redis = redis_client
+        self.ttl = ttl
+
+    def _session_key(self, user_id: int, session_id: str) -> str:
+        return f"{self.PREFIX}:{user_id}:{session_id}"
+
+    def _index_key(self, user_id: int) -> str:
+        return f"{self.PREFIX}:{user_id}"
+
+    async def create(self, user_id: int, session_id: str, jti: str) -> None:
+        """
+        The create function starts a session, or replaces the session of the same device.
+
+        :param self: Represent the instance of the class
+        :param user_id: int: The id of the user
+        :param session_id: str: The id of the device
+        :param jti: str: The id of the refresh token issued for the session
+        :return: None
+        """
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.set(self._session_key(user_id, session_id), jti, ex=self.ttl)
+            pipe.sadd(self._index_key(user_id), session_id)
+            pipe.expire(self._index_key(user_id), self.ttl)
+            await pipe.execute()
+
+    async def rotate(self, user_id: int, session_id: str, jti: str, new_jti: str) -> bool:
+        """
+        The rotate function replaces the refresh token of a session with a new one.
+        A refresh token can be used once. If a token that was already rotated away is presented again,
+        it has leaked, so every session of the user is revoked.
+
+        :param self: Represent the instance of the class
+        :param user_id: int: The id of the user
+        :param session_id: str: The id of the device
+        :param jti: str: The id of the presented refresh token
+        :param new_jti: str: The id of the refresh token to issue
+        :return: True if the session was rotated
+        """
+        result = await self.redis.eval(
+            _ROTATE,
+            2,
+            self._session_key(user_id, session_id),
+            self._index_key(user_id),
+            jti,
+            new_jti,
+            self.ttl,
+        )
+        if result == -1:
+            await self.revoke_all(user_id)
+        return result == 1
+
+    async def sessions(self, user_id: int) -> Set[str]:
+        """
+        The sessions function returns the ids of the devices the user may be logged in on.
+
+        :param self: Represent the instance of the class
+        :param user_id: int: The id of the user
+        :return: A set of session ids
+        """
+        members = await self.redis.smembers(self._index_key(user_id))
+        return {member.decode() if isinstance(member, bytes) else member for member in members}
+
+    async def revoke(self, user_id: int, session_id: str) -> None:
+        """
+        The revoke function logs the user out of one device.
+
+        :param self: Represent the instance of the class
+        :param user_id: int: The id of the user
+        :param session_id: str: The id of the device
+        :return: None
+        """
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(self._session_key(user_id, session_id))
+            pipe.srem(self._index_key(user_id), session_id)
+            await pipe.execute()
+
+    async def revoke_all(self, user_id: int) -> None:
+        """
+        The revoke_all function logs the user out of every device.
+
+        :param self: Represent the instance of the class
+        :param user_id: int: The id of the user
+        :return: None
+        """
+        keys = [self._session_key(user_id, session_id) for session_id in await self.sessions(user_id)]
+        await self.redis.delete(self._index_key(user_id), *keys)
+
+
+session_store = SessionStore(redis_client, ttl=config.REFRESH_TOKEN_TTL)
@@ -0,0 +1,342 @@
+import abc
+import asyncio
+import glob
+import hashlib
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, List
+
+import cloudinary
+import cloudinary.uploader
+from fastapi import UploadFile
+
+from src.conf.config import config
+from src.services.image_engine import canonical_params, derive_file, output_extension
+
+CHUNK_SIZE = 1024 * 1024
+# The version segment of a Cloudinary delivery URL, e.g. v1712345678/
+_VERSION = re.compile(r"^v\d+/")
+
+
+@dataclass(frozen=True)
+class StoredFile:
+    public_id: str
+    url: str
+    version: int | None = None
+
+
+@dataclass(frozen=True)
+class DerivedFile:
+    url: str
+    width: int | None = None
+    height: int | None = None
+    bytes: int | None = None
+
+
+class StorageBackend(abc.ABC):
+    # True when the storage makes a transformed image on the first request of its URL.
+    lazy_transformations = True
+
+    def __init__(self, concurrency: int):
+        """
+        The __init__ function sets up the limit of uploads in flight.
+        Uploads run in worker threads, the event loop keeps serving other requests meanwhile,
+        and the semaphore keeps a burst of uploads from exhausting the thread pool.
+
+        :param self: Represent the instance of the class
+        :param concurrency: int: The maximum number of uploads running at the same time
+        :return: None
+        """
+        self.concurrency = concurrency
+        self._semaphore: asyncio.Semaphore | None = None
+
+    async def upload(self, file: BinaryIO | bytes, public_id: str) -> StoredFile:
+        """
+        The upload function stores a file under public_id, replacing what was stored there before.
+
+        :param self: Represent the instance of the class
+        :param file: BinaryIO | bytes: The content of the file
+        :param public_id: str: The path of the file inside the storage, without extension
+        :return: The stored file, its public_id is the one to pass to url and delete
+        """
+        async with self._semaphore_for_upload():
+            return await asyncio.to_thread(self._upload, file, public_id)
+
+    async def delete(self, public_id: str) -> None:
+        """
+        The delete function removes the file stored under public_id, if there is one.
+
+        :param self: Represent the instance of the class
+        :param public_id: str: The path of the file inside the storage
+        :return: None
+        """
+        await asyncio.to_thread(self._delete, public_id)
+
+    async def generate(self, public_id: str, transformations: List[List[Dict[str, Any]]]) -> List[DerivedFile]:
+        """
+        The generate function asks the storage to produce the transformed images now,
+        rather than on the first request of their URL, and reports their size.
+        Backends that can not transform images only return the URLs.
+
+        :param self: Represent the instance of the class
+        :param public_id: str: The path of the original file inside the storage
+        :param transformations: List[List[Dict[str, Any]]]: The chained Cloudinary actions of every variant
+        :return: The derived files, in the order of the transformations
+        """
+        return [DerivedFile(url=self.url(public_id, transformation=actions)) for actions in transformations]
+
+    def shutdown(self) -> None:
+        """
+        The shutdown function releases the workers of the backend when the application stops.
+
+        :param self: Represent the instance of the class
+        :return: None
+        """
+
+    @abc.abstractmethod
+    def public_id(self, url: str) -> str:
+        """
+        The public_id function returns the path inside the storage of a file, given the URL returned by upload.
+
+        :param self: Represent the instance of the class
+        :param url: str: The URL of the file
+        :return: The public_id of the file
+        """
+
+    @abc.abstractmethod
+    def url(self, public_id: str, version: int | None = None, **transformation: Any) -> str:
+        """
+        The url function returns the address the file is served from.
+        Backends that can not resize images on the fly ignore the transformation.
+
+        :param self: Represent the instance of the class
+        :param public_id: str: The path of the file inside the storage
+        :param version: int | None: The version returned by upload, busts CDN caches
+        :param transformation: Any: Cloudinary style options, e.g. width, height, crop
+        :return: The URL of the file
+        """
+
+    def _semaphore_for_upload(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    @abc.abstractmethod
+    def _upload(self, file: BinaryIO | bytes, public_id: str) -> StoredFile:
+        ...
+
+    @abc.abstractmethod
+    def _delete(self, public_id: str) -> None:
+        ...
+
+
+class CloudinaryStorage(StorageBackend):
+    def __init__(self, concurrency: int):
+        super().__init__(concurrency)
+        cloudinary.config(
+            cloud_name=config.CLD_NAME,
+            api_key=config.CLD_API_KEY,
+            api_secret=config.CLD_API_SECRET,
+            secure=True,
+        )
+
+    async def generate(self, public_id: str, transformations: List[List[Dict[str, Any]]]) -> List[DerivedFile]:
+        if not transformations:
+            return []
+        async with self._semaphore_for_upload():
+            response = await asyncio.to_thread(
+                cloudinary.uploader.explicit,
+                public_id,
+                type="upload",
+                eager=[{"transformation": actions} for actions in transformations],
+            )
+        derived = []
+        for actions, eager in zip(transformations, response.get("eager") or [{}] * len(transformations)):
+            derived.append(
+                DerivedFile(
+                    url=self.url(public_id, transformation=actions),
+                    width=eager.get("width"),
+                    height=eager.get("height"),
+                    bytes=eager.get("bytes"),
+                )
+            )
+        return derived
+
+    def public_id(self, url: str) -> str:
+        path = url.split("/upload/", 1)[-1]
+        path = _VERSION.sub("", path)
+        return os.path.splitext(path)[0]
+
+    def url(self, public_id: str, version: int | None = None, **transformation: Any) -> str:
+        return cloudinary.CloudinaryImage(public_id).build_url(version=version, **transformation)
+
+    def _upload(self, file: BinaryIO | bytes, public_id: str) -> StoredFile:
+        response = cloudinary.uploader.upload(
+            file, public_id=public_id, overwrite=True, resource_type="image"
+        )
+        return StoredFile(
+            public_id=response.get("public_id", public_id),
+            url=response.get("secure_url") or response.get("url"),
+            version=response.get("version"),
+        )
+
+    def _delete(self, public_id: str) -> None:
+        cloudinary.uploader.destroy(public_id)
+
+
+_SIGNATURES = (
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"GIF8", ".gif"),
+    (b"<svg", ".svg"),
+    (b"<?xml", ".svg"),
+)
+
+
+class LocalStorage(StorageBackend):
+    lazy_transformations = False
+    DERIVED = "_derived"
+
+    def __init__(self, concurrency: int, root: str, base_url: str, transform_workers: int = 2):
+        """
+        The __init__ function sets up storage in a directory of the local filesystem.
+        main.py serves the directory under base_url, so the stack runs without Cloudinary.
+        Transformations are rendered with Pillow in a pool of worker processes
+        and kept on disk under the hash of their parameters.
+
+        :param self: Represent the instance of the class
+        :param concurrency: int: The maximum number of uploads running at the same time
+        :param root: str: The directory files are written to
+        :param base_url: str: The URL prefix the directory is served under
+        :param transform_workers: int: The number of processes rendering transformations
+        :return: None
+        """
+        super().__init__(concurrency)
+        self.root = Path(root).resolve()
+        self.base_url = base_url.rstrip("/")
+        self.transform_workers = transform_workers
+        self._executor: ProcessPoolExecutor | None = None
+
+    def _path(self, public_id: str) -> Path:
+        path = (self.root / public_id).resolve()
+        if self.root not in path.parents:
+            raise ValueError(f"public_id escapes the storage root: {public_id}")
+        return path
+
+    @staticmethod
+    def _extension(data: bytes) -> str:
+        if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+            return ".webp"
+        for signature, extension in _SIGNATURES:
+            if data.startswith(signature):
+                return extension
+        return ""
+
+    def derived_id(self, public_id: str, actions: List[Dict[str, Any]]) -> str:
+        """
+        The derived_id function returns where the transformation of a file is stored.
+        The path depends only on the file and the canonical hash of the actions,
+        so a derivative rendered once is found again by every later request.
+
+        :param self: Represent the instance of the class
+        :param public_id: str: The path of the original file inside the storage
+        :param actions: List[Dict[str, Any]]: The chained Cloudinary actions
+        :return: The path of the derivative inside the storage
+        """
+        _, params_hash = canonical_params(actions)
+        stem, extension = os.path.splitext(public_id)
+        return f"{self.DERIVED}/{params_hash[:16]}/{stem}{output_extension(actions, extension)}"
+
+    async def generate(self, public_id: str, transformations: List[List[Dict[str, Any]]]) -> List[DerivedFile]:
+        if not transformations:
+            return []
+        source = str(self._path(public_id))
+        derived_ids = [self.derived_id(public_id, actions) for actions in transformations]
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.transform_workers)
+        loop = asyncio.get_running_loop()
+        sizes = await asyncio.gather(
+            *(loop.run_in_executor(self._executor, derive_file, source, str(self._path(derived_id)), actions)
+              for derived_id, actions in zip(derived_ids, transformations))
+        )
+        return [
+            DerivedFile(
+                url=f"{self.base_url}/{derived_id}",
+                width=width,
+                height=height,
+                bytes=self._path(derived_id).stat().st_size,
+            )
+            for derived_id, (width, height) in zip(derived_ids, sizes)
+        ]
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def public_id(self, url: str) -> str:
+        return url.split("?", 1)[0].removeprefix(self.base_url + "/")
+
+    def url(self, public_id: str, version: int | None = None, **transformation: Any) -> str:
+        actions = transformation.get("transformation")
+        if actions:
+            return f"{self.base_url}/{self.derived_id(public_id, actions)}"
+        return f"{self.base_url}/{public_id}" + (f"?v={version}" if version else "")
+
+    def _upload(self, file: BinaryIO | bytes, public_id: str) -> StoredFile:
+        data = file if isinstance(file, bytes) else file.read()
+        path = self._path(public_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Overwrite, also when the new file has another format than the old one.
+        for old in path.parent.glob(f"{glob.escape(path.name)}.*"):
+            old.unlink(missing_ok=True)
+        path = path.with_name(path.name + self._extension(data))
+        tmp = path.with_name(path.name + ".part")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+        public_id = path.relative_to(self.root).as_posix()
+        version = path.stat().st_mtime_ns
+        return StoredFile(public_id=public_id, url=self.url(public_id, version), version=version)
+
+    def _delete(self, public_id: str) -> None:
+        self._path(public_id).unlink(missing_ok=True)
+
+
+async def hash_upload(file: UploadFile, chunk_size: int = CHUNK_SIZE) -> str:
+    """
+    The hash_upload function computes the SHA-256 of an uploaded file.
+    The file is read chunk by chunk, so a large upload is never held in memory at once,
+    and is rewound afterwards, ready to be stored.
+
+    :param file: UploadFile: The uploaded file
+    :param chunk_size: int: How many bytes to read at a time
+    :return: The hex digest of the content
+    """
+    digest = hashlib.sha256()
+    await file.seek(0)
+    while chunk := await file.read(chunk_size):
+        digest.update(chunk)
+    await file.seek(0)
+    return digest.hexdigest()
+
+
+def create_storage() -> StorageBackend:
+    """
+    The create_storage function builds the backend selected by STORAGE_BACKEND.
+
+    :return: The storage backend
+    """
+    if config.STORAGE_BACKEND == "local":
+        return LocalStorage(
+            config.STORAGE_UPLOAD_CONCURRENCY,
+            config.STORAGE_LOCAL_ROOT,
+            config.STORAGE_LOCAL_URL,
+            config.TRANSFORMATION_WORKERS,
+        )
+    return CloudinaryStorage(config.STORAGE_UPLOAD_CONCURRENCY)
+
+
+storage = create_storage()
@@ -0,0 +1,126 @@
+import heapq
+import time
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Mapping, Tuple
+
+from src.conf.config import config
+
+# (id, name, number of photos)
+TagUsage = Tuple[int, str, int]
+
+# Sorts after every character, so (prefix + END,) bounds all keys starting with prefix.
+END = "\U0010ffff"
+
+
+class TagIndex:
+    def __init__(self, ttl: int):
+        """
+        The __init__ function sets up an in-process index of the tags for suggestions while typing.
+        The casefolded names are kept in a sorted list: the tags starting with a prefix are one
+        contiguous slice found with two bisections, then ranked by the number of photos using them.
+        The index is changed in place by the tag writes of this process and rebuilt from the database
+        once it is older than ttl, which also brings in the writes of the other workers.
+
+        :param self: Represent the instance of the class
+        :param ttl: int: The age, in seconds, after which the index is rebuilt
+        :return: None
+        """
+        self.ttl = ttl
+        self._keys: List[Tuple[str, int]] = []
+        self._names: Dict[int, str] = {}
+        self._usage: Dict[int, int] = {}
+        self._loaded_at: float | None = None
+        self._loading = False
+
+    @property
+    def fresh(self) -> bool:
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl
+
+    def claim_reload(self) -> bool:
+        """
+        The claim_reload function tells the caller to rebuild the index, unless another request is doing it already.
+
+        :param self: Represent the instance of the class
+        :return: True if the caller should load the index
+        """
+        if self.fresh or self._loading:
+            return False
+        self._loading = True
+        return True
+
+    def load(self, tags: Iterable[TagUsage]) -> None:
+        """
+        The load function replaces the content of the index.
+
+        :param self: Represent the instance of the class
+        :param tags: Iterable[TagUsage]: Every tag with the number of its photos
+        :return: None
+        """
+        names, usage = {}, {}
+        for tag_id, name, count in tags:
+            names[tag_id] = name
+            usage[tag_id] = count
+        self._names, self._usage = names, usage
+        self._keys = sorted((name.casefold(), tag_id) for tag_id, name in names.items())
+        self._loaded_at = time.monotonic()
+        self._loading = False
+
+    def release(self) -> None:
+        self._loading = False
+
+    def suggest(self, prefix: str, limit: int) -> List[TagUsage]:
+        """
+        The suggest function returns the most used tags whose name starts with prefix, ignoring case.
+
+        :param self: Represent the instance of the class
+        :param prefix: str: The beginning of the name
+        :param limit: int: The number of tags returned at most
+        :return: The tags, most used first, then by name
+        """
+        key = prefix.casefold()
+        start = bisect_left(self._keys, (key,))
+        stop = bisect_left(self._keys, (key + END,), lo=start)
+        matches = heapq.nsmallest(
+            limit, self._keys[start:stop], key=lambda item: (-self._usage[item[1]], item[0])
+        )
+        return [(tag_id, self._names[tag_id], self._usage[tag_id]) for _, tag_id in matches]
+
+    def add(self, tag_id: int, name: str) -> None:
+        if self._loaded_at is None or tag_id in self._names:
+            return
+        self._names[tag_id] = name
+        self._usage[tag_id] = 0
+        insort(self._keys, (name.casefold(), tag_id))
+
+    def remove(self, tag_id: int) -> None:
+        name = self._names.pop(tag_id, None)
+        if name is None:
+            return
+        del self._usage[tag_id]
+        key = (name.casefold(), tag_id)
+        index = bisect_left(self._keys, key)
+        if index < len(self._keys) and self._keys[index] == key:
+            del self._keys[index]
+
+    def rename(self, tag_id: int, name: str) -> None:
+        if tag_id not in self._names:
+            return
+        usage = self._usage[tag_id]
+        self.remove(tag_id)
+        self.add(tag_id, name)
+        self._usage[tag_id] = usage
+
+    def use(self, deltas: Mapping[int, int]) -> None:
+        """
+        The use function shifts the number of photos of tags, after links between photos and tags changed.
+
+        :param self: Represent the instance of the class
+        :param deltas: Mapping[int, int]: The ids of the tags mapped to the change of their number of photos
+        :return: None
+        """
+        for tag_id, delta in deltas.items():
+            if tag_id in self._usage:
+                self._usage[tag_id] = max(0, self._usage[tag_id] + delta)
+
+
+tag_index = TagIndex(ttl=config.TAG_INDEX_TTL)
@@ -0,0 +1,117 @@
+import struct
+from dataclasses import dataclass, replace
+from typing import Dict
+
+from src.entity.models import Role, User
+
+SNAPSHOT_VERSION = 1
+
+# version, id, verified, count_photo, count_comment, count_rating, count_friendship
+_HEADER = struct.Struct("!BQ?IIII")
+_LENGTH = struct.Struct("!H")
+_NONE = 0xFFFF
+
+
+@dataclass(frozen=True, slots=True)
+class UserSnapshot:
+    id: int
+    email: str
+    username: str
+    role: Role
+    avatar: str | None
+    verified: bool
+    count_photo: int = 0
+    count_comment: int = 0
+    count_rating: int = 0
+    count_friendship: int = 0
+
+    @classmethod
+    def from_user(cls, user: User) -> "UserSnapshot":
+        """
+        The from_user function copies the fields the routes need out of an ORM user.
+
+        :param cls: Represent the class
+        :param user: User: The user loaded from the database
+        :return: A detached, immutable snapshot of the user
+        """
+        return cls(
+            id=user.id,
+            email=user.email,
+            username=user.username,
+            role=Role(user.role) if user.role else Role.user,
+            avatar=user.avatar,
+            verified=bool(user.verified),
+            count_photo=user.count_photo or 0,
+            count_comment=user.count_comment or 0,
+            count_rating=user.count_rating or 0,
+            count_friendship=user.count_friendship or 0,
+        )
+
+    def with_counters(self, counters: Dict[str, int]) -> "UserSnapshot":
+        """
+        The with_counters function returns a copy of the snapshot with fresh activity counters.
+
+        :param self: Represent the instance of the class
+        :param counters: Dict[str, int]: The counters read by repository.users.get_user_counters
+        :return: A new snapshot
+        """
+        return replace(self, **counters)
+
+    def dumps(self) -> bytes:
+        """
+        The dumps function encodes the snapshot into a compact binary payload.
+        The payload starts with SNAPSHOT_VERSION followed by the fixed-size fields,
+        then the strings, each prefixed with its length.
+
+        :param self: Represent the instance of the class
+        :return: The encoded snapshot
+        """
+        parts = [
+            _HEADER.pack(
+                SNAPSHOT_VERSION,
+                self.id,
+                self.verified,
+                self.count_photo,
+                self.count_comment,
+                self.count_rating,
+                self.count_friendship,
+            )
+        ]
+        for value in (self.email, self.username, self.role.value, self.avatar):
+            if value is None:
+                parts.append(_LENGTH.pack(_NONE))
+                continue
+            encoded = value.encode()
+            parts.append(_LENGTH.pack(len(encoded)))
+            parts.append(encoded)
+        return b"".join(parts)
+
+    @classmethod
+    def loads(cls, data: bytes) -> "UserSnapshot | None":
+        """
+        The loads function decodes a payload written by dumps.
+        Payloads of another schema version, or from before snapshots were introduced,
+        are reported as None so that the caller treats them as a cache miss.
+
+        :param cls: Represent the class
+        :param data: bytes: The encoded snapshot
+        :return: The snapshot, or None if the payload can not be read
+        """
+        if not data or data[0] != SNAPSHOT_VERSION:
+            return None
+        try:
+            _, user_id, verified, *counters = _HEADER.unpack_from(data)
+            offset = _HEADER.size
+            strings = []
+            for _ in range(4):
+                (length,) = _LENGTH.unpack_from(data, offset)
+                offset += _LENGTH.size
+                if length == _NONE:
+                    strings.append(None)
+                    continue
+                strings.append(data[offset:offset + length].decode())
+                offset += length
+        except (struct.error, UnicodeDecodeError):
+            return None
+        email, username, role, avatar = strings
+        return cls(user_id, email, username, Role(role), avatar, verified, *counters)
@@ -0,0 +1,71 @@
+import hashlib
+from typing import Any, Dict
+
+from fastapi import Request, Response, status
+
+# Private pages may be kept by the browser, but are checked with the server before every use.
+REVALIDATE = "private, no-cache"
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    The make_etag function builds a weak ETag from the values a response depends on,
+    such as a version counter and the query parameters, without serializing the response.
+
+    :param parts: Any: The values the response depends on
+    :return: The quoted weak ETag
+    """
+    digest = hashlib.sha256(":".join(str(part) for part in parts).encode()).hexdigest()
+    return f'W/"{digest[:32]}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    The etag_matches function tells whether an If-None-Match header lists the given ETag.
+    The comparison is weak, as required for If-None-Match: W/ prefixes are ignored on both sides.
+
+    :param if_none_match: str | None: The header sent by the client
+    :param etag: str: The current ETag of the resource
+    :return: True if the client copy is up to date
+    """
+    if not if_none_match:
+        return False
+    candidates = {candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")}
+    return "*" in candidates or etag.removeprefix("W/") in candidates
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """
+    The is_not_modified function tells whether the copy of the client is still current.
+
+    :param request: Request: The request with the If-None-Match header
+    :param etag: str: The current ETag of the resource
+    :return: True if the response can be 304 Not Modified
+    """
+    return etag_matches(request.headers.get("if-none-match"), etag)
+
+
+def validators(etag: str, cache_control: str = REVALIDATE) -> Dict[str, str]:
+    return {"ETag": etag, "Cache-Control": cache_control}
+
+
+def set_validators(response: Response, etag: str) -> None:
+    """
+    The set_validators function adds the ETag and Cache-Control headers to a full response.
+
+    :param response: Response: The response of the route
+    :param etag: str: The current ETag of the resource
+    :return: None
+    """
+    response.headers.update(validators(etag))
+
+
+def not_modified(etag: str, cache_control: str = REVALIDATE) -> Response:
+    """
+    The not_modified function returns an empty 304 response carrying the same validators as a full one.
+
+    :param etag: str: The current ETag of the resource
+    :param cache_control: str: The Cache-Control of the full response
+    :return: The 304 response
+    """
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=validators(etag, cache_control))
@@ -0,0 +1,114 @@
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Generic, List, Sequence, TypeVar
+
+from fastapi import HTTPException, Response, status
+from sqlalchemy import DateTime, Select, func, literal, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import InstrumentedAttribute
+
+from src.conf import massages
+
+T = TypeVar("T")
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+@dataclass
+class Page(Generic[T]):
+    items: List[T]
+    next_cursor: str | None
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """
+    The encode_cursor function packs the sort key of the last row of a page into an opaque string.
+
+    :param values: Sequence[Any]: The values of the sort key columns
+    :return: A URL safe cursor
+    """
+    payload = [{"dt": value.isoformat()} if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """
+    The decode_cursor function unpacks a cursor made by encode_cursor.
+    A cursor that was tampered with, or belongs to another list, is rejected with 400.
+
+    :param cursor: str: The cursor sent by the client
+    :param size: int: The number of sort key columns of the list
+    :return: The values of the sort key
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(payload, list) or len(payload) != size:
+            raise ValueError(cursor)
+        return [datetime.fromisoformat(value["dt"]) if isinstance(value, dict) else value for value in payload]
+    except (ValueError, TypeError, KeyError, binascii.Error, UnicodeDecodeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=massages.INVALID_CURSOR)
+
+
+def _sort_expression(column: InstrumentedAttribute, value: Any, dialect: str):
+    # SQLite keeps datetimes as text, with or without microseconds depending on who wrote them,
+    # so they are compared as julian days there.
+    if dialect == "sqlite" and isinstance(column.type, DateTime):
+        return func.julianday(column), None if value is None else func.julianday(literal(value, DateTime))
+    return column, None if value is None else literal(value, column.type)
+
+
+async def paginate(
+        db: AsyncSession,
+        statement: Select,
+        keys: Sequence[InstrumentedAttribute],
+        limit: int,
+        cursor: str | None = None,
+        skip: int = 0,
+) -> Page:
+    """
+    The paginate function returns one page of a select of ORM entities, in ascending order of keys.
+    With a cursor the page starts right after the row the cursor was made from, which the database
+    finds through the index on keys however deep the page is. Without a cursor skip rows are skipped
+    with OFFSET, for clients that still send skip. Both ways return the cursor of the next page.
+
+    :param db: AsyncSession: The database session
+    :param statement: Select: A select of one ORM entity, with its filters applied
+    :param keys: Sequence[InstrumentedAttribute]: Columns that order the rows uniquely, the primary key last
+    :param limit: int: The number of rows per page
+    :param cursor: str | None: The next_cursor of the previous page
+    :param skip: int: The number of rows to skip when there is no cursor
+    :return: The rows of the page and the cursor of the next one, None on the last page
+    """
+    dialect = db.bind.dialect.name
+    values = decode_cursor(cursor, len(keys)) if cursor else [None] * len(keys)
+    pairs = [_sort_expression(column, value, dialect) for column, value in zip(keys, values)]
+    order = [expression for expression, _ in pairs]
+    statement = statement.order_by(*order)
+    if cursor:
+        statement = statement.where(tuple_(*order) > tuple_(*(bound for _, bound in pairs)))
+    elif skip:
+        statement = statement.offset(skip)
+    result = await db.execute(statement.limit(limit + 1))
+    items = list(result.scalars().all())
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        if items:
+            next_cursor = encode_cursor([getattr(items[-1], column.key) for column in keys])
+    return Page(items=items, next_cursor=next_cursor)
+
+
+def set_next_cursor(response: Response, page: Page) -> None:
+    """
+    The set_next_cursor function passes the cursor of the next page in the X-Next-Cursor header,
+    the body of list endpoints stays a plain list.
+
+    :param response: Response: The response of the route
+    :param page: Page: The page being returned
+    :return: None
+    """
+    if page.next_cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = page.next_cursor
@@ -115,6 +115,10 @@ async function uploadPhoto(event) {
     }
 }
 
+function mediaUrl(url) {
+    return url.startsWith('http') ? url : `${API_BASE}${url}`;
+}
+
 // upload all photos
 async function loadPhotos(skip = 0, limit = 10) {
     const gallery = document.getElementById('photo-gallery');
@@ -146,8 +150,15 @@ async function loadPhotos(skip = 0, limit = 10) {
                 const photoCard = document.createElement('div');
                 photoCard.className = 'photo-card';
 
+                // Let the browser pick the smallest variant that fills the tile instead of the original.
+                const variants = (photo.variants || []).filter(variant => variant.width);
+                const srcset = variants.map(variant => `${mediaUrl(variant.url)} ${variant.width}w`).join(', ');
+                const src = variants.length ? variants[variants.length - 1].url : photo.file_path;
+
                 photoCard.innerHTML = `
-                    <img src="${photo.file_path.startsWith('http') ? photo.file_path : `${API_BASE}${photo.file_path}`}"
+                    <img src="${mediaUrl(src)}"
+                         ${srcset ? `srcset="${srcset}" sizes="(max-width: 600px) 100vw, 300px"` : ''}
+                         loading="lazy"
                          alt="${photo.title}"
                          class="photo-img">
                     <h3>${photo.title}</h3>
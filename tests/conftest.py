@@ -4,7 +4,7 @@ import pytest_asyncio
 
 from httpx import AsyncClient, ASGITransport
 
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 
 from main import app
@@ -16,8 +16,11 @@ from sqlalchemy.pool import StaticPool
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 
 from src.entity.models import Base, User, Photo
-from src.database.db import get_db
+from src.database.db import get_db, sessionmanager
 from src.services.auth import auth_service
+from src.services.bans import ban_registry
+from src.services.cache import user_cache
+from src.services.sessions import session_store
 
 from src.repository import users as repositories_users
 from src.repository import photos as repositories_photos
@@ -42,13 +45,13 @@ def init_test_users():
             await conn.run_sync(Base.metadata.drop_all)
             await conn.run_sync(Base.metadata.create_all)
         async with TestingSessionLocal() as session:
-            hash_password = auth_service.get_password_hash(test_user_admin["password"])
+            hash_password = await auth_service.get_password_hash_async(test_user_admin["password"])
             admin_user = User(username=test_user_admin["username"], email=test_user_admin["email"], password=hash_password,
                                 verified=True, role="admin")
             session.add(admin_user)
             await session.commit()
 
-            new_user = User(username=test_user_new["username"], email=test_user_new["email"], password=auth_service.get_password_hash(test_user_new["password"]),
+            new_user = User(username=test_user_new["username"], email=test_user_new["email"], password=await auth_service.get_password_hash_async(test_user_new["password"]),
                             verified=True, role="user")
             session.add(new_user)
             await session.commit()
@@ -105,9 +108,11 @@ async def get_token(admin_user):
     token = await auth_service.create_access_token(data={"sub": admin_user.email})
     return token
 
-async def get_token():
-    token = await auth_service.create_access_token(data={"sub": test_user["email"]})
-    return token
+
+@pytest.fixture(scope="function", autouse=True)
+def task_sessions(monkeypatch):
+    # Background tasks open their own sessions, on the test database.
+    monkeypatch.setattr(sessionmanager, "_session_maker", TestingSessionLocal)
 
 
 @pytest.fixture(scope="function", autouse=True)
@@ -116,3 +121,16 @@ async def mock_limiter():
     with patch.object(FastAPILimiter, "redis", redis_mock):
         with patch.object(FastAPILimiter, "identifier", AsyncMock(return_value="test_identifier")):
             yield
+
+
+@pytest.fixture(scope="function", autouse=True)
+def mock_redis():
+    redis_mock = AsyncMock()
+    redis_mock.get.return_value = None
+    redis_mock.pipeline = MagicMock()
+    redis_mock.pipeline.return_value.__aenter__.return_value.execute = AsyncMock()
+    user_cache.local.clear()
+    ban_registry.banned.clear()
+    with patch.object(user_cache, "redis", redis_mock), patch.object(ban_registry, "redis", redis_mock), \
+            patch.object(session_store, "redis", redis_mock):
+        yield redis_mock
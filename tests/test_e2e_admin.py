@@ -17,6 +17,7 @@ from src.schemas.user import RequestEmail
 from src.conf import massages
 from src.conf.massages import AuthMessages as auth_massages
 from src.services.auth import auth_service
+from src.services.bans import ban_registry
 from src.entity.models import User, Photo 
 from src.repository import users as repositories_users
 from src.repository import photos as repositories_photos
@@ -39,7 +40,7 @@ async def test_get_photos_as_admin(client, get_token, admin_user, new_user_with_
         assert user_from_db.id == new_user.id
 
         photos_from_db = await repositories_photos.get_photos(user=user_from_db, db=db, skip=2, limit=2)
-        assert len(photos_from_db) == 2
+        assert len(photos_from_db.items) == 2
 
     response = await client.get(f"/api/admin/all/{new_user.id}", headers=headers)
     assert response.status_code == 200
@@ -75,3 +76,18 @@ async def test_get_photos_as_not_admin(client, new_user_with_photos):
         assert response.status_code == status.HTTP_403_FORBIDDEN
     except FastAPIError as e:
         print("Exception caught:", e)
+
+
+@pytest.mark.asyncio
+async def test_banned_user_is_rejected(client, get_token, admin_user):
+    await ban_registry.add(admin_user.id)
+    async with TestingSessionLocal() as db:
+        with pytest.raises(HTTPException) as error:
+            await auth_service.get_current_user(get_token, db)
+    assert error.value.status_code == status.HTTP_403_FORBIDDEN
+    assert error.value.detail == auth_massages.BAN_USER
+
+    await ban_registry.remove(admin_user.id)
+    headers = {"Authorization": f"Bearer {get_token}"}
+    response = await client.get("/api/photos/all/", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
@@ -126,14 +126,12 @@ async def test_ban_user_login(client):
 
 
 @pytest.mark.asyncio
-async def test_refresh_token(client, get_token):
-    refresh_token = await auth_service.create_refresh_token(data={"sub": user_data["email"]})
+async def test_refresh_token(client, get_token, mock_redis):
+    refresh_token = await auth_service.create_refresh_token(
+        data={"sub": user_data["email"], "sid": "phone", "jti": "first"}
+    )
+    mock_redis.eval.return_value = 1
 
-    async with TestingSessionLocal() as session:
-        current_user = await session.execute(select(User).where(User.email == user_data.get("email")))
-        current_user = current_user.scalar_one_or_none()
-        current_user.refresh_token = refresh_token
-        await session.commit()
     headers = {"Authorization": f"Bearer {refresh_token}"}
     response = await client.get("api/auth/refresh_token", headers=headers)
 
@@ -141,6 +139,37 @@ async def test_refresh_token(client, get_token):
     assert "access_token" in response.json()
     assert "refresh_token" in response.json()
     assert "token_type" in response.json()
+    claims = auth_service.decode_token(response.json()["refresh_token"])
+    assert claims["sid"] == "phone"
+    assert claims["jti"] != "first"
+    assert mock_redis.eval.await_args.args[4:6] == ("first", claims["jti"])
+
+
+@pytest.mark.asyncio
+async def test_refresh_token_reuse_revokes_sessions(mock_redis):
+    mock_redis.eval.return_value = -1
+    mock_redis.smembers.return_value = {b"phone", b"laptop"}
+
+    rotated = await auth_service.sessions.rotate(1, "phone", "rotated-away", "next")
+
+    assert rotated is False
+    mock_redis.delete.assert_awaited_once()
+    assert sorted(mock_redis.delete.await_args.args) == [
+        "refresh_session:1", "refresh_session:1:laptop", "refresh_session:1:phone"
+    ]
+
+
+@pytest.mark.asyncio
+async def test_logout_all(client, mock_redis):
+    access_token = await auth_service.create_access_token(data={"sub": user_data["email"]})
+    mock_redis.smembers.return_value = {b"phone"}
+
+    headers = {"Authorization": f"Bearer {access_token}"}
+    response = await client.post("api/auth/logout_all", headers=headers)
+
+    assert response.status_code == status.HTTP_200_OK, response.text
+    assert response.json()["message"] == auth_massages.LOGGED_OUT_ALL
+    mock_redis.delete.assert_awaited_once()
 
 
 @pytest.mark.asyncio
@@ -300,12 +329,6 @@ async def test_reset_password_success(client, monkeypatch):
                 body = {"password1": "new_password", "password2": "new_password"}
                 refresh_token = await auth_service.create_refresh_token(data={"sub": user_data["email"]})
             
-                async with TestingSessionLocal() as session:
-                    current_user = await session.execute(select(User).where(User.email == user_data["email"]))
-                    current_user = current_user.scalar_one_or_none()
-                    current_user.refresh_token = refresh_token
-                    await session.commit()
-
                 headers = {"Authorization": f"Bearer {refresh_token}"}
 
                 mock_send_message_password = AsyncMock()
@@ -329,12 +352,6 @@ async def test_reset_password_passwords_not_match(client):
                 body = ResetPassword(password1="password1", password2="password2")
                 refresh_token = await auth_service.create_refresh_token(data={"sub": user_data["email"]})
             
-                async with TestingSessionLocal() as session:
-                    current_user = await session.execute(select(User).where(User.email == user_data["email"]))
-                    current_user = current_user.scalar_one_or_none()
-                    current_user.refresh_token = refresh_token
-                    await session.commit()
-
                 headers = {"Authorization": f"Bearer {refresh_token}"}
                 
                 try:
@@ -0,0 +1,263 @@
+import pytest
+
+from unittest.mock import AsyncMock
+
+from fastapi import HTTPException, status
+from fastapi_limiter import FastAPILimiter
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from tests.conftest import TestingSessionLocal, SQLALCHEMY_DATABASE_URL
+from src.database.db import sessionmanager
+from src.entity.models import Photo, PhotoTag, PhotoTransformation
+from src.repository import transformation as repositories_transformations
+from src.services.storage import StoredFile, DerivedFile
+from src.services.tag_index import tag_index
+from src.repository.photos import PHOTO_ORDER
+from src.utils.pagination import decode_cursor, encode_cursor, paginate
+
+
+@pytest.mark.asyncio
+async def test_bulk_upload(client, get_token, monkeypatch):
+    async def upload(file, public_id):
+        if file.read() == b"broken":
+            raise RuntimeError("storage is down")
+        return StoredFile(public_id, f"http://example.com/{public_id}.jpg")
+
+    upload = AsyncMock(side_effect=upload)
+    monkeypatch.setattr("src.repository.photos.storage.upload", upload)
+    generate = AsyncMock(side_effect=lambda public_id, transformations: [
+        DerivedFile(url=f"http://example.com/{public_id}/{index}.webp", width=index)
+        for index in range(len(transformations))
+    ])
+    monkeypatch.setattr("src.repository.transformation.storage.generate", generate)
+    files = [
+        ("files", ("sea.jpg", b"sea", "image/jpeg")),
+        ("files", ("sea-copy.jpg", b"sea", "image/jpeg")),
+        ("files", ("broken.jpg", b"broken", "image/jpeg")),
+        ("files", ("forest.jpg", b"forest", "image/jpeg")),
+    ]
+    response = await client.post(
+        "/api/photos/bulk",
+        files=files,
+        data={"description": "holidays", "tags": "sea, summer,,summer"},
+        headers={"Authorization": f"Bearer {get_token}"},
+    )
+
+    assert response.status_code == status.HTTP_200_OK, response.text
+    data = response.json()
+    assert (data["created"], data["failed"]) == (3, 1)
+    results = {result["filename"]: result for result in data["results"]}
+    assert results["broken.jpg"]["photo"] is None
+    assert "storage is down" in results["broken.jpg"]["error"]
+    assert results["sea.jpg"]["photo"]["title"] == "sea"
+    assert results["sea.jpg"]["photo"]["file_path"] == results["sea-copy.jpg"]["photo"]["file_path"]
+    assert upload.await_count == 3
+
+    photo_ids = [result["photo"]["id"] for result in data["results"] if result["photo"]]
+    async with TestingSessionLocal() as db:
+        tagged = await db.execute(select(func.count()).select_from(PhotoTag).where(PhotoTag.photo_id.in_(photo_ids)))
+        assert tagged.scalar() == 6
+        descriptions = await db.execute(select(Photo.description).where(Photo.id.in_(photo_ids)))
+        assert set(descriptions.scalars()) == {"holidays"}
+        variants = await db.execute(
+            select(func.count()).select_from(PhotoTransformation).where(PhotoTransformation.photo_id.in_(photo_ids))
+        )
+        assert variants.scalar() == 3 * len(repositories_transformations.eager_variants())
+    assert generate.await_count == 2
+
+    widths = [index for index, name in enumerate(repositories_transformations.eager_variants())
+              if name in repositories_transformations.responsive_variants()]
+    for method, url in [("GET", f"/api/photos/{photo_ids[0]}"), ("PUT", f"/api/photos/{photo_ids[0]}/holidays")]:
+        response = await client.request(method, url, headers={"Authorization": f"Bearer {get_token}"})
+        assert response.status_code == status.HTTP_200_OK, response.text
+        assert [variant["width"] for variant in response.json()["variants"]] == sorted(widths)
+
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("variants", [0, 2])
+async def test_upload_returns_connections(client, get_token, monkeypatch, variants):
+    # The shared test engine uses a StaticPool, which does not count checkouts.
+    engine = create_async_engine(
+        SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}, poolclass=AsyncAdaptedQueuePool
+    )
+    monkeypatch.setattr(sessionmanager, "_session_maker", async_sessionmaker(autocommit=False, bind=engine))
+    monkeypatch.setattr(
+        "src.repository.photos.storage.upload",
+        AsyncMock(side_effect=lambda file, public_id: StoredFile(public_id, f"http://example.com/{public_id}.jpg")),
+    )
+    monkeypatch.setattr(
+        "src.repository.transformation.storage.generate",
+        AsyncMock(return_value=[DerivedFile(url="http://example.com/variant.webp", width=1)] * variants),
+    )
+    try:
+        response = await client.post(
+            "/api/photos/",
+            files={"file": ("pool.jpg", f"pool-{variants}".encode(), "image/jpeg")},
+            data={"title": "pool", "description": "pool"},
+            headers={"Authorization": f"Bearer {get_token}"},
+        )
+
+        assert response.status_code == status.HTTP_201_CREATED, response.text
+        assert engine.pool.checkedin() == 1
+        assert engine.pool.checkedout() == 0
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_cursor_pagination_matches_skip(client, get_token, new_user_with_photos):
+    headers = {"Authorization": f"Bearer {get_token}"}
+    url = f"/api/admin/all/{new_user_with_photos.id}"
+
+    response = await client.get(url, params={"limit": 100}, headers=headers)
+    expected = [photo["id"] for photo in response.json()]
+    assert "X-Next-Cursor" not in response.headers
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2} if cursor is None else {"limit": 2, "cursor": cursor}
+        response = await client.get(url, params=params, headers=headers)
+        assert response.status_code == status.HTTP_200_OK, response.text
+        seen.extend(photo["id"] for photo in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert seen == expected
+
+    response = await client.get(url, params={"limit": 2, "skip": 2}, headers=headers)
+    assert [photo["id"] for photo in response.json()] == expected[2:4]
+
+    for empty_url in (url, "/api/photos/all/", "/api/admin/ban_users/all", "/api/tags/", "/api/photos/all"):
+        response = await client.get(empty_url, params={"limit": 0}, headers=headers)
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY, empty_url
+    async with TestingSessionLocal() as db:
+        page = await paginate(db, select(Photo), PHOTO_ORDER, 0)
+    assert (page.items, page.next_cursor) == ([], None)
+
+
+def test_tampered_cursor_is_rejected():
+    with pytest.raises(HTTPException) as err:
+        decode_cursor(encode_cursor([1]), 2)
+    assert err.value.status_code == status.HTTP_400_BAD_REQUEST
+    with pytest.raises(HTTPException):
+        decode_cursor("not a cursor", 1)
+
+
+@pytest.mark.asyncio
+async def test_render_qr_code(client, get_token, admin_user):
+    async with TestingSessionLocal() as db:
+        photo = Photo(title="QR", description="", file_path="http://example.com/qr.jpg", user_id=admin_user.id)
+        db.add(photo)
+        await db.commit()
+    headers = {"Authorization": f"Bearer {get_token}"}
+
+    response = await client.get(f"/api/photos/{photo.id}/qr", headers=headers)
+    assert response.status_code == status.HTTP_200_OK, response.text
+    assert response.headers["content-type"] == "image/png"
+    assert response.content.startswith(b"\x89PNG")
+    assert response.headers["cache-control"] == "private, max-age=31536000, immutable"
+    etag = response.headers["etag"]
+
+    response = await client.get(f"/api/photos/{photo.id}/qr", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.headers["cache-control"].startswith("private")
+    assert response.content == b""
+
+    response = await client.get(f"/api/photos/{photo.id}/qr", params={"format": "svg"}, headers=headers)
+    assert response.headers["content-type"] == "image/svg+xml"
+    assert response.content.startswith(b"<svg")
+    assert response.headers["etag"] != etag
+
+
+@pytest.mark.asyncio
+async def test_conditional_get_follows_photo_version(client, get_token, admin_user, monkeypatch):
+    monkeypatch.setattr(FastAPILimiter, "redis", AsyncMock(evalsha=AsyncMock(return_value=0)))
+    monkeypatch.setattr(FastAPILimiter, "identifier", AsyncMock(return_value="test_identifier"))
+    async with TestingSessionLocal() as db:
+        photo = Photo(title="Etag", description="", file_path="http://example.com/etag.jpg",
+                      qr_code_url="http://example.com/etag-qr.png", user_id=admin_user.id)
+        db.add(photo)
+        await db.commit()
+    headers = {"Authorization": f"Bearer {get_token}"}
+    urls = [
+        f"/api/photos/{photo.id}",
+        f"/api/photos/info/{photo.id}",
+        f"/api/comments/photo/{photo.id}",
+        f"/api/ratings/photo/{photo.id}",
+    ]
+
+    etags = {}
+    for url in urls:
+        response = await client.get(url, headers=headers)
+        assert response.status_code == status.HTTP_200_OK, response.text
+        assert response.headers["cache-control"] == "private, no-cache"
+        etags[url] = response.headers["etag"]
+        response = await client.get(url, headers={**headers, "If-None-Match": etags[url]})
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response.headers["etag"] == etags[url]
+    assert len(set(etags.values())) == len(urls)
+
+    response = await client.post(f"/api/comments/{photo.id}", params={"comment_text": "nice"}, headers=headers)
+    assert response.status_code == status.HTTP_200_OK, response.text
+    response = await client.post(f"/api/ratings/photo/{photo.id}", params={"select_rating": "Good"},
+                                 headers=headers)
+    assert response.status_code == status.HTTP_201_CREATED, response.text
+
+    for url in urls:
+        response = await client.get(url, headers={**headers, "If-None-Match": etags[url]})
+        assert response.status_code == status.HTTP_200_OK, url
+        assert response.headers["etag"] != etags[url]
+    comments = await client.get(urls[2], headers=headers)
+    assert [comment["content"] for comment in comments.json()] == ["nice"]
+    ratings = await client.get(urls[3], headers=headers)
+    assert ratings.json()["number_of_ratings"] == 1
+
+    # A missing photo has no version, so even "*" must not turn it into a 304.
+    response = await client.get(f"/api/ratings/photo/{photo.id + 1000}", headers={**headers, "If-None-Match": "*"})
+    assert response.status_code == status.HTTP_200_OK, response.text
+
+
+@pytest.mark.asyncio
+async def test_conditional_get_of_tags(client, get_token):
+    headers = {"Authorization": f"Bearer {get_token}"}
+    response = await client.get("/api/tags/", headers=headers)
+    assert response.status_code == status.HTTP_200_OK, response.text
+    etag = response.headers["etag"]
+
+    response = await client.get("/api/tags/", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    response = await client.get("/api/tags/", params={"limit": 1}, headers={**headers, "If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+
+    response = await client.post("/api/tags/", params={"name_tag": "etag-tag"}, headers=headers)
+    assert response.status_code == status.HTTP_200_OK, response.text
+    response = await client.get("/api/tags/", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert "etag-tag" in [tag["name"] for tag in response.json()]
+
+
+@pytest.mark.asyncio
+async def test_suggest_tags(client, get_token, admin_user):
+    async with TestingSessionLocal() as db:
+        photos = [Photo(title=f"Suggest {n}", description="", file_path="http://example.com/s.jpg",
+                        user_id=admin_user.id) for n in range(2)]
+        db.add_all(photos)
+        await db.commit()
+    headers = {"Authorization": f"Bearer {get_token}"}
+    await client.post(f"/api/photos/tag/{photos[0].id}", params={"tags": "sugar,suggest-b"}, headers=headers)
+
+    # The first request is answered by the database and loads the index.
+    response = await client.get("/api/tags/suggest", params={"q": "SUG"}, headers=headers)
+    assert response.status_code == status.HTTP_200_OK, response.text
+    assert [(tag["name"], tag["count"]) for tag in response.json()] == [("sugar", 1), ("suggest-b", 1)]
+    assert tag_index.fresh
+
+    await client.post(f"/api/photos/tag/{photos[1].id}", params={"tags": "suggest-b,suggest-a"}, headers=headers)
+    response = await client.get("/api/tags/suggest", params={"q": "sugg", "limit": 5}, headers=headers)
+    assert [(tag["name"], tag["count"]) for tag in response.json()] == [("suggest-b", 2), ("suggest-a", 1)]
+
+    response = await client.get("/api/tags/suggest", params={"q": "%"}, headers=headers)
+    assert response.json() == []
@@ -0,0 +1,143 @@
+import pytest
+
+from unittest.mock import AsyncMock
+
+from sqlalchemy import event, false, func, select
+
+from tests.conftest import TestingSessionLocal, engine
+from src.entity.models import User, Photo, Comment, Rating, Tag, PhotoTag
+from src.repository import photos as repositories_photos
+from src.repository import qr_code as repositories_qr_code
+from src.repository import rating as repositories_rating
+from src.repository import tags as repositories_tags
+from src.services.storage import StoredFile
+
+
+class StatementCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(engine.sync_engine, "before_cursor_execute", self)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(engine.sync_engine, "before_cursor_execute", self)
+
+
+async def add_commenters(db, photo, start, count):
+    users = [User(username=f"fan{i}", email=f"fan{i}@example.com", password="x") for i in range(start, start + count)]
+    db.add_all(users)
+    await db.flush()
+    for i, user in enumerate(users):
+        db.add(Comment(content=f"Comment {start + i}", user_id=user.id, photo_id=photo.id))
+        if i % 2 == 0:
+            db.add(Rating(user_id=user.id, photo_id=photo.id, rating=4))
+    await db.commit()
+
+
+@pytest.mark.asyncio
+async def test_view_all_info_photo_runs_a_fixed_number_of_queries(new_user_with_photos, monkeypatch):
+    upload = AsyncMock(return_value=StoredFile("qr_codes/x", "http://qr"))
+    monkeypatch.setattr("src.repository.qr_code.storage.upload", upload)
+    async with TestingSessionLocal() as db:
+        photo = Photo(title="Popular", description="", file_path="http://example.com/p.jpg",
+                      user_id=new_user_with_photos.id)
+        tags = [Tag(name="popular-a"), Tag(name="popular-b")]
+        db.add_all([photo, *tags])
+        await db.flush()
+        db.add_all(PhotoTag(photo_id=photo.id, tag_id=tag.id) for tag in tags)
+        db.add(Rating(user_id=new_user_with_photos.id, photo_id=photo.id, rating=1))
+        await db.commit()
+        await add_commenters(db, photo, 0, 2)
+        # The ratings were added behind the back of the repository.
+        await repositories_rating.recount_photo_ratings(photo.id, db)
+        await db.refresh(photo)
+
+        first = await repositories_photos.view_all_info_photo(photo.id, new_user_with_photos, db)
+        assert first.file_path_gr == "http://qr"
+        with StatementCounter() as few:
+            info = await repositories_photos.view_all_info_photo(photo.id, new_user_with_photos, db)
+        assert info.tags == ["popular-a", "popular-b"]
+        assert [comment.comment for comment in info.comments] == ["Comment 1", "Comment 0"]
+        assert [comment.rating for comment in info.comments] == [0, 4]
+        assert info.average_rating == pytest.approx(2.5)
+
+        await add_commenters(db, photo, 2, 20)
+        with StatementCounter() as many:
+            info = await repositories_photos.view_all_info_photo(photo.id, new_user_with_photos, db)
+        assert len(info.comments) == 22
+        assert many.count == few.count == 3
+
+
+@pytest.mark.asyncio
+async def test_qr_code_is_made_once_per_photo(new_user_with_photos, monkeypatch):
+    upload = AsyncMock(side_effect=lambda data, public_id: StoredFile(public_id, f"http://qr/{public_id}.png"))
+    monkeypatch.setattr("src.repository.qr_code.storage.upload", upload)
+    async with TestingSessionLocal() as db:
+        photo = Photo(title="Same title", description="", file_path="http://example.com/q.jpg",
+                      user_id=new_user_with_photos.id)
+        db.add(photo)
+        await db.commit()
+
+        first = await repositories_qr_code.get_or_create_qr_code(photo, db)
+        again = await repositories_qr_code.get_or_create_qr_code(photo, db)
+
+        assert first == again == f"http://qr/qr_codes/photo_{photo.id}.png"
+        upload.assert_awaited_once()
+        await db.refresh(photo)
+        assert photo.qr_code_url == first
+
+
+@pytest.mark.asyncio
+async def test_create_tag_photo_replaces_tags_in_fixed_statements(new_user_with_photos):
+    async with TestingSessionLocal() as db:
+        photo = Photo(title="Tagged", description=None, file_path="http://example.com/t.jpg",
+                      user_id=new_user_with_photos.id)
+        db.add_all([photo, Tag(name="retag-old")])
+        await db.commit()
+
+        with StatementCounter() as few:
+            response = await repositories_photos.create_tag_photo(photo.id, "retag-old, retag-a", new_user_with_photos, db)
+        assert response.tags == ["retag-old", "retag-a"]
+
+        with StatementCounter() as many:
+            response = await repositories_photos.create_tag_photo(
+                photo.id, "retag-b,retag-a, ,retag-c,retag-b,retag-d,retag-e,retag-f", new_user_with_photos, db
+            )
+        assert response.tags == ["retag-b", "retag-a", "retag-c", "retag-d", "retag-e"]
+        assert many.count == few.count
+
+        result = await db.execute(
+            select(Tag.name).join(PhotoTag, PhotoTag.tag_id == Tag.id).where(PhotoTag.photo_id == photo.id)
+        )
+        assert sorted(result.scalars()) == ["retag-a", "retag-b", "retag-c", "retag-d", "retag-e"]
+        result = await db.execute(select(func.count(Tag.id)).where(Tag.name.like("retag-%")))
+        assert result.scalar() == 6
+
+
+@pytest.mark.asyncio
+async def test_get_or_create_tags_without_on_conflict_after_a_race(monkeypatch):
+    async with TestingSessionLocal() as db:
+        db.add(Tag(name="race-old"))
+        await db.commit()
+    monkeypatch.setattr(repositories_tags, "conflict_insert", lambda db: None)
+
+    async with TestingSessionLocal() as db:
+        execute = db.execute
+
+        async def stale_execute(statement, *args, **kwargs):
+            # The first select misses the tag another request created in the meantime.
+            monkeypatch.setattr(db, "execute", execute)
+            return await execute(select(Tag).where(false()))
+
+        monkeypatch.setattr(db, "execute", stale_execute)
+        tags = await repositories_tags.get_or_create_tags(["race-new", "race-old"], db)
+        await db.commit()
+
+        assert [tag.name for tag in tags] == ["race-new", "race-old"]
+        result = await db.execute(select(Tag.name, Tag.id).where(Tag.name.like("race-%")))
+        assert dict(result.all()) == {tag.name: tag.id for tag in tags}
@@ -0,0 +1,76 @@
+import pytest
+
+from fastapi import HTTPException
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
+
+from tests.conftest import TestingSessionLocal
+from src.entity.models import Photo, Rating
+from src.repository import rating as repositories_rating
+from src.schemas.rating import PhotoRating
+
+
+@pytest.mark.asyncio
+async def test_rating_aggregates_follow_writes(admin_user, new_user_with_photos):
+    async with TestingSessionLocal() as db:
+        photo = Photo(title="Rated", description="", file_path="http://example.com/rated.jpg",
+                      user_id=new_user_with_photos.id)
+        db.add(photo)
+        await db.commit()
+
+        empty = await repositories_rating.get_average_rating(photo.id, db)
+        assert (empty.number_of_ratings, empty.average_rating) == (0, 0)
+
+        await repositories_rating.create_rating_for_photo(photo.id, PhotoRating.two_stars, admin_user, db)
+        await repositories_rating.create_rating_for_photo(photo.id, PhotoRating.five_stars, new_user_with_photos, db)
+        await repositories_rating.create_rating_for_photo(photo.id, PhotoRating.four_stars, admin_user, db)
+
+        rating = await repositories_rating.get_average_rating(photo.id, db)
+        assert rating.number_of_ratings == 2
+        assert (rating.VeryBad, rating.Bad, rating.Average, rating.Good, rating.Excellent) == (0, 0, 0, 1, 1)
+        assert rating.average_rating == pytest.approx(4.5)
+
+        await repositories_rating.remove_rating(photo.id, new_user_with_photos, db)
+        rating = await repositories_rating.get_average_rating(photo.id, db)
+        assert (rating.number_of_ratings, rating.Good, rating.Excellent, rating.average_rating) == (1, 1, 0, 4)
+
+        # Drift the aggregates and repair them from the ratings table.
+        db.add(Rating(user_id=new_user_with_photos.id, photo_id=photo.id, rating=1))
+        await db.execute(update(Photo).where(Photo.id == photo.id).values(rating_count=7, rating_sum=0))
+        await db.commit()
+        await repositories_rating.recount_photo_ratings(photo.id, db)
+
+        rating = await repositories_rating.get_average_rating(photo.id, db)
+        assert (rating.number_of_ratings, rating.VeryBad, rating.Good) == (2, 1, 1)
+        assert rating.average_rating == pytest.approx(2.5)
+
+
+@pytest.mark.asyncio
+async def test_rating_is_one_row_per_user_and_photo(admin_user, new_user_with_photos):
+    async with TestingSessionLocal() as db:
+        photo = Photo(title="Rated once", description="", file_path="http://example.com/once.jpg",
+                      user_id=new_user_with_photos.id)
+        db.add(photo)
+        await db.commit()
+
+        first = await repositories_rating.create_rating_for_photo(photo.id, PhotoRating.one_star, admin_user, db)
+        again = await repositories_rating.create_rating_for_photo(photo.id, PhotoRating.three_stars, admin_user, db)
+        assert first.id == again.id
+        assert (again.user_id, again.photo_id, again.rating) == (admin_user.id, photo.id, 3)
+
+        result = await db.execute(select(func.count(Rating.id)).where(Rating.photo_id == photo.id))
+        assert result.scalar() == 1
+        rating = await repositories_rating.get_average_rating(photo.id, db)
+        assert (rating.number_of_ratings, rating.VeryBad, rating.Average) == (1, 0, 1)
+
+        missing_photo_id = photo.id + 1000
+        db.add(Rating(user_id=admin_user.id, photo_id=photo.id, rating=5))
+        with pytest.raises(IntegrityError):
+            await db.commit()
+        await db.rollback()
+
+        with pytest.raises(HTTPException) as err:
+            await repositories_rating.create_rating_for_photo(missing_photo_id, PhotoRating.one_star, admin_user, db)
+        assert err.value.status_code == 404
+        result = await db.execute(select(func.count(Rating.id)).where(Rating.photo_id == missing_photo_id))
+        assert result.scalar() == 0
@@ -0,0 +1,88 @@
+import pytest
+
+from unittest.mock import AsyncMock
+
+from sqlalchemy import select
+
+from tests.conftest import TestingSessionLocal
+from src.entity.models import Photo, PhotoTransformation
+from src.repository import photos as repositories_photos
+from src.repository import transformation as repositories_transformations
+from src.schemas.transformation import CropSchema
+from src.services.storage import DerivedFile
+
+
+def test_canonical_params_ignore_key_order():
+    first = repositories_transformations.canonical_params([{"width": 200, "crop": "fill"}, {"radius": "max"}])
+    second = repositories_transformations.canonical_params([{"crop": "fill", "width": 200}, {"radius": "max"}])
+    assert first == second
+
+
+@pytest.mark.asyncio
+async def test_identical_transformations_are_stored_once(new_user_with_photos):
+    async with TestingSessionLocal() as db:
+        photo = Photo(title="Crop", description="", user_id=new_user_with_photos.id,
+                      file_path="https://res.cloudinary.com/demo/image/upload/v1712/PhotoShare/abc.jpg")
+        db.add(photo)
+        await db.commit()
+        body = CropSchema(id=photo.id, width=300, angle=90)
+
+        first = await repositories_transformations.create_crop_transformation(photo, body, db)
+        again = await repositories_transformations.create_crop_transformation(photo, body, db)
+
+        assert first == again
+        assert "/upload/" in first["file_path_transform"]
+        assert "a_90" in first["file_path_transform"]
+        assert first["file_path_transform"].endswith("/PhotoShare/abc")
+        variants = await repositories_transformations.get_transformations(photo.id, db)
+        assert len(variants) == 1
+        assert variants[0].name is None
+
+
+@pytest.mark.asyncio
+async def test_generate_variants(new_user_with_photos, monkeypatch):
+    monkeypatch.setattr("src.repository.transformation.config.TRANSFORMATION_EAGER_PRESETS", "thumb, nope")
+    monkeypatch.setattr("src.repository.transformation.config.RESPONSIVE_WIDTHS", "480,160")
+
+    async def generate(public_id, transformations):
+        return [
+            DerivedFile(url=f"http://cdn/{public_id}/{index}", width=actions[-1]["width"], height=10, bytes=100)
+            for index, actions in enumerate(transformations)
+        ]
+
+    generate = AsyncMock(side_effect=generate)
+    monkeypatch.setattr("src.repository.transformation.storage.generate", generate)
+    async with TestingSessionLocal() as db:
+        file_path = "https://res.cloudinary.com/demo/image/upload/v1712/PhotoShare/shared.jpg"
+        photos = [Photo(title=f"Eager {i}", description="", file_path=file_path, user_id=new_user_with_photos.id)
+                  for i in range(2)]
+        db.add_all(photos)
+        await db.commit()
+        photo_ids = [photo.id for photo in photos]
+        await repositories_transformations.get_preset_transformation(photos[0], "thumb", db)
+
+        before = await db.execute(select(Photo.id, Photo.version).where(Photo.id.in_(photo_ids)))
+        before = dict(before.all())
+        await repositories_transformations.generate_variants(photo_ids)
+
+        after = await db.execute(select(Photo.id, Photo.version).where(Photo.id.in_(photo_ids)))
+        assert dict(after.all()) == {photo_id: version + 1 for photo_id, version in before.items()}
+
+        result = await db.execute(
+            select(PhotoTransformation.photo_id, PhotoTransformation.name)
+            .where(PhotoTransformation.photo_id.in_(photo_ids))
+        )
+        assert sorted(result.all()) == sorted(
+            (photo_id, name) for photo_id in photo_ids for name in ("thumb", "w160", "w480")
+        )
+        generate.assert_awaited_once()
+        public_id, transformations = generate.await_args.args
+        assert public_id == "PhotoShare/shared"
+        assert transformations[0] == repositories_transformations.PRESETS["thumb"]
+
+        variants = await repositories_transformations.get_responsive_variants(photo_ids, db)
+        assert [(variant.name, variant.width, variant.bytes) for variant in variants[photo_ids[1]]] == [
+            ("w160", 160, 100), ("w480", 480, 100)
+        ]
+        listing = await repositories_photos.photos_with_variants(photos, db)
+        assert [variant["width"] for variant in listing[0]["variants"]] == [160, 480]
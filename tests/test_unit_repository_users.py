@@ -0,0 +1,70 @@
+import hashlib
+import io
+import pytest
+
+from unittest.mock import AsyncMock
+
+from fastapi import UploadFile
+
+from tests.conftest import TestingSessionLocal
+
+from src.schemas.rating import PhotoRating
+from src.repository import users as repositories_users
+from src.repository import photos as repositories_photos
+from src.repository import comments as repositories_comments
+from src.repository import rating as repositories_rating
+from src.services.storage import StoredFile
+
+
+@pytest.mark.asyncio
+async def test_counters_follow_writes(admin_user, new_user_with_photos, monkeypatch):
+    upload = AsyncMock(return_value=StoredFile("PhotoShare/new/photo", "http://example.com/PhotoShare/new/photo.jpg"))
+    monkeypatch.setattr("src.repository.photos.storage.upload", upload)
+
+    async with TestingSessionLocal() as db:
+        await repositories_users.recount_user_counters(None, db)
+        owner_before = await repositories_users.get_user_counters(new_user_with_photos.id, db)
+        admin_before = await repositories_users.get_user_counters(admin_user.id, db)
+
+        photo = await repositories_photos.create_photo(
+            "Counted", "", new_user_with_photos, db, UploadFile(io.BytesIO(b"counted"), filename="counted.jpg")
+        )
+        await repositories_comments.add_comment("Nice", photo.id, admin_user, db)
+        await repositories_rating.create_rating_for_photo(photo.id, PhotoRating.four_stars, admin_user, db)
+        await repositories_rating.create_rating_for_photo(photo.id, PhotoRating.five_stars, admin_user, db)
+
+        owner = await repositories_users.get_user_counters(new_user_with_photos.id, db)
+        admin = await repositories_users.get_user_counters(admin_user.id, db)
+        assert owner["count_photo"] == owner_before["count_photo"] + 1
+        assert admin["count_comment"] == admin_before["count_comment"] + 1
+        assert admin["count_rating"] == admin_before["count_rating"] + 1
+
+        await repositories_photos.remove_photo(photo.id, new_user_with_photos, db)
+
+        assert await repositories_users.get_user_counters(new_user_with_photos.id, db) == owner_before
+        assert await repositories_users.get_user_counters(admin_user.id, db) == admin_before
+
+        await repositories_users.recount_user_counters(None, db)
+        assert await repositories_users.get_user_counters(admin_user.id, db) == admin_before
+
+
+@pytest.mark.asyncio
+async def test_duplicate_upload_reuses_stored_file(new_user_with_photos, monkeypatch):
+    upload = AsyncMock(return_value=StoredFile("PhotoShare/abc", "http://example.com/PhotoShare/abc.jpg"))
+    monkeypatch.setattr("src.repository.photos.storage.upload", upload)
+
+    async with TestingSessionLocal() as db:
+        first = await repositories_photos.create_photo(
+            "First", "", new_user_with_photos, db, UploadFile(io.BytesIO(b"same bytes"), filename="a.jpg")
+        )
+        second = await repositories_photos.create_photo(
+            "Second", "", new_user_with_photos, db, UploadFile(io.BytesIO(b"same bytes"), filename="b.jpg")
+        )
+
+        upload.assert_awaited_once()
+        assert upload.await_args.args[1] == f"PhotoShare/{first.content_hash}"
+        assert first.content_hash == second.content_hash == hashlib.sha256(b"same bytes").hexdigest()
+        assert second.file_path == first.file_path
+
+        await repositories_photos.remove_photo(first.id, new_user_with_photos, db)
+        await repositories_photos.remove_photo(second.id, new_user_with_photos, db)
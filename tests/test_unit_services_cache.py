@@ -0,0 +1,108 @@
+import pickle
+import time
+import pytest
+
+from unittest.mock import AsyncMock, patch
+
+from jose import jwt
+
+from src.entity.models import User, Role
+from src.services.auth import auth_service
+from src.services.cache import LRUCache, UserCache, ClaimsCache
+from src.services.user_snapshot import UserSnapshot, SNAPSHOT_VERSION
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_lru_expires_entries():
+    cache = LRUCache(maxsize=2, ttl=60)
+    with patch("src.services.cache.time.monotonic", return_value=100.0):
+        cache.set("a", 1)
+    with patch("src.services.cache.time.monotonic", return_value=161.0):
+        assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_user_cache_local_hit_skips_redis():
+    redis_mock = AsyncMock()
+    redis_mock.get.return_value = b"payload"
+    cache = UserCache(redis_mock, maxsize=8, local_ttl=30, ttl=300)
+
+    assert await cache.get("user@example.com") == b"payload"
+    assert await cache.get("user@example.com") == b"payload"
+    redis_mock.get.assert_awaited_once_with("user@example.com")
+
+
+@pytest.mark.asyncio
+async def test_user_cache_invalidate_publishes():
+    redis_mock = AsyncMock()
+    cache = UserCache(redis_mock, maxsize=8, local_ttl=30, ttl=300)
+    await cache.set("user@example.com", b"payload")
+    redis_mock.set.assert_awaited_once_with("user@example.com", b"payload", ex=300)
+
+    await cache.invalidate("user@example.com")
+    assert cache.local.get("user@example.com") is None
+    redis_mock.delete.assert_awaited_once_with("user@example.com")
+    redis_mock.publish.assert_awaited_once_with(UserCache.CHANNEL, "user@example.com")
+
+
+def test_user_snapshot_round_trip():
+    user = User(id=7, email="user@example.com", username="user", role=Role.moderator, avatar=None,
+                verified=True, count_photo=3, count_comment=2, count_rating=1, count_friendship=0)
+    snapshot = UserSnapshot.from_user(user)
+    payload = snapshot.dumps()
+
+    assert UserSnapshot.loads(payload) == snapshot
+    assert len(payload) < len(pickle.dumps(user))
+    assert snapshot.with_counters({"count_photo": 4}).count_photo == 4
+
+
+def test_user_snapshot_rejects_other_payloads():
+    assert UserSnapshot.loads(pickle.dumps({"email": "user@example.com"})) is None
+    assert UserSnapshot.loads(bytes([SNAPSHOT_VERSION + 1]) + b"\x00" * 32) is None
+    assert UserSnapshot.loads(bytes([SNAPSHOT_VERSION])) is None
+
+
+def test_claims_cache_counts_hits_until_expiry():
+    cache = ClaimsCache(maxsize=8)
+    assert cache.get("token") is None
+    claims = cache.set("token", {"sub": "user@example.com", "exp": time.time() + 60})
+    assert cache.get("token") == claims
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_ratio": 0.5, "size": 1}
+
+    cache.set("expired", {"sub": "user@example.com", "exp": time.time() - 1})
+    assert cache.get("expired") is None
+
+
+@pytest.mark.asyncio
+async def test_decode_token_reuses_verified_claims():
+    token = await auth_service.create_access_token(data={"sub": "user@example.com"})
+    with patch("src.services.auth.jwt.decode", wraps=jwt.decode) as decode:
+        first = auth_service.decode_token(token)
+        second = auth_service.decode_token(token)
+    assert first["sub"] == second["sub"] == "user@example.com"
+    decode.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_principal_comes_from_cached_snapshot_without_db():
+    snapshot = UserSnapshot(id=7, email="user@example.com", username="user", role=Role.moderator,
+                            avatar=None, verified=True)
+    auth_service.cache.local.set(snapshot.email, snapshot.dumps())
+    token = await auth_service.create_access_token(data={"sub": snapshot.email})
+    db = AsyncMock()
+
+    principal = await auth_service.get_principal(token, db)
+
+    assert (principal.id, principal.email, principal.role) == (7, "user@example.com", Role.moderator)
+    db.execute.assert_not_called()
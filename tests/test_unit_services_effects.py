@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from src.services.effects import apply_effect, radial_mask, ART_FILTERS
+
+
+def image(height=30, width=40):
+    return np.random.default_rng(1).integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+
+
+def test_pixelate_uses_block_means_also_for_edge_blocks():
+    rgb = image(7, 10)
+    result = apply_effect(rgb, "pixelate:4")
+
+    assert result.shape == rgb.shape and result.dtype == np.uint8
+    assert (result[:4, :4] == np.rint(rgb[:4, :4].reshape(-1, 3).mean(axis=0))).all()
+    assert (result[4:, 8:] == np.rint(rgb[4:, 8:].reshape(-1, 3).mean(axis=0))).all()
+
+
+def test_vignette_darkens_the_corners_only():
+    rgb = np.full((41, 41, 3), 200, dtype=np.uint8)
+    result = apply_effect(rgb, "vignette:50")
+
+    assert (result[20, 20] == 200).all()
+    assert (result[0, 0] < 100).all()
+    assert radial_mask(41, 41, 50) is radial_mask(41, 41, 50)
+
+
+def test_cartoonify_draws_edges_and_flattens_colors():
+    rgb = np.zeros((20, 20, 3), dtype=np.uint8)
+    rgb[:, 10:] = 250
+    rgb[:, :10] = 37
+    result = apply_effect(rgb, "cartoonify")
+
+    assert (result[:, 9:11] == 0).all()
+    assert len(np.unique(result[:, :8])) == 1
+    assert len(np.unique(result)) <= 3
+
+
+@pytest.mark.parametrize("name", ART_FILTERS)
+def test_art_filters(name):
+    rgb = image()
+    result = apply_effect(rgb, f"art:{name}")
+
+    assert result.shape == rgb.shape and result.dtype == np.uint8
+    assert not np.array_equal(result, rgb)
+
+
+def test_unknown_effects_keep_the_image():
+    rgb = image()
+    assert apply_effect(rgb, "blur:300") is rgb
+    assert apply_effect(rgb, "art:unknown") is rgb
@@ -0,0 +1,68 @@
+import pytest
+
+from PIL import Image
+
+from src.services.image_engine import transform_image, output_extension
+from src.services.storage import LocalStorage
+
+
+def image(width=400, height=200):
+    return Image.new("RGB", (width, height), (200, 30, 30))
+
+
+@pytest.mark.parametrize(
+    "action, size",
+    [
+        ({"width": 100, "crop": "fill"}, (100, 50)),
+        ({"width": 100, "aspect_ratio": 2.0, "crop": "fill"}, (100, 50)),
+        ({"width": 100, "height": 100, "crop": "fill"}, (100, 100)),
+        ({"width": 100, "height": 100, "crop": "scale"}, (100, 100)),
+        ({"width": 100, "height": 100, "crop": "fit"}, (100, 50)),
+        ({"width": 1000, "height": 1000, "crop": "limit"}, (400, 200)),
+        ({"width": 1000, "height": 1000, "crop": "fit"}, (1000, 500)),
+        ({"width": 800, "height": 800, "crop": "mfit"}, (1600, 800)),
+        ({"width": 100, "height": 100, "crop": "pad"}, (100, 100)),
+        ({"width": 100, "height": 150, "crop": "crop"}, (100, 150)),
+        ({"width": 600, "aspect_ratio": "1:1", "crop": "thumb"}, (600, 600)),
+        ({"crop": "fill"}, (400, 200)),
+        ({"angle": 90}, (200, 400)),
+    ],
+)
+def test_geometry_matches_crop_modes(action, size):
+    assert transform_image(image(), [{"fetch_format": "auto"}, action]).size == size
+
+
+def test_rounded_image_is_transparent_in_the_corners():
+    result = transform_image(image(), [{"width": 100, "aspect_ratio": "1:1", "crop": "fill"}, {"radius": "max"}])
+
+    assert result.mode == "RGBA"
+    assert result.getpixel((0, 0))[3] == 0
+    assert result.getpixel((50, 50))[3] == 255
+    assert output_extension([{"radius": "max"}], ".jpg") == ".png"
+    assert output_extension([{"width": 10}], ".JPG") == ".jpg"
+
+
+@pytest.mark.asyncio
+async def test_local_storage_renders_each_transformation_once(tmp_path):
+    backend = LocalStorage(concurrency=1, root=str(tmp_path), base_url="/media", transform_workers=1)
+    buffer = tmp_path / "source.jpg"
+    image().save(buffer, format="JPEG")
+    stored = await backend.upload(buffer.read_bytes(), "PhotoShare/abc")
+    actions = [{"fetch_format": "auto"}, {"width": 100, "crop": "fill"}]
+    try:
+        [derived_file] = await backend.generate(stored.public_id, [actions])
+        derived = tmp_path / backend.derived_id(stored.public_id, actions)
+        assert Image.open(derived).size == (100, 50)
+        assert (derived_file.width, derived_file.height, derived_file.bytes) == (100, 50, derived.stat().st_size)
+        assert backend.url(stored.public_id, transformation=actions) == f"/media/{derived.relative_to(tmp_path).as_posix()}"
+
+        mtime = derived.stat().st_mtime_ns
+        await backend.generate(stored.public_id, [actions])
+        assert derived.stat().st_mtime_ns == mtime
+
+        webp = [{"width": 160, "crop": "limit", "fetch_format": "webp"}]
+        [derived_file] = await backend.generate(stored.public_id, [webp])
+        assert derived_file.url.endswith(".webp")
+        assert Image.open(tmp_path / backend.derived_id(stored.public_id, webp)).format == "WEBP"
+    finally:
+        backend.shutdown()
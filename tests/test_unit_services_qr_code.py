@@ -0,0 +1,47 @@
+import pytest
+
+from unittest.mock import patch
+
+from src.services import qr_code
+from src.services.qr_code import QRRenderer, QRFormat, render_svg
+from src.utils.conditional import etag_matches, make_etag
+
+
+def test_render_svg_draws_the_module_matrix():
+    svg = render_svg("http://example.com/photo.jpg")
+    size = len(qr_code.build_qr_code("http://example.com/photo.jpg").get_matrix())
+
+    assert svg.startswith(b'<svg xmlns="http://www.w3.org/2000/svg"')
+    assert f'viewBox="0 0 {size} {size}"'.encode() in svg
+    # The top left finder pattern starts with a run of seven dark modules after the border.
+    assert b"M4 4h7v1h-7z" in svg
+
+
+@pytest.mark.asyncio
+async def test_renderer_is_bounded_by_bytes():
+    renderer = QRRenderer(maxbytes=10)
+    with patch.dict(qr_code.RENDERERS, {QRFormat.svg: lambda data: data.encode() * 2}) as renderers:
+        assert await renderer.render("abc", QRFormat.svg) == b"abcabc"
+        assert await renderer.render("de", QRFormat.svg) == b"dede"
+        assert (len(renderer), renderer.size) == (2, 10)
+
+        await renderer.render("f", QRFormat.svg)
+        assert (len(renderer), renderer.size) == (2, 6)
+
+        renderers[QRFormat.svg] = lambda data: pytest.fail("rendered twice")
+        assert await renderer.render("de", QRFormat.svg) == b"dede"
+
+
+def test_etag_matches():
+    etag = QRRenderer.etag("http://example.com/photo.jpg", QRFormat.png)
+
+    assert etag != QRRenderer.etag("http://example.com/photo.jpg", QRFormat.svg)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches('"other"', etag)
+
+    weak = make_etag("photo", 1, 2)
+    assert weak.startswith('W/"') and weak != make_etag("photo", 1, 3)
+    assert etag_matches(weak, weak)
+    assert etag_matches(weak.removeprefix("W/"), weak)
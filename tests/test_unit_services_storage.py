@@ -0,0 +1,64 @@
+import asyncio
+import io
+import time
+
+import pytest
+
+from src.services.storage import LocalStorage, CloudinaryStorage
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 16
+JPEG = b"\xff\xd8\xff\xe0" + b"\x00" * 16
+
+
+@pytest.mark.asyncio
+async def test_local_storage_upload_overwrite_and_delete(tmp_path):
+    storage = LocalStorage(concurrency=2, root=str(tmp_path), base_url="/media/")
+
+    stored = await storage.upload(io.BytesIO(PNG), "PhotoShare/user@example.com/avatar")
+    assert stored.public_id == "PhotoShare/user@example.com/avatar.png"
+    assert stored.url.startswith("/media/PhotoShare/user@example.com/avatar.png?v=")
+    assert (tmp_path / stored.public_id).read_bytes() == PNG
+
+    replaced = await storage.upload(JPEG, "PhotoShare/user@example.com/avatar")
+    assert replaced.public_id.endswith("avatar.jpg")
+    assert [p.name for p in (tmp_path / "PhotoShare/user@example.com").iterdir()] == ["avatar.jpg"]
+
+    await storage.delete(replaced.public_id)
+    assert not (tmp_path / replaced.public_id).exists()
+
+
+@pytest.mark.asyncio
+async def test_local_storage_rejects_paths_outside_root(tmp_path):
+    storage = LocalStorage(concurrency=1, root=str(tmp_path / "media"), base_url="/media")
+    with pytest.raises(ValueError):
+        await storage.upload(PNG, "../outside")
+
+
+@pytest.mark.asyncio
+async def test_uploads_are_bounded(tmp_path, monkeypatch):
+    storage = LocalStorage(concurrency=2, root=str(tmp_path), base_url="/media")
+    running, peak = 0, 0
+    original = storage._upload
+
+    def slow_upload(file, public_id):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        try:
+            time.sleep(0.05)
+            return original(file, public_id)
+        finally:
+            running -= 1
+
+    monkeypatch.setattr(storage, "_upload", slow_upload)
+    await asyncio.gather(*(storage.upload(PNG, f"bulk/{i}") for i in range(6)))
+    assert peak == 2
+
+
+def test_public_id_from_url(tmp_path):
+    local = LocalStorage(concurrency=1, root=str(tmp_path), base_url="/media")
+    cloud = CloudinaryStorage(concurrency=1)
+
+    assert local.public_id("/media/PhotoShare/abc.png?v=17") == "PhotoShare/abc.png"
+    assert cloud.public_id("https://res.cloudinary.com/demo/image/upload/v1712/PhotoShare/abc.jpg") == "PhotoShare/abc"
+    assert cloud.public_id("https://res.cloudinary.com/demo/image/upload/PhotoShare/user/x1.png") == "PhotoShare/user/x1"
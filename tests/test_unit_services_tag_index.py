@@ -0,0 +1,38 @@
+from src.services.tag_index import TagIndex
+
+
+def test_suggest_ranks_prefix_matches_by_usage():
+    index = TagIndex(ttl=60)
+    assert not index.fresh and index.claim_reload() and not index.claim_reload()
+    index.load([(1, "Sea", 3), (2, "seaside", 7), (3, "summer", 9), (4, "sea_", 3), (5, "sky", 0)])
+    assert index.fresh and not index.claim_reload()
+
+    assert index.suggest("sea", 10) == [(2, "seaside", 7), (1, "Sea", 3), (4, "sea_", 3)]
+    assert index.suggest("S", 2) == [(3, "summer", 9), (2, "seaside", 7)]
+    assert index.suggest("x", 10) == []
+
+
+def test_incremental_changes():
+    index = TagIndex(ttl=60)
+    index.add(1, "ignored")
+    assert index.suggest("ig", 10) == []
+
+    index.load([(1, "sea", 1)])
+    index.add(2, "season")
+    index.use({2: 2, 1: -5, 99: 1})
+    assert index.suggest("sea", 10) == [(2, "season", 2), (1, "sea", 0)]
+
+    index.rename(2, "autumn")
+    assert index.suggest("sea", 10) == [(1, "sea", 0)]
+    assert index.suggest("au", 10) == [(2, "autumn", 2)]
+
+    index.remove(1)
+    index.remove(1)
+    assert index.suggest("s", 10) == []
+
+
+def test_index_expires():
+    index = TagIndex(ttl=0)
+    index.load([])
+    assert not index.fresh
+    assert index.claim_reload()